@@ -30,8 +30,6 @@
 #  THE POSSIBILITY OF SUCH DAMAGE.                                            #
 # ----------------------------------------------------------------------------#
 
-import Queue
-
 import pint
 
 from liota.dcc_comms.websocket_dcc_comms import WebSocketDccComms
@@ -53,24 +51,19 @@ execfile('samplePropMqtt.conf', config)
 # Create unit registry
 ureg = pint.UnitRegistry()
 
-# Store temperature values in Queue
-kitchen_temperature_data = Queue.Queue()
-living_room_temperature_data = Queue.Queue()
+# Registered metrics fed by MQTT callbacks
+reg_kitchen_temp = None
+reg_living_room_temp = None
 
 
 # Callback functions
-# To put corresponding values in queue
+# To push corresponding values into metrics
 def callback_kitchen_temp(client, userdata, message):
-    kitchen_temperature_data.put(float(message.payload))
+    reg_kitchen_temp.ingest(float(message.payload))
 
 
 def callback_living_room_temp(client, userdata, message):
-    living_room_temperature_data.put(float(message.payload))
-
-
-# Extract data from Queue
-def get_value(queue):
-    return queue.get(block=True)
+    reg_living_room_temp.ingest(float(message.payload))
 
 
 # ---------------------------------------------------------------------------------
@@ -104,8 +97,8 @@ def get_value(queue):
 #                   at Kitchen                at Living room
 #
 #
-# Data streaming can be done from MQTT channel to IoTCC using LIOTA setting
-# sampling_interval_sec to zero.
+# Data streaming can be done from MQTT channel to IoTCC using LIOTA by creating
+# metrics without sampling function and pushing values into them with ingest().
 #
 # Temperature values from sensor will be collected using MQTT channel and redirected
 # to IoTCC data center component
@@ -152,9 +145,6 @@ if __name__ == "__main__":
         # Create an Edge System Dk300
         edge_system = Dk300EdgeSystem(config['EdgeSystemName'])
 
-        # Get kitchen and living room temperature values using MQTT channel
-        mqtt_subscribe(edge_system)
-
         # Register Edge System with IoT control center
         reg_edge_system = iotcc.register(edge_system)
 
@@ -177,8 +167,7 @@ if __name__ == "__main__":
         kitchen_temperature = Metric(
             name=metric_name_kitchen_temperature,
             unit=ureg.degC,
-            interval=0,
-            sampling_function=lambda: get_value(kitchen_temperature_data)
+            sampling_function=None
         )
 
         reg_kitchen_temp = iotcc.register(kitchen_temperature)
@@ -199,14 +188,16 @@ if __name__ == "__main__":
         living_room_temperature = Metric(
             name=metric_name_living_room_temperature,
             unit=ureg.degC,
-            interval=0,
-            sampling_function=lambda:get_value(living_room_temperature_data)
+            sampling_function=None
         )
 
         reg_living_room_temp = iotcc.register(living_room_temperature)
         iotcc.create_relationship(reg_living_room_temperature_device, reg_living_room_temp)
         reg_living_room_temp.start_collecting()
 
+        # Get kitchen and living room temperature values using MQTT channel
+        mqtt_subscribe(edge_system)
+
     except RegistrationFailure:
         print "Registration to IOTCC failed"
 
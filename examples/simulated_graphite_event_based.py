@@ -30,7 +30,6 @@
 #  THE POSSIBILITY OF SUCH DAMAGE.                                            #
 # ----------------------------------------------------------------------------#
 
-import Queue
 import random
 import time
 import thread
@@ -43,23 +42,16 @@ from liota.entities.edge_systems.dk300_edge_system import Dk300EdgeSystem
 config = {}
 execfile('sampleProp.conf', config)
 
-comms_channel = Queue.Queue() # channel between device and a udm used for a metric
-
-#simulates a device putting data into a comms channel at random intervals
-def simulated_event_device(write_channel):
+#simulates a device pushing data into a metric at random intervals
+def simulated_event_device(reg_metric):
     while(True):
         time.sleep(random.randint(1,10))
-        write_channel.put(random.randint(1,300))
-
-# starting the simulated device
-thread.start_new_thread(simulated_event_device, (comms_channel,))
-
-def udm1():
-    return comms_channel.get(block=True)
+        reg_metric.ingest(random.randint(1,300))
 
 #---------------------------------------------------------------------------
 # In this example, we demonstrate how an event stream of data can be directed to graphite
-# data center component using Liota by setting sampling_interval_sec parameter to zero.
+# data center component using Liota. The metric has no sampling function; values are
+# pushed into it with ingest(), so it does not occupy any collection thread.
 
 if __name__ == '__main__':
 
@@ -76,10 +68,12 @@ if __name__ == '__main__':
     content_metric = Metric(
         name=metric_name,
         unit=None,
-        interval=0,
         aggregation_size=6,
-        sampling_function=udm1
+        sampling_function=None
     )
     reg_content_metric = graphite.register(content_metric)
     graphite.create_relationship(graphite_reg_edge_system, reg_content_metric)
     reg_content_metric.start_collecting()
+
+    # starting the simulated device
+    thread.start_new_thread(simulated_event_device, (reg_content_metric,))
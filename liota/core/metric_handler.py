@@ -30,10 +30,13 @@
 #  THE POSSIBILITY OF SUCH DAMAGE.                                            #
 # ----------------------------------------------------------------------------#
 
-from Queue import Queue, PriorityQueue, Full
+from Queue import Queue, PriorityQueue, Empty, Full
 import heapq
 import logging
+from multiprocessing import Pool
+from aenum import UniqueEnum
 from threading import Thread, Condition, Lock
+from weakref import WeakSet
 from time import time as _time
 
 from liota.lib.utilities.utility import getUTCmillis
@@ -45,25 +48,166 @@ event_ds = None
 collect_queue = None
 send_queue = None
 event_checker_thread = None
-send_thread = None
+dispatch_stats = None
 collect_thread_pool = None
+collect_process_pool = None
+metric_buffer_config = None
+flush_timer = None
+active_metrics = WeakSet()
+active_metrics_lock = Lock()
+
+
+class BatchQueue(Queue):
+
+    def put_batch(self, items):
+        """
+        Puts all items into the queue with a single acquisition of its lock.
+        """
+        if not items:
+            return
+        self.not_full.acquire()
+        try:
+            for item in items:
+                self._put(item)
+            self.unfinished_tasks += len(items)
+            self.not_empty.notify(len(items))
+        finally:
+            self.not_full.release()
+
+
+class OverflowPolicy(UniqueEnum):
+    """
+    Enum for what a BoundedQueue does with a new item when it is full.
+
+        *  BLOCK        - wait until there is room (backpressure)
+        *  DROP_OLDEST  - drop the oldest item in the queue
+        *  DROP_NEWEST  - drop the new item
+        *  DOWNSAMPLE   - drop every other sample in a value buffer of a
+                          metric, halving its resolution while keeping its
+                          time span; not for queues of metrics, as dropping
+                          every other metric would starve whole streams
+    """
+    BLOCK = 0
+    DROP_OLDEST = 1
+    DROP_NEWEST = 2
+    DOWNSAMPLE = 3
+
+
+class BoundedQueue(BatchQueue):
+    """
+    Queue holding at most capacity items (unbounded if 0), which applies an
+    OverflowPolicy other than DOWNSAMPLE when full. Dropped items are counted
+    and handed to the on_drop callback, if any, outside of the queue lock.
+    """
+
+    def __init__(self, capacity=0, policy=OverflowPolicy.BLOCK, on_drop=None):
+        if policy not in OverflowPolicy:
+            raise TypeError("Unsupported overflow policy")
+        if policy is OverflowPolicy.DOWNSAMPLE:
+            raise ValueError("Queues of metrics can not be downsampled")
+        BatchQueue.__init__(
+            self, capacity if policy is OverflowPolicy.BLOCK else 0)
+        self.capacity = capacity
+        self.policy = policy
+        self.num_dropped = 0
+        self._on_drop = on_drop
+
+    def put(self, item, block=True, timeout=None):
+        if self.capacity == 0 or self.policy is OverflowPolicy.BLOCK:
+            return BatchQueue.put(self, item, block, timeout)
+        self.not_full.acquire()
+        try:
+            dropped = []
+            if self._qsize() >= self.capacity:
+                if self.policy is OverflowPolicy.DROP_NEWEST:
+                    dropped.append(item)
+                else:
+                    dropped.append(self.queue.popleft())
+                self.num_dropped += len(dropped)
+            if not dropped or dropped[0] is not item:
+                self._put(item)
+                self.unfinished_tasks += 1
+                self.not_empty.notify()
+        finally:
+            self.not_full.release()
+        if dropped and self._on_drop is not None:
+            for dropped_item in dropped:
+                self._on_drop(dropped_item)
+
+    def put_batch(self, items):
+        if self.capacity == 0:
+            return BatchQueue.put_batch(self, items)
+        for item in items:
+            self.put(item)
+
+    def put_control(self, item):
+        """
+        Puts a control item, e.g. an exit signal, regardless of capacity.
+        """
+        self.not_full.acquire()
+        try:
+            self._put(item)
+            self.unfinished_tasks += 1
+            self.not_empty.notify()
+        finally:
+            self.not_full.release()
+
+
+def get_overflow_config(stage, default_policy=OverflowPolicy.BLOCK,
+                        unsupported=(), fallback_policy=None):
+    """
+    Returns [capacity, OverflowPolicy] of a stage from CORE_CFG section in
+    liota.conf, read from <stage>_size and <stage>_policy options. Policies
+    in unsupported are replaced by fallback_policy, or default_policy.
+    """
+    if fallback_policy is None:
+        fallback_policy = default_policy
+    capacity = int(_read_core_config(stage + '_size', 0))
+    policy_name = _read_core_config(stage + '_policy', default_policy.name)
+    try:
+        policy = OverflowPolicy[policy_name.upper()]
+    except KeyError:
+        log.warning("Unknown overflow policy %s for %s, using %s"
+                    % (policy_name, stage, default_policy.name))
+        policy = default_policy
+    if policy in unsupported:
+        log.warning("Overflow policy %s is not supported for %s, using %s"
+                    % (policy.name, stage, fallback_policy.name))
+        policy = fallback_policy
+    return [capacity, policy]
+
+
+def get_metric_buffer_config():
+    """
+    Returns default [capacity, OverflowPolicy] of value buffers of metrics.
+    """
+    global metric_buffer_config
+    if metric_buffer_config is None:
+        metric_buffer_config = get_overflow_config(
+            'metric_buffer', OverflowPolicy.DROP_OLDEST,
+            unsupported=(OverflowPolicy.BLOCK,))
+    return metric_buffer_config
 
 
 class EventsPriorityQueue(PriorityQueue):
+    """
+    Min-heap of registered metrics ordered by their next run time.
+
+    The head of the heap is always self.queue[0], so both insertion and
+    readiness checks avoid scanning the whole heap. Metrics marked dead by
+    RegisteredMetric.stop_collecting() are not searched for and removed
+    eagerly; they are discarded lazily once they reach the head.
+    """
 
     def __init__(self):
         PriorityQueue.__init__(self)
         self.first_element_changed = Condition(self.mutex)
+        self.num_discarded = 0
 
     def put_and_notify(self, item, block=True, timeout=None):
         log.debug("Adding Event:" + str(item))
         self.not_full.acquire()
         try:
-            first_element_before_insertion = None
-            if self._qsize() > 0:
-                first_element_before_insertion = heapq.nsmallest(1, self.queue)[
-                    0]
-
             if self.maxsize > 0:
                 if not block:
                     if self._qsize() == self.maxsize:
@@ -84,47 +228,109 @@ class EventsPriorityQueue(PriorityQueue):
             self.unfinished_tasks += 1
             self.not_empty.notify()
 
-            first_element_after_insertion = heapq.nsmallest(1, self.queue)[0]
-            if first_element_before_insertion != first_element_after_insertion:
+            # Only a new head changes how long the checker has to wait
+            if self.queue[0] is item:
                 self.first_element_changed.notify()
         finally:
             self.not_full.release()
 
+    def _get_head(self):
+        item = self._get()
+        self.not_full.notify()
+        return item
+
     def get_next_element_when_ready(self):
         self.first_element_changed.acquire()
         try:
-            isNotReady = True
-            while isNotReady:
-                if self._qsize() > 0:
-                    first_element = heapq.nsmallest(1, self.queue)[0]
-                    if isinstance(first_element, SystemExit):
-                        first_element = self._get()
-                        break
-                    if not first_element.flag_alive:
-                        log.debug("Early termination of dead metric")
-                        first_element = self._get()
-                        break
-                    timeout = (
-                        first_element.get_next_run_time() - getUTCmillis()
-                    ) / 1000.0
-                    log.debug("Waiting on acquired first_element_changed LOCK "
-                             + "for: %.2f" % timeout)
-                    self.first_element_changed.wait(timeout)
-                else:
-                    self.first_element_changed.wait()
-                    first_element = heapq.nsmallest(1, self.queue)[0]
+            return self._get_ready_element()
+        finally:
+            self.first_element_changed.release()
+
+    def _get_ready_element(self):
+        while True:
+            if self._qsize() == 0:
+                self.first_element_changed.wait()
+                continue
+            first_element = self.queue[0]
+            if isinstance(first_element, SystemExit):
+                return self._get_head()
+            if not first_element.flag_alive:
+                # Lazy deletion of metric stopped while waiting in heap
+                self._get_head()
+                self.num_discarded += 1
+                log.debug("Discarded dead metric: %s" % str(first_element))
+                continue
+            timeout = (
+                first_element.get_next_run_time() - getUTCmillis()
+            ) / 1000.0
+            if timeout <= 0:
+                return self._get_head()
+            log.debug("Waiting on acquired first_element_changed LOCK "
+                      + "for: %.2f" % timeout)
+            self.first_element_changed.wait(timeout)
+
+    def get_ready_batch(self):
+        """
+        Blocks until at least one live metric is due, then pops every metric
+        whose run time has passed in the same locked pass.
+
+        :return: List of due metrics, or SystemExit once terminated
+        """
+        self.first_element_changed.acquire()
+        try:
+            batch = [self._get_ready_element()]
+            if isinstance(batch[0], SystemExit):
+                return batch[0]
+            now = getUTCmillis()
+            while self._qsize() > 0:
+                first_element = self.queue[0]
                 if isinstance(first_element, SystemExit):
-                    first_element = self._get()
                     break
-                if (first_element.get_next_run_time() - getUTCmillis()) <= 0 \
-                        or not first_element.flag_alive:
-                    isNotReady = False
-                    first_element = self._get()
-            return first_element
+                if not first_element.flag_alive:
+                    self._get_head()
+                    self.num_discarded += 1
+                    continue
+                if first_element.get_next_run_time() > now:
+                    break
+                batch.append(self._get_head())
+            return batch
         finally:
             self.first_element_changed.release()
 
 
+class DispatchStats:
+    """
+    Batch sizes and scheduling lag of metrics dispatched by the scheduler.
+    Updated only by EventCheckerThread.
+    """
+
+    def __init__(self):
+        self.num_batches = 0
+        self.num_dispatched = 0
+        self.max_batch_size = 0
+        self.total_lag = 0
+        self.max_lag = 0
+
+    def record(self, batch, now):
+        lag = [now - metric.get_next_run_time() for metric in batch]
+        self.num_batches += 1
+        self.num_dispatched += len(batch)
+        self.max_batch_size = max(self.max_batch_size, len(batch))
+        self.total_lag += sum(lag)
+        self.max_lag = max(self.max_lag, max(lag))
+
+    def get_stats(self):
+        num_batches = self.num_batches
+        num_dispatched = self.num_dispatched
+        return [num_batches,
+                "%.1f" % (float(num_dispatched) / num_batches)
+                if num_batches else "n/a",
+                self.max_batch_size,
+                "%.1f" % (float(self.total_lag) / num_dispatched)
+                if num_dispatched else "n/a",
+                self.max_lag]
+
+
 class EventCheckerThread(Thread):
 
     def __init__(self, name=None):
@@ -136,51 +342,346 @@ class EventCheckerThread(Thread):
         log.info("Started EventCheckerThread")
         global event_ds
         global collect_queue
+        global collect_thread_pool
+        global dispatch_stats
         while self.flag_alive:
             log.debug("Waiting for event...")
-            metric = event_ds.get_next_element_when_ready()
-            if isinstance(metric, SystemExit):
+            batch = event_ds.get_ready_batch()
+            if isinstance(batch, SystemExit):
                 log.debug("Got exit signal")
                 break
-            log.debug("Got event:" + str(metric))
-            if not metric.flag_alive:
-                log.debug("Discarded dead metric: %s" % str(metric))
-                continue
-            collect_queue.put(metric)
+            log.debug("Got %d due events" % len(batch))
+            dispatch_stats.record(batch, getUTCmillis())
+            collect_queue.put_batch(batch)
+            if collect_thread_pool is not None:
+                collect_thread_pool.scale(collect_queue.qsize())
         log.info("Thread exits: %s" % str(self.name))
 
 
+class TimingWheel:
+    """
+    Hierarchical timing wheel of registered metrics, keyed on their next run
+    time rounded up to a tick.
+
+    Level 0 has one slot per tick, and every next level has slots as wide as
+    a full turn of the level below. Metrics are placed on the lowest level
+    that covers their delay and cascade down as the wheel turns, so adding a
+    metric and advancing a tick cost O(1) no matter how many metrics wait in
+    the wheel. Metrics beyond the top level are kept in an overflow list.
+    """
+
+    def __init__(self, tick_ms=100, num_slots=64, num_levels=4):
+        if tick_ms <= 0 or num_slots <= 1 or num_levels <= 0:
+            raise ValueError("Invalid timing wheel dimensions")
+        self.tick_ms = tick_ms
+        self.num_slots = num_slots
+        self.num_levels = num_levels
+        self.mutex = Lock()
+        self.first_element_changed = Condition(self.mutex)
+        self.num_discarded = 0
+        self._wheels = [[[] for _ in range(num_slots)]
+                        for _ in range(num_levels)]
+        self._overflow = []
+        self._due = []
+        self._size = 0
+        self._exit = False
+        self._current_tick = getUTCmillis() // tick_ms
+
+    def qsize(self):
+        with self.mutex:
+            return self._size
+
+    def put_and_notify(self, item, block=True, timeout=None):
+        log.debug("Adding Event:" + str(item))
+        with self.mutex:
+            if isinstance(item, SystemExit):
+                self._exit = True
+                self.first_element_changed.notify()
+                return
+            self._size += 1
+            self._insert(item)
+            if self._due:
+                self.first_element_changed.notify()
+
+    def _insert(self, item):
+        # Round up, so that a metric is never dispatched before its time
+        expiry = int(-(-item.get_next_run_time() // self.tick_ms))
+        delay = expiry - self._current_tick
+        if delay <= 0:
+            self._due.append(item)
+            return
+        span = 1
+        for level in range(self.num_levels):
+            if delay < span * self.num_slots:
+                self._wheels[level][(expiry // span) % self.num_slots] \
+                    .append(item)
+                return
+            span *= self.num_slots
+        self._overflow.append(item)
+
+    def _advance(self):
+        self._current_tick += 1
+        tick = self._current_tick
+        # Cascade higher levels first, so that metrics falling into the
+        # current tick are found on level 0 below.
+        span = self.num_slots ** (self.num_levels - 1)
+        for level in range(self.num_levels - 1, 0, -1):
+            if tick % span == 0:
+                index = (tick // span) % self.num_slots
+                bucket = self._wheels[level][index]
+                self._wheels[level][index] = []
+                if level == self.num_levels - 1:
+                    bucket.extend(self._overflow)
+                    self._overflow = []
+                for item in bucket:
+                    self._insert(item)
+            span //= self.num_slots
+        index = tick % self.num_slots
+        if self._wheels[0][index]:
+            self._due.extend(self._wheels[0][index])
+            self._wheels[0][index] = []
+
+    def get_ready_batch(self):
+        """
+        Blocks until at least one live metric is due.
+
+        :return: List of due metrics, or SystemExit once terminated
+        """
+        with self.mutex:
+            while True:
+                if self._exit:
+                    return SystemExit()
+                now = getUTCmillis()
+                now_tick = now // self.tick_ms
+                while self._current_tick < now_tick:
+                    self._advance()
+                if self._due:
+                    batch = self._due
+                    self._due = []
+                    self._size -= len(batch)
+                    alive = [item for item in batch if item.flag_alive]
+                    self.num_discarded += len(batch) - len(alive)
+                    if alive:
+                        return alive
+                self.first_element_changed.wait(
+                    ((self._current_tick + 1) * self.tick_ms - now) / 1000.0
+                )
+
+
 class SendThread(Thread):
+    """
+    Publishes metrics of one DCC. Up to batch_size metrics found waiting in
+    the queue, or arriving within the publish_window of the DCC, are
+    published together through DataCenterComponent publish_many(), e.g. in
+    one write on the connection of the DCC.
+    """
 
-    def __init__(self, name=None):
+    def __init__(self, queue, name=None, batch_size=1):
         Thread.__init__(self, name=name)
         self.flag_alive = True
+        self._queue = queue
+        self._batch_size = batch_size
         self.start()
 
+    def _get_batch(self):
+        batch = [self._queue.get()]
+        deadline = None
+        if self._batch_size > 1 and not isinstance(batch[0], SystemExit):
+            publish_window = getattr(batch[0].ref_dcc, 'publish_window', 0)
+            if publish_window > 0:
+                deadline = _time() + publish_window
+        while len(batch) < self._batch_size \
+                and not isinstance(batch[-1], SystemExit):
+            try:
+                if deadline is None:
+                    batch.append(self._queue.get(block=False))
+                else:
+                    timeout = deadline - _time()
+                    if timeout <= 0:
+                        break
+                    batch.append(self._queue.get(timeout=timeout))
+            except Empty:
+                break
+        return batch
+
     def run(self):
-        log.info("Started SendThread")
-        global send_queue
+        log.info("Started %s" % str(self.name))
         while self.flag_alive:
             log.debug("Waiting to send...")
-            metric = send_queue.get()
-            if isinstance(metric, SystemExit):
+            batch = self._get_batch()
+            if isinstance(batch[-1], SystemExit):
                 log.debug("Got exit signal")
-                break
-            log.debug("Got item in send_queue: " + str(metric))
-            if not metric.flag_alive:
-                log.debug("Discarded dead metric: %s" % str(metric))
+                self.flag_alive = False
+                batch.pop()
+            metrics = []
+            for metric in batch:
+                log.debug("Got item in send_queue: " + str(metric))
+                if not metric.flag_alive:
+                    log.debug("Discarded dead metric: %s" % str(metric))
+                    continue
+                metrics.append(metric)
+            if not metrics:
                 continue
-            metric.send_data()
+            try:
+                if len(metrics) == 1:
+                    metrics[0].send_data()
+                else:
+                    type(metrics[0]).send_data_many(metrics)
+            except Exception:
+                log.exception("Error sending data for metrics " +
+                              ", ".join(str(metric) for metric in metrics))
         log.info("Thread exits: %s" % str(self.name))
 
 
+class BatchFlushTimer(Thread):
+    """
+    Send stage timer flushing metrics with a max_batch_age_ms: a metric is
+    queued for sending when the deadline of its oldest unsent value passes,
+    even if its aggregation_size is not reached yet.
+    """
+
+    def __init__(self, name=None):
+        Thread.__init__(self, name=name)
+        self.daemon = True
+        self.flag_alive = True
+        self._cv = Condition(Lock())
+        # Heap of [deadline in ms, sequence number, RegisteredMetric]
+        self._deadlines = []
+        self._seq = 0
+        self.num_flushes = 0
+        self.start()
+
+    def schedule(self, metric, deadline):
+        with self._cv:
+            self._seq += 1
+            heapq.heappush(self._deadlines, [deadline, self._seq, metric])
+            if self._deadlines[0][2] is metric:
+                self._cv.notify()
+
+    def qsize(self):
+        with self._cv:
+            return len(self._deadlines)
+
+    def stop(self):
+        with self._cv:
+            self.flag_alive = False
+            self._cv.notify()
+
+    def _get_due(self):
+        with self._cv:
+            while self.flag_alive:
+                if not self._deadlines:
+                    self._cv.wait()
+                    continue
+                timeout = self._deadlines[0][0] - getUTCmillis()
+                if timeout > 0:
+                    self._cv.wait(timeout / 1000.0)
+                    continue
+                now = getUTCmillis()
+                due = []
+                while self._deadlines and self._deadlines[0][0] <= now:
+                    due.append(heapq.heappop(self._deadlines)[2])
+                return due, now
+        return None, None
+
+    def run(self):
+        log.info("Started %s" % str(self.name))
+        while True:
+            due, now = self._get_due()
+            if due is None:
+                break
+            for metric in due:
+                try:
+                    if metric.flag_alive and metric.flush_expired_batch(now):
+                        self.num_flushes += 1
+                except Exception:
+                    log.exception("Error flushing metric " + str(metric))
+        log.info("Thread exits: %s" % str(self.name))
+
+
+class SendDispatcher:
+    """
+    Send stage of metric_handler. Each DCC gets its own queue and its own
+    SendThread(s), created when its first metric is ready to send, so that
+    a slow or stalled DCC does not hold back publishing to the others.
+
+    With more than one thread per DCC, the DCC and its DCCComms must be
+    safe to publish from several threads at once.
+    """
+
+    def __init__(self, num_threads_per_dcc=1, queue_size=0,
+                 queue_policy=OverflowPolicy.BLOCK, batch_size=1):
+        self._num_threads_per_dcc = num_threads_per_dcc
+        self._batch_size = batch_size
+        self._queue_size = queue_size
+        self._queue_policy = queue_policy
+        self._lock = Lock()
+        # key: id of DCC, value: [DCC, Queue, list of SendThread]
+        self._dcc_records = {}
+
+    def _get_record(self, dcc):
+        record = self._dcc_records.get(id(dcc))
+        if record is not None:
+            return record
+        with self._lock:
+            record = self._dcc_records.get(id(dcc))
+            if record is None:
+                queue = BoundedQueue(self._queue_size, self._queue_policy,
+                                     on_drop=_on_send_dropped)
+                dcc_name = "%s-%d" % (type(dcc).__name__,
+                                      len(self._dcc_records) + 1)
+                threads = [SendThread(queue,
+                                      name="SendThread-%s-%d" % (dcc_name,
+                                                                 j + 1),
+                                      batch_size=self._batch_size)
+                           for j in range(self._num_threads_per_dcc)]
+                record = [dcc, queue, threads]
+                self._dcc_records[id(dcc)] = record
+            return record
+
+    def put(self, metric):
+        self._get_record(metric.ref_dcc)[1].put(metric)
+
+    def qsize(self):
+        with self._lock:
+            return sum(record[1].qsize()
+                       for record in self._dcc_records.values())
+
+    def get_stats(self):
+        """
+        :return: List of [DCC class name, queue size, number of threads,
+                 number of dropped metrics]
+        """
+        with self._lock:
+            return [[type(record[0]).__name__,
+                     record[1].qsize(),
+                     len(record[2]),
+                     record[1].num_dropped]
+                    for record in self._dcc_records.values()]
+
+    def get_num_dropped(self):
+        with self._lock:
+            return sum(record[1].num_dropped
+                       for record in self._dcc_records.values())
+
+    def terminate(self):
+        with self._lock:
+            for record in self._dcc_records.values():
+                for tref in record[2]:
+                    tref.flag_alive = False
+                    record[1].put_control(SystemExit())
+
+
 class CollectionThread(Thread):
 
-    def __init__(self, worker_stat_lock, name=None):
+    def __init__(self, worker_stat_lock, name=None, pool=None,
+                 idle_timeout=None):
         Thread.__init__(self, name=name)
         self.daemon = True
         self.working_obj = None
         self._worker_stat_lock = worker_stat_lock
+        self._pool = pool
+        self._idle_timeout = idle_timeout
         self.start()
 
     def run(self):
@@ -188,7 +689,15 @@ class CollectionThread(Thread):
         global collect_queue
         global send_queue
         while True:
-            metric = collect_queue.get()
+            if self._idle_timeout is None:
+                metric = collect_queue.get()
+            else:
+                try:
+                    metric = collect_queue.get(timeout=self._idle_timeout)
+                except Empty:
+                    if self._pool.retire(self):
+                        break
+                    continue
             log.debug("Collecting stats for metric: " + str(metric))
             try:
                 if not metric.flag_alive:
@@ -196,7 +705,11 @@ class CollectionThread(Thread):
                     continue
                 with self._worker_stat_lock:
                     self.working_obj = metric
+                metric.hist_scheduling_lag.record(
+                    getUTCmillis() - metric.get_next_run_time())
+                start = _time()
                 metric.collect()
+                metric.hist_collect_latency.record((_time() - start) * 1000)
                 with self._worker_stat_lock:
                     self.working_obj = None
                 if not metric.flag_alive:
@@ -204,28 +717,85 @@ class CollectionThread(Thread):
                     continue
                 metric.set_next_run_time()
                 event_ds.put_and_notify(metric)
-                if metric.is_ready_to_send():
-                    send_queue.put(metric)
-                    metric.reset_aggregation_size()
             except Exception as e:
                 log.error("Error collecting data for metric" + str(metric))
                 raise e
+        log.info("Thread exits: %s" % str(self.name))
 
 
 class CollectionThreadPool:
+    """
+    Pool of collection threads.
+
+    With autoscale enabled, the pool starts with min_threads threads, grows
+    up to num_threads while collect_queue has more metrics waiting than there
+    are idle threads, and threads idle for idle_timeout seconds exit until
+    the pool is back to min_threads.
+    """
 
-    def __init__(self, num_threads):
+    def __init__(self, num_threads, autoscale=False, min_threads=1,
+                 idle_timeout=60):
         self._num_threads = num_threads
         self._pool = []
         self._worker_stat_lock = Lock()
+        self._autoscale = autoscale and min_threads < num_threads
+        self._min_threads = min_threads if self._autoscale else num_threads
+        self._idle_timeout = idle_timeout if self._autoscale else None
+        self._num_created = 0
+        self._num_scale_ups = 0
+        self._num_scale_downs = 0
 
-        log.info("Starting " + str(num_threads) + " for collection")
-        for j in range(num_threads):
+        log.info("Starting " + str(self._min_threads) + " for collection")
+        with self._worker_stat_lock:
+            self._spawn(self._min_threads)
+
+    def _spawn(self, num_threads):
+        for _ in range(num_threads):
+            self._num_created += 1
             self._pool.append(CollectionThread(
                 self._worker_stat_lock,
-                name="Collector-%d" % (j + 1)
+                name="Collector-%d" % self._num_created,
+                pool=self,
+                idle_timeout=self._idle_timeout
             ))
 
+    def scale(self, backlog):
+        """
+        Grows the pool when more metrics are waiting in collect_queue than
+        there are idle threads. Does nothing unless autoscale is enabled.
+
+        :param backlog: Number of metrics waiting in collect_queue
+        """
+        if not self._autoscale:
+            return
+        with self._worker_stat_lock:
+            num_idle = len([tref for tref in self._pool
+                            if tref.working_obj is None])
+            num_new = min(backlog - num_idle,
+                          self._num_threads - len(self._pool))
+            if num_new <= 0:
+                return
+            self._spawn(num_new)
+            self._num_scale_ups += 1
+            log.info("Collection pool grows to %d threads, backlog: %d"
+                     % (len(self._pool), backlog))
+
+    def retire(self, tref):
+        """
+        Called by an idle thread; removes it from the pool unless the pool is
+        already at its minimum size.
+
+        :return: True if the thread should exit
+        """
+        with self._worker_stat_lock:
+            if len(self._pool) <= self._min_threads:
+                return False
+            self._pool.remove(tref)
+            self._num_scale_downs += 1
+            log.info("Collection pool shrinks to %d threads"
+                     % len(self._pool))
+            return True
+
     def get_num_threads(self):
         return self._num_threads
 
@@ -247,9 +817,128 @@ class CollectionThreadPool:
                 num_all,
                 self._num_threads]
 
+    def get_stats_scaling(self):
+        return [self._autoscale,
+                self._min_threads,
+                self._num_scale_ups,
+                self._num_scale_downs]
+
+
+def _sample_in_process(sampling_function, args_required):
+    """
+    Runs a sampling function in a worker process of CollectionProcessPool.
+    Single values are timestamped here, when they are sampled.
+    """
+    if args_required != 0:
+        collected_data = sampling_function(1)
+    else:
+        collected_data = sampling_function()
+    if collected_data is None or isinstance(collected_data, (list, tuple)):
+        return collected_data
+    return (getUTCmillis(), collected_data)
+
+
+def _check_in_process(sampling_function):
+    # Unpickling the task already imported the module of sampling_function
+    return True
+
+
+class CollectionProcessPool:
+    """
+    Pool of worker processes running sampling functions of metrics created
+    with collect_in_process=True, so that CPU-bound sampling functions are
+    not serialized on the GIL. The collection thread waits for the result
+    without holding the GIL.
+
+    Sampling functions and their results are pickled, so sampling functions
+    must be module-level functions that do not rely on state of the liota
+    process. Workers are forked when the pool starts, so they can not import
+    modules loaded later, e.g. packages loaded by the package manager; check()
+    tells whether a sampling function can run in a worker.
+
+    A worker that dies on a task, e.g. while unpickling it, never returns
+    its result, so waiting for results times out after timeout seconds.
+    """
+
+    def __init__(self, num_processes, timeout=60):
+        self._num_processes = num_processes
+        self._timeout = timeout
+        self._pool = Pool(num_processes)
+        log.info("Started " + str(num_processes)
+                 + " processes for collection")
+
+    def check(self, sampling_function):
+        """
+        :return: True if a worker can run sampling_function
+        """
+        try:
+            return self._pool.apply_async(
+                _check_in_process, (sampling_function,)
+            ).get(self._timeout)
+        except Exception as e:
+            log.debug("Worker process failed check: %s" % str(e))
+            return False
+
+    def sample(self, sampling_function, args_required):
+        """
+        :raises multiprocessing.TimeoutError: no result within timeout
+        """
+        return self._pool.apply_async(
+            _sample_in_process, (sampling_function, args_required)
+        ).get(self._timeout)
+
+    def get_num_processes(self):
+        return self._num_processes
+
+    def terminate(self):
+        self._pool.terminate()
+
+
+def _on_collect_dropped(metric):
+    # The metric is out of the scheduler while in collect_queue; skip this
+    # tick and put it back, or it would never be collected again.
+    log.debug("Dropped metric from collecting queue: %s" % str(metric))
+    metric.skipped_ticks += 1
+    metric.set_next_run_time()
+    event_ds.put_and_notify(metric)
+
+
+def _on_send_dropped(metric):
+    # Values stay buffered in the metric and go out with its next send
+    log.debug("Dropped metric from sending queue: %s" % str(metric))
+    metric.cancel_sending()
+
+
+def add_active_metric(metric):
+    with active_metrics_lock:
+        active_metrics.add(metric)
+
+
+def remove_active_metric(metric):
+    with active_metrics_lock:
+        active_metrics.discard(metric)
+
+
+def get_active_metrics():
+    with active_metrics_lock:
+        return list(active_metrics)
+
+
 is_initialization_done = False
 
 
+def _read_core_config(name, default):
+    """
+    Returns an optional option of CORE_CFG section in liota.conf, or default
+    when it is not specified.
+    """
+    try:
+        return read_liota_config('CORE_CFG', name)
+    except Exception:
+        log.debug("CORE_CFG %s not found, using %s" % (name, str(default)))
+        return default
+
+
 def initialize():
     global is_initialization_done
     if is_initialization_done:
@@ -257,25 +946,70 @@ def initialize():
         pass
     else:
         log.debug("Initializing.............")
+        # Fork worker processes before the threads of metric_handler start;
+        # threads of the caller, e.g. the package manager, may already run
+        global collect_process_pool
+        collect_process_pool_size = int(_read_core_config(
+            'collect_process_pool_size', 0))
+        if collect_process_pool is None and collect_process_pool_size > 0:
+            collect_process_pool = CollectionProcessPool(
+                collect_process_pool_size,
+                timeout=float(_read_core_config(
+                    'collect_process_timeout', 60)))
+        scheduler = _read_core_config('scheduler', 'heap')
         global event_ds
-        if event_ds is None:
-            event_ds = EventsPriorityQueue()
         global event_checker_thread
+        if scheduler == 'timing_wheel':
+            if event_ds is None:
+                event_ds = TimingWheel(int(
+                    _read_core_config('timing_wheel_tick_ms', 100)))
+        else:
+            if scheduler != 'heap':
+                log.warning("Unknown scheduler %s, using heap" % scheduler)
+            if event_ds is None:
+                event_ds = EventsPriorityQueue()
+        global dispatch_stats
+        if dispatch_stats is None:
+            dispatch_stats = DispatchStats()
         if event_checker_thread is None:
             event_checker_thread = EventCheckerThread(
                 name="EventCheckerThread")
         global collect_queue
         if collect_queue is None:
-            collect_queue = Queue()
+            collect_queue_size, collect_queue_policy = \
+                get_overflow_config(
+                    'collect_queue', unsupported=(OverflowPolicy.DOWNSAMPLE,),
+                    fallback_policy=OverflowPolicy.DROP_OLDEST)
+            collect_queue = BoundedQueue(collect_queue_size,
+                                         collect_queue_policy,
+                                         on_drop=_on_collect_dropped)
         global send_queue
         if send_queue is None:
-            send_queue = Queue()
-        global send_thread
-        if send_thread is None:
-            send_thread = SendThread(name="SendThread")
+            send_queue_size, send_queue_policy = \
+                get_overflow_config(
+                    'send_queue', unsupported=(OverflowPolicy.DOWNSAMPLE,),
+                    fallback_policy=OverflowPolicy.DROP_OLDEST)
+            send_queue = SendDispatcher(
+                num_threads_per_dcc=int(_read_core_config(
+                    'send_threads_per_dcc', 1)),
+                queue_size=send_queue_size,
+                queue_policy=send_queue_policy,
+                batch_size=int(_read_core_config('send_batch_size', 1))
+            )
+        global flush_timer
+        if flush_timer is None:
+            flush_timer = BatchFlushTimer(name="BatchFlushTimer")
         global collect_thread_pool
         collect_thread_pool_size = int(read_liota_config('CORE_CFG','collect_thread_pool_size')) 
-        collect_thread_pool = CollectionThreadPool(collect_thread_pool_size)
+        collect_thread_pool = CollectionThreadPool(
+            collect_thread_pool_size,
+            autoscale=_read_core_config(
+                'collect_thread_pool_autoscale', 'False') == 'True',
+            min_threads=int(_read_core_config(
+                'collect_thread_pool_min_size', 1)),
+            idle_timeout=float(_read_core_config(
+                'collect_thread_idle_timeout', 60))
+        )
         is_initialization_done = True
 
 
@@ -283,12 +1017,17 @@ def terminate():
     global event_checker_thread
     if event_checker_thread:
         event_checker_thread.flag_alive = False
-    global send_thread
-    if send_thread:
-        send_thread.flag_alive = False
     global event_ds
     if event_ds:
         event_ds.put_and_notify(SystemExit(), timeout=0)
     global send_queue
     if send_queue:
-        send_queue.put(SystemExit())
+        send_queue.terminate()
+    global flush_timer
+    if flush_timer:
+        flush_timer.stop()
+    global collect_process_pool
+    if collect_process_pool:
+        process_pool = collect_process_pool
+        collect_process_pool = None
+        process_pool.terminate()
@@ -310,12 +310,13 @@ class PackageThread(Thread):
         if parameter == "metrics" or parameter == "met":
             from liota.core.metric_handler \
                 import event_ds, collect_queue, send_queue, \
-                CollectionThreadPool, collect_thread_pool
+                CollectionThreadPool, collect_thread_pool, \
+                DispatchStats, dispatch_stats
 
             stats = ["n/a", "n/a", "n/a", "n/a"]
-            if isinstance(event_ds, Queue):
+            if event_ds is not None:
                 stats[0] = str(event_ds.qsize())
-            if isinstance(send_queue, Queue):
+            if send_queue is not None:
                 stats[1] = str(send_queue.qsize())
             if isinstance(collect_queue, Queue):
                 stats[2] = str(collect_queue.qsize())
@@ -327,6 +328,52 @@ class PackageThread(Thread):
                          + "Collecting queue: %s\n\t"
                          + "Collecting threads: %s"
                          ) % tuple(stats))
+            stats = ["n/a", "n/a", "n/a", "n/a", "n/a"]
+            if isinstance(dispatch_stats, DispatchStats):
+                stats = map(
+                    lambda n: str(n),
+                    dispatch_stats.get_stats()
+                )
+            log.warning(("Dispatch of due metrics - \n\t"
+                         + "Batches: %s\n\t"
+                         + "Average batch size: %s\n\t"
+                         + "Maximum batch size: %s\n\t"
+                         + "Average scheduling lag (ms): %s\n\t"
+                         + "Maximum scheduling lag (ms): %s"
+                         ) % tuple(stats))
+            if send_queue is not None:
+                log.warning("Sending queues of DCCs - \n\t%s"
+                            % "\n\t".join(map(
+                                lambda dcc_stats: "%s: %d queued, %d threads, "
+                                "%d dropped" % tuple(dcc_stats),
+                                send_queue.get_stats()
+                            ))
+                            )
+            from liota.core.metric_handler import flush_timer
+            if flush_timer is not None:
+                log.warning(("Batch flush timer - \n\t"
+                             + "Pending deadlines: %d\n\t"
+                             + "Flushes by batch age: %d"
+                             ) % (flush_timer.qsize(),
+                                  flush_timer.num_flushes))
+            from liota.core.metric_handler import get_active_metrics
+
+            active_metrics = get_active_metrics()
+            log.warning(("Dropped by overflow policies - \n\t"
+                         + "Collecting queue: %s\n\t"
+                         + "Sending queues: %s\n\t"
+                         + "Samples in metric buffers: %d"
+                         ) % (str(collect_queue.num_dropped)
+                              if collect_queue is not None else "n/a",
+                              str(send_queue.get_num_dropped())
+                              if send_queue is not None else "n/a",
+                              sum(m.values.num_dropped
+                                  for m in active_metrics)))
+            log.warning(("Overrun of metrics - \n\t"
+                         + "Late ticks: %d\n\t"
+                         + "Skipped ticks: %d"
+                         ) % (sum(m.late_ticks for m in active_metrics),
+                              sum(m.skipped_ticks for m in active_metrics)))
             return
         if parameter == "collection_threads" or parameter == "col":
             from liota.core.metric_handler \
@@ -344,6 +391,39 @@ class PackageThread(Thread):
                          + "Pool: %s\n\t"
                          + "Capacity: %s"
                          ) % tuple(stats))
+            stats = ["n/a", "n/a", "n/a", "n/a"]
+            if isinstance(collect_thread_pool, CollectionThreadPool):
+                stats = map(
+                    lambda n: str(n),
+                    collect_thread_pool.get_stats_scaling()
+                )
+            log.warning(("Scaling of collection threads - \n\t"
+                         + "Autoscale: %s\n\t"
+                         + "Minimum: %s\n\t"
+                         + "Scale ups: %s\n\t"
+                         + "Scale downs: %s"
+                         ) % tuple(stats))
+            return
+        if parameter == "latency" or parameter == "lat":
+            from liota.core.metric_handler import get_active_metrics
+
+            lines = []
+            for metric in sorted(get_active_metrics(),
+                                 key=lambda m: str(m.ref_entity.name)):
+                lines.append(("%s\n\t\t"
+                              + "Scheduling lag (ms): %s\n\t\t"
+                              + "Collect latency (ms): %s\n\t\t"
+                              + "Publish latency (ms): %s\n\t\t"
+                              + "Values per publish: %s\n\t\t"
+                              + "Late/skipped ticks: %d/%d"
+                              ) % (metric.ref_entity.name,
+                                   metric.hist_scheduling_lag,
+                                   metric.hist_collect_latency,
+                                   metric.hist_publish_latency,
+                                   metric.hist_values_per_publish,
+                                   metric.late_ticks,
+                                   metric.skipped_ticks))
+            log.warning("Latency of metrics - \n\t%s" % "\n\t".join(lines))
             return
         if parameter == "threads" or parameter == "th":
             import threading
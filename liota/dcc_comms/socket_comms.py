@@ -29,8 +29,15 @@
 #  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF     #
 #  THE POSSIBILITY OF SUCH DAMAGE.                                            #
 # ----------------------------------------------------------------------------#
+import errno
+import fcntl
 import logging
+import os
+import select
 import socket
+from collections import deque
+from threading import Lock, Thread, current_thread
+from time import time
 
 from liota.dcc_comms.dcc_comms import DCCComms
 
@@ -38,15 +45,25 @@ from liota.dcc_comms.dcc_comms import DCCComms
 log = logging.getLogger(__name__)
 
 
+def _set_socket_options(sock, tcp_nodelay, keepalive):
+    if tcp_nodelay:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    if keepalive:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+
+
 class SocketDccComms(DCCComms):
 
-    def __init__(self, ip, port):
+    def __init__(self, ip, port, tcp_nodelay=False, keepalive=False):
         self.ip = ip
         self.port = port
+        self.tcp_nodelay = tcp_nodelay
+        self.keepalive = keepalive
         self._connect()
 
     def _connect(self):
         self.sock = socket.socket()
+        _set_socket_options(self.sock, self.tcp_nodelay, self.keepalive)
         log.info("Establishing Socket Connection")
         try:
             self.sock.connect((self.ip, self.port))
@@ -59,7 +76,10 @@ class SocketDccComms(DCCComms):
             raise ex
 
     def _disconnect(self):
-        raise NotImplementedError
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+            log.info("Socket Closed")
 
     def send(self, message, msg_attr=None):
         log.debug("Publishing message:" + str(message))
@@ -68,3 +88,209 @@ class SocketDccComms(DCCComms):
 
     def receive(self):
         raise NotImplementedError
+
+
+class BufferedSocketDccComms(SocketDccComms):
+    """
+    Socket DCCComms whose send() only appends the message to a write buffer.
+    An I/O thread writes the buffer to a non-blocking socket as it becomes
+    writable, so a slow receiver does not stall the send threads of
+    metric_handler, and reconnects with exponential backoff when the
+    connection is lost or can not be established.
+
+    When the buffer holds more than buffer_size bytes, oldest messages are
+    dropped. A message partly written when the connection is lost is
+    written again from its start after reconnecting.
+    """
+
+    def __init__(self, ip, port, tcp_nodelay=True, keepalive=True,
+                 buffer_size=16 * 1024 * 1024, connect_timeout=10,
+                 retry_interval=1, max_retry_interval=60):
+        self.buffer_size = buffer_size
+        self.connect_timeout = connect_timeout
+        self.retry_interval = retry_interval
+        self.max_retry_interval = max_retry_interval
+        self.bytes_queued = 0
+        self.bytes_sent = 0
+        self.bytes_dropped = 0
+        self.num_reconnects = 0
+        self.sock = None
+        self._buffer = deque()
+        self._buffered_bytes = 0
+        # Bytes of the first message in buffer written on this connection
+        self._head_offset = 0
+        self._lock = Lock()
+        self._flag_alive = False
+        self._io_thread = None
+        super(BufferedSocketDccComms, self).__init__(ip, port, tcp_nodelay,
+                                                     keepalive)
+
+    def _connect(self):
+        """
+        Starts the I/O thread, which connects in the background.
+        """
+        if self._io_thread is not None and self._io_thread.is_alive():
+            return
+        self._wake_r, self._wake_w = os.pipe()
+        for fd in (self._wake_r, self._wake_w):
+            fcntl.fcntl(fd, fcntl.F_SETFL,
+                        fcntl.fcntl(fd, fcntl.F_GETFL) | os.O_NONBLOCK)
+        self._flag_alive = True
+        self._io_thread = Thread(target=self._run,
+                                 name="SocketIOThread-%s:%s" % (self.ip,
+                                                                self.port))
+        self._io_thread.daemon = True
+        self._io_thread.start()
+
+    def _disconnect(self):
+        if self._io_thread is None:
+            return
+        self._flag_alive = False
+        self._wake()
+        # At most one connection attempt to wait for
+        self._io_thread.join(self.connect_timeout + 1)
+        if self._io_thread.is_alive():
+            # Still using the pipe and socket, left to be closed on exit
+            log.warning("%s did not stop" % self._io_thread.name)
+            self._io_thread = None
+            return
+        self._io_thread = None
+        self._close_socket()
+        os.close(self._wake_r)
+        os.close(self._wake_w)
+
+    def send(self, message, msg_attr=None):
+        if not message:
+            return
+        with self._lock:
+            self._buffer.append(message)
+            self._buffered_bytes += len(message)
+            self.bytes_queued += len(message)
+            # A message partly written is kept, not to cut a line in two
+            first = 1 if self._head_offset > 0 else 0
+            while self._buffered_bytes > self.buffer_size \
+                    and len(self._buffer) > first + 1:
+                dropped = self._buffer[first]
+                del self._buffer[first]
+                self._buffered_bytes -= len(dropped)
+                self.bytes_dropped += len(dropped)
+        self._wake()
+
+    def get_stats(self):
+        """
+        :return: [bytes queued, sent, dropped, buffered, reconnections]
+        """
+        with self._lock:
+            return [self.bytes_queued, self.bytes_sent, self.bytes_dropped,
+                    self._buffered_bytes - self._head_offset,
+                    self.num_reconnects]
+
+    def _wake(self):
+        try:
+            os.write(self._wake_w, 'x')
+        except OSError as ex:
+            # Pipe full, the I/O thread is being woken up anyway
+            if ex.errno != errno.EAGAIN:
+                raise
+
+    def _drain_wake(self):
+        try:
+            while os.read(self._wake_r, 4096):
+                pass
+        except OSError as ex:
+            if ex.errno != errno.EAGAIN:
+                raise
+
+    def _sleep(self, seconds):
+        # Sleep which _disconnect() interrupts
+        deadline = time() + seconds
+        while self._flag_alive:
+            remaining = deadline - time()
+            if remaining <= 0:
+                return
+            if select.select([self._wake_r], [], [], remaining)[0]:
+                self._drain_wake()
+
+    def _close_socket(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    def _open_socket(self):
+        sock = socket.socket()
+        _set_socket_options(sock, self.tcp_nodelay, self.keepalive)
+        sock.settimeout(self.connect_timeout)
+        try:
+            sock.connect((self.ip, self.port))
+        except Exception:
+            sock.close()
+            raise
+        sock.setblocking(False)
+        self.sock = sock
+        with self._lock:
+            # Write again what the lost connection may not have delivered
+            self._head_offset = 0
+
+    def _run(self):
+        log.info("Started %s" % current_thread().name)
+        retry_interval = self.retry_interval
+        connected_once = False
+        while self._flag_alive:
+            if self.sock is None:
+                try:
+                    self._open_socket()
+                    log.info("Socket connected to %s:%s" % (self.ip,
+                                                            self.port))
+                    if connected_once:
+                        self.num_reconnects += 1
+                    connected_once = True
+                    retry_interval = self.retry_interval
+                except Exception as ex:
+                    log.warning("Unable to connect to %s:%s (%s), retrying "
+                                "in %s s" % (self.ip, self.port, str(ex),
+                                             retry_interval))
+                    self._sleep(retry_interval)
+                    retry_interval = min(retry_interval * 2,
+                                         self.max_retry_interval)
+                    continue
+            try:
+                self._poll()
+            except (socket.error, select.error) as ex:
+                log.warning("Socket connection to %s:%s lost (%s)" %
+                            (self.ip, self.port, str(ex)))
+                self._close_socket()
+        log.info("Thread exits: %s" % current_thread().name)
+
+    def _poll(self):
+        writers = [self.sock] if self._buffer else []
+        readable, writable, _ = select.select([self.sock, self._wake_r],
+                                              writers, [], 1.0)
+        if self._wake_r in readable:
+            self._drain_wake()
+        if self.sock in readable:
+            # Nothing is expected from the receiver but end of connection
+            if not self.sock.recv(4096):
+                raise socket.error(errno.ECONNRESET, "Closed by peer")
+        if self.sock in writable:
+            self._write()
+
+    def _write(self):
+        with self._lock:
+            if not self._buffer:
+                return
+            message = self._buffer[0]
+            offset = self._head_offset
+        try:
+            num_sent = self.sock.send(message[offset:offset + 65536])
+        except socket.error as ex:
+            if ex.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                return
+            raise
+        with self._lock:
+            self.bytes_sent += num_sent
+            if self._buffer and self._buffer[0] is message:
+                self._head_offset += num_sent
+                if self._head_offset >= len(message):
+                    self._buffer.popleft()
+                    self._buffered_bytes -= len(message)
+                    self._head_offset = 0
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------#
+#  Copyright © 2015-2016 VMware, Inc. All Rights Reserved.                    #
+#                                                                             #
+#  Licensed under the BSD 2-Clause License (the “License”); you may not use   #
+#  this file except in compliance with the License.                           #
+#                                                                             #
+#  The BSD 2-Clause License                                                   #
+#                                                                             #
+#  Redistribution and use in source and binary forms, with or without         #
+#  modification, are permitted provided that the following conditions are met:#
+#                                                                             #
+#  - Redistributions of source code must retain the above copyright notice,   #
+#      this list of conditions and the following disclaimer.                  #
+#                                                                             #
+#  - Redistributions in binary form must reproduce the above copyright        #
+#      notice, this list of conditions and the following disclaimer in the    #
+#      documentation and/or other materials provided with the distribution.   #
+#                                                                             #
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"#
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE  #
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE #
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE  #
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR        #
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF       #
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS   #
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN    #
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)    #
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF     #
+#  THE POSSIBILITY OF SUCH DAMAGE.                                            #
+# ----------------------------------------------------------------------------#
+
+import cPickle as pickle
+import logging
+from threading import Condition, Lock, Thread
+from time import sleep
+
+from liota.dcc_comms.dcc_comms import DCCComms
+from liota.lib.utilities.segment_log import SegmentLog
+
+log = logging.getLogger(__name__)
+
+
+class StoreAndForwardDccComms(DCCComms):
+    """
+    Wraps a DCCComms so that messages which can not be sent, e.g. during an
+    outage of the uplink, are not lost: they are appended to a SegmentLog on
+    disk, and sent again in order by a replay thread once the wrapped
+    DCCComms reconnects. While older messages are waiting in the log, new
+    ones are appended after them.
+
+    Messages are sent at least once: after a crash, those replayed but not
+    yet committed in the log are sent again. The wrapped DCCComms must raise
+    when sending fails, e.g. WebSocketDccComms with exit_on_failure=False.
+
+    Attributes other than the ones below are looked up on the wrapped
+    DCCComms, e.g. wss of WebSocketDccComms used by IotControlCenter.
+    """
+
+    def __init__(self, comms, log_path, segment_size=16 * 1024 * 1024,
+                 max_size=None, max_replay_rate=None, fsync=False,
+                 retry_interval=1, max_retry_interval=60):
+        """
+        :param comms: DCCComms to send messages with
+        :param log_path: Directory of the log of unsent messages
+        :param segment_size: Bytes of a segment file of the log
+        :param max_size: Bytes of the log beyond which oldest messages are
+                         dropped, None for unlimited
+        :param max_replay_rate: Messages per second sent from the log, None
+                                for unlimited
+        :param fsync: Sync the log to disk on every append
+        :param retry_interval: Seconds before reconnecting, doubled after
+                               each failure up to max_retry_interval
+        """
+        if not isinstance(comms, DCCComms):
+            raise TypeError("DCCComms object is expected")
+        self.comms = comms
+        self.log = SegmentLog(log_path, segment_size, max_size, fsync)
+        self.max_replay_rate = max_replay_rate
+        self.retry_interval = retry_interval
+        self.max_retry_interval = max_retry_interval
+        self.num_sent = 0
+        self.num_stored = 0
+        self.num_replayed = 0
+        self._connected = True
+        self._lock = Lock()
+        self._cv = Condition(self._lock)
+        self._replay_thread = Thread(target=self._replay,
+                                     name="StoreAndForwardReplay")
+        self._replay_thread.daemon = True
+        self._flag_alive = True
+        self._replay_thread.start()
+
+    def __getattr__(self, name):
+        comms = self.__dict__.get('comms')
+        if comms is None:
+            raise AttributeError(name)
+        return getattr(comms, name)
+
+    def _connect(self):
+        try:
+            self.comms._disconnect()
+        except Exception:
+            # Not implemented, or already disconnected
+            pass
+        self.comms._connect()
+
+    def _disconnect(self):
+        with self._cv:
+            self._flag_alive = False
+            self._cv.notify()
+        self.comms._disconnect()
+
+    def send(self, message, msg_attr=None):
+        with self._lock:
+            if self._connected and self.log.is_empty():
+                try:
+                    self.comms.send(message, msg_attr)
+                    self.num_sent += 1
+                    return
+                except (Exception, SystemExit):
+                    log.exception("Sending failed, storing messages until "
+                                  "reconnected")
+                    self._connected = False
+            self.log.append(pickle.dumps((message, msg_attr), 2))
+            self.num_stored += 1
+            self._cv.notify()
+
+    def receive(self):
+        return self.comms.receive()
+
+    def get_stats(self):
+        """
+        :return: [messages sent directly, stored, replayed, pending in log]
+        """
+        with self._lock:
+            return [self.num_sent, self.num_stored, self.num_replayed,
+                    self.log.num_pending]
+
+    def _reconnect(self, retry_interval):
+        """
+        :return: Seconds to wait before next attempt, 0 if reconnected
+        """
+        try:
+            self._connect()
+        except (Exception, SystemExit):
+            # WebSocket exits on failure unless told otherwise
+            log.warning("Reconnecting failed, retrying in %s s" %
+                        retry_interval)
+            return min(retry_interval * 2, self.max_retry_interval)
+        log.info("Reconnected, replaying %d stored messages" %
+                 self.log.num_pending)
+        with self._lock:
+            self._connected = True
+        return 0
+
+    def _replay(self):
+        retry_interval = self.retry_interval
+        while True:
+            with self._cv:
+                while self._flag_alive and self.log.is_empty():
+                    self._cv.wait(1)
+                if not self._flag_alive:
+                    break
+                connected = self._connected
+                data = self.log.read() if connected else None
+            if not connected:
+                sleep(retry_interval)
+                next_interval = self._reconnect(retry_interval)
+                retry_interval = next_interval or self.retry_interval
+                continue
+            if data is None:
+                continue
+            message, msg_attr = pickle.loads(data)
+            try:
+                self.comms.send(message, msg_attr)
+            except (Exception, SystemExit):
+                log.warning("Sending stored message failed")
+                with self._lock:
+                    self._connected = False
+                continue
+            with self._lock:
+                self.log.advance()
+                self.num_replayed += 1
+            if self.max_replay_rate:
+                sleep(1.0 / self.max_replay_rate)
+        log.info("Replay of stored messages stopped")
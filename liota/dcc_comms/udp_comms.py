@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------#
+#  Copyright © 2015-2016 VMware, Inc. All Rights Reserved.                    #
+#                                                                             #
+#  Licensed under the BSD 2-Clause License (the “License”); you may not use   #
+#  this file except in compliance with the License.                           #
+#                                                                             #
+#  The BSD 2-Clause License                                                   #
+#                                                                             #
+#  Redistribution and use in source and binary forms, with or without         #
+#  modification, are permitted provided that the following conditions are met:#
+#                                                                             #
+#  - Redistributions of source code must retain the above copyright notice,   #
+#      this list of conditions and the following disclaimer.                  #
+#                                                                             #
+#  - Redistributions in binary form must reproduce the above copyright        #
+#      notice, this list of conditions and the following disclaimer in the    #
+#      documentation and/or other materials provided with the distribution.   #
+#                                                                             #
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"#
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE  #
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE #
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE  #
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR        #
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF       #
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS   #
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN    #
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)    #
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF     #
+#  THE POSSIBILITY OF SUCH DAMAGE.                                            #
+# ----------------------------------------------------------------------------#
+import errno
+import logging
+import socket
+
+from liota.dcc_comms.dcc_comms import DCCComms
+
+
+log = logging.getLogger(__name__)
+
+# Payload of a datagram fitting an Ethernet frame: 1500 byte MTU less the
+# IPv4 (20 bytes) and UDP (8 bytes) headers
+DEFAULT_DATAGRAM_SIZE = 1472
+# Largest payload of a UDP datagram over IPv4
+MAX_DATAGRAM_SIZE = 65507
+
+
+class UdpDccComms(DCCComms):
+    """
+    DCCComms sending messages of newline terminated lines, like those of the
+    Graphite plaintext protocol, over UDP. Lines of a message are packed into
+    datagrams of at most max_datagram_size bytes, never splitting a line.
+    A line longer than max_datagram_size is sent in a datagram of its own.
+
+    Sending is fire-and-forget: there is no connection state and errors are
+    counted and logged, not raised, so an unreachable receiver never holds
+    up the caller.
+    """
+
+    def __init__(self, ip, port, max_datagram_size=DEFAULT_DATAGRAM_SIZE):
+        if not 0 < max_datagram_size <= MAX_DATAGRAM_SIZE:
+            raise ValueError("max_datagram_size must be in 1..%d" %
+                             MAX_DATAGRAM_SIZE)
+        self.ip = ip
+        self.port = port
+        self.max_datagram_size = max_datagram_size
+        self.num_datagrams = 0
+        self.bytes_sent = 0
+        self.num_errors = 0
+        self.sock = None
+        self._connect()
+
+    def _connect(self):
+        address = socket.getaddrinfo(self.ip, self.port, 0,
+                                     socket.SOCK_DGRAM)[0]
+        self.sock = socket.socket(address[0], socket.SOCK_DGRAM)
+        # Fixes the destination once, instead of resolving it per sendto()
+        self.sock.connect(address[4])
+        log.info("UDP socket ready to send to %s:%s" % (self.ip, self.port))
+
+    def _disconnect(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+            log.info("UDP socket closed")
+
+    def send(self, message, msg_attr=None):
+        log.debug("Publishing message:" + str(message))
+        size = self.max_datagram_size
+        length = len(message)
+        start = 0
+        while start < length:
+            end = start + size
+            if end < length:
+                cut = message.rfind('\n', start, end)
+                if cut < start:
+                    # Line longer than a datagram
+                    cut = message.find('\n', end)
+                    end = length if cut < 0 else cut + 1
+                else:
+                    end = cut + 1
+            self._send_datagram(message[start:end])
+            start = end
+
+    def _send_datagram(self, datagram):
+        try:
+            self.sock.send(datagram)
+        except socket.error as ex:
+            self.num_errors += 1
+            # ECONNREFUSED reports an ICMP port unreachable for an earlier
+            # datagram, the receiver not listening (yet)
+            if ex.errno != errno.ECONNREFUSED:
+                log.warning("Unable to send %d byte datagram to %s:%s (%s)" %
+                            (len(datagram), self.ip, self.port, str(ex)))
+            return
+        self.num_datagrams += 1
+        self.bytes_sent += len(datagram)
+
+    def get_stats(self):
+        """
+        :return: [datagrams sent, bytes sent, send errors]
+        """
+        return [self.num_datagrams, self.bytes_sent, self.num_errors]
+
+    def receive(self):
+        raise NotImplementedError
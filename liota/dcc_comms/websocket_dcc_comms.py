@@ -40,15 +40,23 @@ log = logging.getLogger(__name__)
 
 class WebSocketDccComms(DCCComms):
 
-    def __init__(self, url):
+    def __init__(self, url, encoder=None, exit_on_failure=True):
         self.url = url
+        self.encoder = encoder
+        self.exit_on_failure = exit_on_failure
+        self.wss = None
         self._connect()
 
     def _connect(self):
-        self.wss = WebSocket(self.url)
+        if self.wss is None:
+            self.wss = WebSocket(self.url, encoder=self.encoder,
+                                 exit_on_failure=self.exit_on_failure)
+        else:
+            # Reconnect the same WebSocket, which DCCs may hold on to
+            self.wss.connect_soc()
 
     def _disconnect(self):
-        raise NotImplementedError
+        self.wss.close()
 
     def send(self, message, msg_attr=None):
         self.wss.send(message)
@@ -43,6 +43,10 @@ class DataCenterComponent:
     """
     __metaclass__ = ABCMeta
 
+    # Seconds a send thread waits for more metrics of this DCC to become
+    # ready, to publish them together through publish_many()
+    publish_window = 0
+
     @abstractmethod
     def __init__(self, comms):
         if not isinstance(comms, DCCComms):
@@ -74,11 +78,24 @@ class DataCenterComponent:
         if not isinstance(reg_metric, RegisteredMetric):
             raise TypeError
         message = self._format_data(reg_metric)
+        if message is None:
+            # Nothing to send, e.g. values held by an aggregation window
+            return
         if hasattr(reg_metric, 'msg_attr'):
             self.comms.send(message, reg_metric.msg_attr)
         else:
             self.comms.send(message, None)
 
+    # -----------------------------------------------------------------------
+    # Publishes several metrics of this DCC at once. Override this method in
+    # subclasses which can combine messages of several metrics, e.g. into
+    # one write on the connection.
+    #
+
+    def publish_many(self, reg_metrics):
+        for reg_metric in reg_metrics:
+            self.publish(reg_metric)
+
     @abstractmethod
     def set_properties(self, reg_entity, properties):
         pass
@@ -29,7 +29,13 @@
 #  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF     #
 #  THE POSSIBILITY OF SUCH DAMAGE.                                            #
 # ----------------------------------------------------------------------------#
+import cPickle as pickle
 import logging
+import re
+import struct
+from itertools import izip
+from aenum import UniqueEnum
+from liota.dcc_comms.udp_comms import UdpDccComms
 from liota.dccs.dcc import DataCenterComponent
 from liota.entities.metrics.registered_metric import RegisteredMetric
 from liota.entities.metrics.metric import Metric
@@ -38,40 +44,145 @@ from liota.entities.registered_entity import RegisteredEntity
 
 log = logging.getLogger(__name__)
 
+# Carbon splits plaintext lines on whitespace
+_WHITESPACE = re.compile(r'\s+')
+
+
+class GraphiteProtocol(UniqueEnum):
+    """
+    Protocols of Carbon receivers, by default listening on port 2003 for
+    PLAINTEXT and on port 2004 for PICKLE.
+    """
+    PLAINTEXT = 0
+    PICKLE = 1
+
+
+class GraphiteLineEncoder:
+    """
+    Encodes samples of registered metrics into Graphite plaintext protocol
+    lines, "<path> <value> <timestamp in seconds>\n".
+
+    The escaped metric path, and the line format built from it, are
+    computed once per RegisteredMetric and kept in its graphite_path and
+    graphite_line_format attributes.
+    """
+
+    def get_path(self, reg_metric):
+        path = getattr(reg_metric, 'graphite_path', None)
+        if path is None:
+            path = _WHITESPACE.sub('_', str(reg_metric.ref_entity.name).strip())
+            reg_metric.graphite_path = path
+            reg_metric.graphite_line_format = \
+                path.replace('%', '%%') + ' %s %d\n'
+        return path
+
+    def encode(self, reg_metric, timestamps, values):
+        self.get_path(reg_metric)
+        line_format = reg_metric.graphite_line_format
+        # Graphite expects time in seconds, not milliseconds. Hence,
+        # dividing by 1000
+        return ''.join([line_format % (v, ts // 1000)
+                        for ts, v in izip(timestamps, values)])
+
+    def frame(self, payloads):
+        """
+        :param payloads: Results of encode() for one or more metrics
+        :return: Message to send to Carbon
+        """
+        return ''.join(payloads)
+
+
+class GraphitePickleEncoder(GraphiteLineEncoder):
+    """
+    Encodes samples of registered metrics for the Graphite pickle protocol:
+    each frame is a pickled list of (path, (timestamp in seconds, value))
+    tuples, prefixed by its length as a 4-byte big-endian unsigned integer.
+
+    Samples of all metrics framed together are sent in frames of at most
+    max_frame_samples samples.
+    """
+
+    def __init__(self, max_frame_samples=10000):
+        self.max_frame_samples = max_frame_samples
+
+    def encode(self, reg_metric, timestamps, values):
+        path = self.get_path(reg_metric)
+        return [(path, (ts // 1000, v))
+                for ts, v in izip(timestamps, values)]
+
+    def frame(self, payloads):
+        datapoints = [datapoint for payload in payloads
+                      for datapoint in payload]
+        frames = []
+        for start in range(0, len(datapoints), self.max_frame_samples):
+            data = pickle.dumps(
+                datapoints[start:start + self.max_frame_samples], 2)
+            frames.append(struct.pack('!L', len(data)) + data)
+        return ''.join(frames)
+
 
 class Graphite(DataCenterComponent):
-    def __init__(self, comms):
+    def __init__(self, comms, protocol=GraphiteProtocol.PLAINTEXT):
         super(Graphite, self).__init__(
             comms=comms
         )
+        if isinstance(protocol, basestring):
+            # Name of the protocol, as read from a configuration file
+            protocol = GraphiteProtocol.__members__.get(protocol.upper())
+        if protocol is GraphiteProtocol.PICKLE:
+            self.encoder = GraphitePickleEncoder()
+        elif protocol is GraphiteProtocol.PLAINTEXT:
+            self.encoder = GraphiteLineEncoder()
+        else:
+            raise TypeError("Unsupported Graphite protocol")
+        if protocol is GraphiteProtocol.PICKLE and \
+                isinstance(comms, UdpDccComms):
+            # Carbon receives only the plaintext protocol over UDP
+            raise TypeError("Graphite pickle protocol requires a TCP comms")
+        self.protocol = protocol
 
     def register(self, entity_obj):
         log.info("Registering resource with Graphite DCC {0}".format(entity_obj.name))
         if isinstance(entity_obj, Metric):
-            return RegisteredMetric(entity_obj, self, None)
+            reg_metric = RegisteredMetric(entity_obj, self, None)
+            self.encoder.get_path(reg_metric)
+            return reg_metric
         else:
             return RegisteredEntity(entity_obj, self, None)
 
     def create_relationship(self, reg_entity_parent, reg_entity_child):
         reg_entity_child.parent = reg_entity_parent
 
-    def _format_data(self, reg_metric):
-        met_cnt = reg_metric.values.qsize()
-        message = ''
-        if met_cnt == 0:
+    def _encode(self, reg_metric):
+        timestamps, values = reg_metric.drain_values(as_arrays=True)
+        if len(timestamps) == 0:
             return
-        for _ in range(met_cnt):
-            v = reg_metric.values.get(block=True)
-            if v is not None:
-                # Graphite expects time in seconds, not milliseconds. Hence,
-                # dividing by 1000
-                message += '%s %s %d\n' % (reg_metric.ref_entity.name,
-                                           v[1], v[0] / 1000)
-        if message == '':
+        return self.encoder.encode(reg_metric, timestamps, values)
+
+    def _format_data(self, reg_metric):
+        payload = self._encode(reg_metric)
+        if payload is None:
             return
+        message = self.encoder.frame([payload])
         log.info ("Publishing values to Graphite DCC")
-        log.debug("Formatted message: {0}".format(message))
+        log.debug("Formatted message: %r", message)
         return message
 
+    def publish_many(self, reg_metrics):
+        """
+        Sends the samples of all given metrics with a single send on comms.
+        """
+        payloads = []
+        for reg_metric in reg_metrics:
+            if not isinstance(reg_metric, RegisteredMetric):
+                raise TypeError
+            payload = self._encode(reg_metric)
+            if payload is not None:
+                payloads.append(payload)
+        if payloads:
+            log.info("Publishing values of %d metrics to Graphite DCC" %
+                     len(payloads))
+            self.comms.send(self.encoder.frame(payloads), None)
+
     def set_properties(self, reg_entity, properties):
         raise NotImplementedError
@@ -36,14 +36,17 @@ import time
 import threading
 import ConfigParser
 import os
+from collections import OrderedDict
+from functools import partial
 from time import gmtime, strftime
 from threading import Lock
 import xml.etree.cElementTree as ET
 from xml.dom import minidom
 
 from liota.dccs.dcc import DataCenterComponent, RegistrationFailure
-from liota.lib.protocols.helix_protocol import HelixProtocol
+from liota.lib.protocols.helix_protocol import HelixProtocol, HelixInitializationError
 from liota.entities.metrics.metric import Metric
+from liota.lib.utilities.future import Future
 from liota.lib.utilities.utility import LiotaConfigPath, getUTCmillis, mkdir_log, read_liota_config
 from liota.lib.utilities.si_unit import parse_unit
 from liota.entities.metrics.registered_metric import RegisteredMetric
@@ -57,9 +60,13 @@ class IotControlCenter(DataCenterComponent):
 
     """
 
-    def __init__(self, username, password, con):
+    def __init__(self, username, password, con, publish_window=0):
         log.info("Logging into DCC")
         self.comms = con
+        # Seconds to wait for more metrics to publish together
+        self.publish_window = publish_window
+        # Seconds to wait before asking again for a resource being created
+        self.registration_retry_interval = 5
         self.con = con.wss
         self.username = username
         self.password = password
@@ -70,84 +77,114 @@ class IotControlCenter(DataCenterComponent):
         self.entity_file_path = self._get_file_storage_path("entity_file_path")
         self.file_ops_lock = Lock()
 
-        def on_receive_safe(msg):
-            try:
-                log.debug("Received msg: {0}".format(msg))
-                json_msg = json.loads(msg)
-                self.proto.on_receive(json.loads(msg))
-                log.debug("Processed msg: {0}".format(json_msg["type"]))
-                if json_msg["type"] == "connection_verified":
-                    log.info("Connection verified")
-                    exit()
-            except Exception:
-                raise
-                log.exception(
-                    "Error received on connecting to DCC instance. Please verify the credentials and try again.")
-
-        thread = threading.Thread(target=self.con.run)
-        self.con.on_receive = on_receive_safe
-        thread.daemon = True
-        thread.start()
-        thread.join()
+        self._verified = threading.Event()
+        self._handshake_error = None
+        self.con.on_receive = self._on_receive
+        self.con.on_connect = self._on_connect
+        # Registrations and stats wait for the handshake, which the loop
+        # thread of the WebSocket does on receiving connection_request
+        self.con.hold()
+        self.con.start()
+        while not self._verified.wait(1):
+            pass
+        if self._handshake_error is not None:
+            raise self._handshake_error
         log.info("Logged in to DCC successfully")
 
+    def _on_connect(self):
+        log.info("Reconnected, logging into DCC again")
+        self.con.hold()
+        self.proto = HelixProtocol(self.con, self.username, self.password)
+
+    def _on_receive(self, msg):
+        log.debug("Received msg: {0}".format(msg))
+        json_msg = json.loads(msg)
+        try:
+            self.proto.on_receive(json_msg)
+        except HelixInitializationError as ex:
+            log.error("Error received on connecting to DCC instance. Please verify the credentials and try again.")
+            self._handshake_error = ex
+            self._verified.set()
+            return
+        log.debug("Processed msg: {0}".format(json_msg["type"]))
+        if json_msg["type"] == "connection_verified":
+            log.info("Connection verified")
+            self.con.release()
+            self._verified.set()
+
     def register(self, entity_obj):
         """ Register the objects
 
         """
+        return self.register_async(entity_obj).result()
+
+    def register_many(self, entity_objs):
+        """ Registers the objects concurrently: requests for all of them are
+            sent without waiting for responses, which are matched to their
+            request by transactionID.
+
+            :return: List of futures of the registered objects, in order
+        """
+        return [self.register_async(entity_obj) for entity_obj in entity_objs]
+
+    def register_async(self, entity_obj):
+        """ Registers the object without waiting for IoTCC
+
+            :return: Future of the registered object, failed with
+                     RegistrationFailure if the connection is lost before
+        """
+        future = Future()
         if isinstance(entity_obj, Metric):
             # reg_entity_id should be parent's one: not known here yet
             # will add in creat_relationship(); publish_unit should be done inside
-            return RegisteredMetric(entity_obj, self, None)
+            future.set_result(RegisteredMetric(entity_obj, self, None))
         else:
             # finally will create a RegisteredEntity
             log.info("Registering resource with IoTCC {0}".format(entity_obj.name))
-
-            def on_receive_safe(msg):
-                try:
-                    log.debug("Received msg: {0}".format(msg))
-                    if msg != "":
-                        json_msg = json.loads(msg)
-                        self.proto.on_receive(json.loads(msg))
-                        log.debug("Processed msg: {0}".format(json_msg["type"]))
-                        if json_msg["type"] == "create_or_find_resource_response":
-                            if json_msg["body"]["uuid"] != "null":
-                                log.info("FOUND RESOURCE: {0}".format(json_msg["body"]["uuid"]))
-                                self.reg_entity_id = json_msg["body"]["uuid"]
-                                exit()
-                            else:
-                                log.info("Waiting for resource creation")
-                                time.sleep(5)
-                                self.con.send(
-                                    self._registration(self.con.next_id(), entity_obj.entity_id, entity_obj.name,
-                                                       entity_obj.entity_type))
-                except:
-                    raise
-
-            thread = threading.Thread(target=self.con.run)
-            self.con.on_receive = on_receive_safe
-            thread.daemon = True
-            thread.start()
             if entity_obj.entity_type == "EdgeSystem":
                 entity_obj.entity_type = "HelixGateway"
-            self.con.send(
-                self._registration(self.con.next_id(), entity_obj.entity_id, entity_obj.name, entity_obj.entity_type))
-            thread.join()
-            if not hasattr(self, 'reg_entity_id'):
-                raise RegistrationFailure()
-            log.info("Resource Registered {0}".format(entity_obj.name))
-            if entity_obj.entity_type == "HelixGateway":
-                self.store_edge_system_uuid(entity_obj.name, self.reg_entity_id)
-                with self.file_ops_lock:
-                    self.store_reg_entity_attributes("EdgeSystem", entity_obj.name,
-                        self.reg_entity_id, None, None)
-            else:
-                # get dev_type, and prop_dict if possible
-                with self.file_ops_lock:
-                    self.store_reg_entity_attributes("Devices", entity_obj.name, self.reg_entity_id,
-                        entity_obj.entity_type, None)
-
-            return RegisteredEntity(entity_obj, self, self.reg_entity_id)
+            self._request_registration(entity_obj, future)
+        return future
+
+    def _request_registration(self, entity_obj, future):
+        self.con.request(
+            self._registration(None, entity_obj.entity_id, entity_obj.name,
+                               entity_obj.entity_type)).add_done_callback(
+            partial(self._on_registration_response, entity_obj, future))
+
+    def _on_registration_response(self, entity_obj, future, response):
+        # Runs in the loop thread of the WebSocket
+        if response.exception() is not None:
+            log.error("Registration of {0} failed: {1}".format(
+                entity_obj.name, response.exception()))
+            future.set_exception(RegistrationFailure())
+            return
+        reg_entity_id = response.result()["body"]["uuid"]
+        if reg_entity_id == "null":
+            log.info("Waiting for resource creation")
+            self.con.call_later(self.registration_retry_interval, partial(
+                self._request_registration, entity_obj, future))
+            return
+        log.info("FOUND RESOURCE: {0}".format(reg_entity_id))
+        try:
+            future.set_result(self._registered(entity_obj, reg_entity_id))
+        except Exception as ex:
+            log.exception("Registration of {0} failed".format(entity_obj.name))
+            future.set_exception(ex)
+
+    def _registered(self, entity_obj, reg_entity_id):
+        log.info("Resource Registered {0}".format(entity_obj.name))
+        if entity_obj.entity_type == "HelixGateway":
+            self.store_edge_system_uuid(entity_obj.name, reg_entity_id)
+            with self.file_ops_lock:
+                self.store_reg_entity_attributes("EdgeSystem", entity_obj.name,
+                    reg_entity_id, None, None)
+        else:
+            # get dev_type, and prop_dict if possible
+            with self.file_ops_lock:
+                self.store_reg_entity_attributes("Devices", entity_obj.name, reg_entity_id,
+                    entity_obj.entity_type, None)
+        return RegisteredEntity(entity_obj, self, reg_entity_id)
 
     def create_relationship(self, reg_entity_parent, reg_entity_child):
         """ This function initializes all relations between Registered Entities.
@@ -208,29 +245,46 @@ class IotControlCenter(DataCenterComponent):
             msg["body"]["property_data"].append({"propertyKey": key, "propertyValue": value})
         return msg
 
-    def _format_data(self, reg_metric):
-        met_cnt = reg_metric.values.qsize()
-        if met_cnt == 0:
-            return
-        _timestamps = []
-        _values = []
-        for _ in range(met_cnt):
-            m = reg_metric.values.get(block=True)
-            if m is not None:
-                _timestamps.append(m[0])
-                _values.append(m[1])
-        if _timestamps == []:
+    def _metric_data(self, reg_metric):
+        _timestamps, _values = reg_metric.drain_values()
+        if len(_timestamps) == 0:
             return
+        return {
+            "statKey": reg_metric.ref_entity.name,
+            "timestamps": _timestamps,
+            "data": _values
+        }
+
+    def _stats(self, res_uuid, metric_data):
         return {
             "type": "add_stats",
-            "uuid": reg_metric.reg_entity_id,
-            "metric_data": [{
-                "statKey": reg_metric.ref_entity.name,
-                "timestamps": _timestamps,
-                "data": _values
-            }],
+            "uuid": res_uuid,
+            "metric_data": metric_data,
         }
 
+    def _format_data(self, reg_metric):
+        metric_data = self._metric_data(reg_metric)
+        if metric_data is None:
+            return
+        return self._stats(reg_metric.reg_entity_id, [metric_data])
+
+    def publish_many(self, reg_metrics):
+        """ Publishes metrics of the same resource in one add_stats message
+
+        """
+        res_metric_data = OrderedDict()
+        for reg_metric in reg_metrics:
+            if not isinstance(reg_metric, RegisteredMetric):
+                raise TypeError
+            metric_data = self._metric_data(reg_metric)
+            if metric_data is not None:
+                res_metric_data.setdefault(
+                    reg_metric.reg_entity_id, []).append(metric_data)
+        for res_uuid, metric_data in res_metric_data.items():
+            log.debug("Publishing {0} metrics of resource {1}".format(
+                len(metric_data), res_uuid))
+            self.comms.send(self._stats(res_uuid, metric_data))
+
     def set_properties(self, reg_entity_obj, properties):
         # RegisteredMetric get parent's resid; RegisteredEntity gets own resid
         reg_entity_id = reg_entity_obj.reg_entity_id
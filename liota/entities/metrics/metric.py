@@ -31,25 +31,84 @@
 # ----------------------------------------------------------------------------#
 
 import pint
+from aenum import UniqueEnum
+from liota.core.metric_handler import OverflowPolicy
 from liota.entities.entity import Entity
 from liota.entities.metrics.registered_metric import RegisteredMetric
+from liota.lib.utilities.aggregation import Aggregation
 from liota.lib.utilities.utility import systemUUID
 
 
+class OverrunPolicy(UniqueEnum):
+    """
+    Enum for how a metric is rescheduled when collection overruns its
+    interval, i.e. the next run time has already passed by more than
+    OVERRUN_TOLERANCE of the interval (at most OVERRUN_TOLERANCE_MS).
+
+        *  SKIP         - skip missed ticks and wait for the next tick on the
+                          original schedule
+        *  COALESCE     - run once right away for all missed ticks and
+                          restart the schedule from now
+        *  CATCH_UP     - run missed ticks back-to-back, at most
+                          max_catch_up of them (unlimited if None), the
+                          default
+    """
+    SKIP = 0
+    COALESCE = 1
+    CATCH_UP = 2
+
+
+# A tick this late is still run on time, not handled as an overrun
+OVERRUN_TOLERANCE = 0.1
+OVERRUN_TOLERANCE_MS = 50
+
+
 class Metric(Entity):
 
     def __init__(self, name, entity_type="Metric",
                  unit=None,
                  interval=60,
                  aggregation_size=1,
-                 sampling_function=None
+                 sampling_function=None,
+                 overrun_policy=OverrunPolicy.CATCH_UP,
+                 max_catch_up=None,
+                 collect_in_process=False,
+                 buffer_size=None,
+                 buffer_policy=None,
+                 max_batch_age_ms=None,
+                 max_batch_bytes=None,
+                 aggregation=None,
+                 aggregation_window_ms=None
                  ):
         if not (unit is None or isinstance(unit, pint.unit._Unit)) \
                 or not (
             isinstance(interval, int) or isinstance(interval, float)
         ) \
-                or not isinstance(aggregation_size, int):
+                or not isinstance(aggregation_size, int) \
+                or overrun_policy not in OverrunPolicy \
+                or not (max_catch_up is None or isinstance(max_catch_up, int)) \
+                or not (buffer_size is None or isinstance(buffer_size, int)) \
+                or not (buffer_policy is None
+                        or buffer_policy in OverflowPolicy) \
+                or not (max_batch_age_ms is None
+                        or isinstance(max_batch_age_ms, (int, float))) \
+                or not (max_batch_bytes is None
+                        or isinstance(max_batch_bytes, int)) \
+                or not (aggregation is None or aggregation in Aggregation
+                        or callable(aggregation)) \
+                or not (aggregation_window_ms is None
+                        or isinstance(aggregation_window_ms, (int, float))):
             raise TypeError()
+        if buffer_policy is OverflowPolicy.BLOCK:
+            raise ValueError("buffer_policy can not be BLOCK")
+        if max_catch_up is not None and max_catch_up < 1:
+            raise ValueError("max_catch_up must be at least 1")
+        if max_batch_age_ms is not None and max_batch_age_ms <= 0:
+            raise ValueError("max_batch_age_ms must be positive")
+        if max_batch_bytes is not None and max_batch_bytes <= 0:
+            raise ValueError("max_batch_bytes must be positive")
+        if aggregation_window_ms is not None and aggregation_window_ms <= 0:
+            raise ValueError("aggregation_window_ms must be positive")
         super(Metric, self).__init__(
             name=name,
             entity_id=systemUUID().get_uuid(name),
@@ -59,6 +118,24 @@ class Metric(Entity):
         self.interval = interval
         self.aggregation_size = aggregation_size
         self.sampling_function = sampling_function
+        self.overrun_policy = overrun_policy
+        self.max_catch_up = max_catch_up
+        # Run sampling function in CollectionProcessPool, if it is enabled
+        self.collect_in_process = collect_in_process
+        # Capacity and OverflowPolicy of the value buffer of registered
+        # metrics, None for metric_buffer_size/policy of liota.conf
+        self.buffer_size = buffer_size
+        self.buffer_policy = buffer_policy
+        # Publish before aggregation_size is reached, once the oldest unsent
+        # value is max_batch_age_ms old or the buffered values take
+        # max_batch_bytes (None to disable)
+        self.max_batch_age_ms = max_batch_age_ms
+        self.max_batch_bytes = max_batch_bytes
+        # Aggregation, or callable on a list of values, summarizing values
+        # of each aggregation_window_ms (each publish if None) into one
+        # value when publishing; None to publish values as collected
+        self.aggregation = aggregation
+        self.aggregation_window_ms = aggregation_window_ms
 
     def register(self, dcc_obj, reg_entity_id):
         return RegisteredMetric(self, dcc_obj, reg_entity_id)
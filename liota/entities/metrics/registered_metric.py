@@ -30,11 +30,18 @@
 #  THE POSSIBILITY OF SUCH DAMAGE.                                            #
 # ----------------------------------------------------------------------------#
 
-from Queue import Queue
+import cPickle as pickle
+from array import array
 import inspect
 import logging
+from multiprocessing import TimeoutError
+from threading import Lock
+from time import time
 from liota.core import metric_handler
+from liota.entities.metrics.sample_buffer import SampleBuffer
 from liota.entities.registered_entity import RegisteredEntity
+from liota.lib.utilities.aggregation import WindowAggregator, aggregate
+from liota.lib.utilities.histogram import Histogram
 from liota.lib.utilities.utility import getUTCmillis
 
 
@@ -49,58 +56,240 @@ class RegisteredMetric(RegisteredEntity):
                                   reg_entity_id=reg_entity_id)
         self.flag_alive = False
         self._next_run_time = None
+        # Ticks found already passed when rescheduling, and ticks dropped
+        # by the overrun policy of the metric
+        self.late_ticks = 0
+        self.skipped_ticks = 0
         self.current_aggregation_size = 0
+        # Guards current_aggregation_size, _batch_deadline and _send_pending,
+        # updated by collection, ingesting, flush timer and send threads
+        self._aggregation_lock = Lock()
+        self._send_pending = False
+        self._collect_in_process = False
+        # Time by which unsent values must be published, if the metric has
+        # a max_batch_age_ms
+        self._batch_deadline = None
         # -------------------------------------------------------------------
-        # Elements in this queue are (ts, v) pairs.
+        # Buffer of (ts, v) samples, stored as parallel arrays.
         #
-        self.values = Queue()
+        buffer_size, buffer_policy = metric_handler.get_metric_buffer_config()
+        if ref_metric.buffer_size is not None:
+            buffer_size = ref_metric.buffer_size
+        if ref_metric.buffer_policy is not None:
+            buffer_policy = ref_metric.buffer_policy
+        self.values = SampleBuffer(buffer_size, buffer_policy)
+        # Holds samples of the last aggregation window until it closes
+        self._window_aggregator = None
+        if ref_metric.aggregation is not None \
+                and ref_metric.aggregation_window_ms is not None:
+            self._window_aggregator = WindowAggregator(
+                ref_metric.aggregation, ref_metric.aggregation_window_ms)
+        # -------------------------------------------------------------------
+        # Latencies are in milliseconds. Scheduling lag and collect latency
+        # are recorded by metric_handler, the others by send_data().
+        #
+        self.hist_scheduling_lag = Histogram()
+        self.hist_collect_latency = Histogram()
+        self.hist_publish_latency = Histogram()
+        self.hist_values_per_publish = Histogram()
 
     def start_collecting(self):
         self.flag_alive = True
         # TODO: Add a check to ensure that start_collecting for a metric is
         # called only once by the client code
         metric_handler.initialize()
+        metric_handler.add_active_metric(self)
+        if self.ref_entity.sampling_function is None:
+            # Push metric: values arrive through ingest(), nothing to poll
+            return
+        if self.ref_entity.collect_in_process:
+            pool = metric_handler.collect_process_pool
+            try:
+                pickle.dumps(self.ref_entity.sampling_function)
+                self._collect_in_process = pool is not None \
+                    and pool.check(self.ref_entity.sampling_function)
+            except (pickle.PicklingError, TypeError):
+                pass
+            if not self._collect_in_process:
+                log.warning("Sampling function of %s can not run in a "
+                            "worker process, collecting in thread" %
+                            str(self.ref_entity.name))
         self._next_run_time = getUTCmillis() + (self.ref_entity.interval * 1000)
         metric_handler.event_ds.put_and_notify(self)
 
     def stop_collecting(self):
         self.flag_alive = False
+        metric_handler.remove_active_metric(self)
         log.debug("Metric %s is marked for deletion" %
                  str(self.ref_entity.name))
 
     def add_collected_data(self, collected_data):
         if isinstance(collected_data, list):
-            for data_sample in collected_data:
-                self.values.put(data_sample)
-            return len(collected_data)
+            self.values.extend(collected_data)
+            num_values = len(collected_data)
         elif isinstance(collected_data, tuple):
-            self.values.put(collected_data)
-            return 1
+            self.values.append(collected_data[0], collected_data[1])
+            num_values = 1
         else:
-            self.values.put((getUTCmillis(), collected_data))
-            return 1
+            self.values.append(getUTCmillis(), collected_data)
+            num_values = 1
+        return num_values
+
+    def _add_to_batch(self, collected_data):
+        """
+        Adds collected data to the buffer, and queues the metric for sending
+        once its batch is complete by count or size. The buffer has a lock
+        of its own, so it is not written with the aggregation lock held.
+
+        :return: Number of values added
+        """
+        num_values = self.add_collected_data(collected_data)
+        with self._aggregation_lock:
+            self.current_aggregation_size += num_values
+            if self._batch_deadline is None and num_values > 0:
+                self._start_batch()
+            if not self.is_ready_to_send():
+                return num_values
+            self.current_aggregation_size = 0
+        self.queue_for_sending()
+        return num_values
+
+    def _start_batch(self):
+        """
+        Schedules the flush of values added since last publish, as of the
+        first one of them. Called with the aggregation lock held.
+        """
+        max_batch_age_ms = self.ref_entity.max_batch_age_ms
+        if max_batch_age_ms is None or metric_handler.flush_timer is None:
+            return
+        self._batch_deadline = getUTCmillis() + max_batch_age_ms
+        metric_handler.flush_timer.schedule(self, self._batch_deadline)
+
+    def flush_expired_batch(self, now):
+        """
+        Queues the metric for sending if the deadline of its batch passed,
+        for the flush timer.
+
+        :return: True if queued
+        """
+        with self._aggregation_lock:
+            if self._batch_deadline is None or self._batch_deadline > now:
+                return False
+            # Flushed once, values added from now on start a new batch
+            self._batch_deadline = None
+            self.current_aggregation_size = 0
+        self.queue_for_sending()
+        return True
+
+    def ingest(self, collected_data):
+        """
+        Feeds values of a push metric, i.e. a Metric without sampling
+        function, e.g. from an MQTT subscription callback. Values are
+        aggregated and queued for sending without occupying any collection
+        thread.
+
+        :param collected_data: A value, a (ts, value) tuple or a list of them
+        """
+        if not self.flag_alive:
+            log.debug("Dropped value ingested into stopped metric %s" %
+                      str(self.ref_entity.name))
+            return
+        self._add_to_batch(collected_data)
+
+    def queue_for_sending(self):
+        """
+        Puts the metric on the send queue of its DCC, unless it is already
+        waiting there.
+        """
+        with self._aggregation_lock:
+            if self._send_pending:
+                return
+            self._send_pending = True
+        metric_handler.send_queue.put(self)
+
+    def cancel_sending(self):
+        with self._aggregation_lock:
+            self._send_pending = False
+
+    def ingest_batch(self, values):
+        """
+        Feeds a list of values, or of (ts, value) tuples, of a push metric.
+        Values without timestamp are timestamped with the time of the call.
+        """
+        now = getUTCmillis()
+        self.ingest([value if isinstance(value, tuple) else (now, value)
+                     for value in values])
 
     def get_next_run_time(self):
         return self._next_run_time
 
     def set_next_run_time(self):
-        self._next_run_time = self._next_run_time + \
-            (self.ref_entity.interval * 1000)
+        from liota.entities.metrics.metric import OverrunPolicy, \
+            OVERRUN_TOLERANCE, OVERRUN_TOLERANCE_MS
+
+        interval = self.ref_entity.interval * 1000
+        now = getUTCmillis()
+        if interval <= 0:
+            # Event driven metric, collect again right away
+            self._next_run_time = now
+            return
+        next_run_time = self._next_run_time + interval
+        tolerance = min(interval * OVERRUN_TOLERANCE, OVERRUN_TOLERANCE_MS)
+        if next_run_time + tolerance <= now:
+            # Collection overran the interval; ticks up to now are late
+            self.late_ticks += 1
+            num_missed = int((now - next_run_time) // interval) + 1
+            policy = self.ref_entity.overrun_policy
+            if policy is OverrunPolicy.SKIP:
+                num_skipped = num_missed
+            elif policy is OverrunPolicy.COALESCE:
+                num_skipped = num_missed - 1
+            else:
+                max_catch_up = self.ref_entity.max_catch_up
+                num_skipped = 0 if max_catch_up is None \
+                    else max(0, num_missed - max_catch_up)
+            self.skipped_ticks += num_skipped
+            if policy is OverrunPolicy.COALESCE:
+                next_run_time = now
+            else:
+                next_run_time += num_skipped * interval
+        self._next_run_time = next_run_time
         log.debug("Set next run time to:" + str(self._next_run_time))
 
     def is_ready_to_send(self):
+        """
+        :return: True once the batch is complete by count or size, checked
+                 with the aggregation lock held as values are added
+        """
         log.debug("self.current_aggregation_size:" +
                   str(self.current_aggregation_size))
         log.debug("self.aggregation_size:" +
                   str(self.ref_entity.aggregation_size))
-        return self.current_aggregation_size >= self.ref_entity.aggregation_size
+        if self.current_aggregation_size >= self.ref_entity.aggregation_size:
+            return True
+        max_batch_bytes = self.ref_entity.max_batch_bytes
+        return max_batch_bytes is not None \
+            and self.values.nbytes() >= max_batch_bytes
 
     def collect(self):
         log.debug("Collecting values for the resource {0} ".format(
             self.ref_entity.name))
         self.args_required = len(inspect.getargspec(
             self.ref_entity.sampling_function)[0])
-        if self.args_required is not 0:
+        if self._collect_in_process \
+                and metric_handler.collect_process_pool is not None:
+            try:
+                self.collected_data = \
+                    metric_handler.collect_process_pool.sample(
+                        self.ref_entity.sampling_function,
+                        self.args_required)
+            except TimeoutError:
+                # Skip this tick rather than losing the collection thread
+                log.error("Worker process timed out sampling %s, "
+                          "collecting in thread" % str(self.ref_entity.name))
+                self._collect_in_process = False
+                self.collected_data = None
+        elif self.args_required is not 0:
             self.collected_data = self.ref_entity.sampling_function(1)
         else:
             self.collected_data = self.ref_entity.sampling_function()
@@ -109,19 +298,92 @@ class RegisteredMetric(RegisteredEntity):
         if self.collected_data is not None:
             log.info("{0} Sample Value: {1}".format(
                 self.ref_entity.name, self.collected_data))
-            no_of_values_added = self.add_collected_data(self.collected_data)
-            self.current_aggregation_size = self.current_aggregation_size + no_of_values_added
+            self._add_to_batch(self.collected_data)
 
-    def reset_aggregation_size(self):
-        self.current_aggregation_size = 0
+    def drain_values(self, as_arrays=False):
+        """
+        Removes all pending samples of the metric with a single acquisition
+        of the buffer lock, for DCCs to format them. Samples are summarized
+        by the aggregation of the metric, if any.
+
+        :param as_arrays: Return the columns of the buffer as they are
+                          stored, arrays unless non-numeric values were
+                          collected, instead of converting them to lists
+        :return: (timestamps, values) in sample order
+        """
+        timestamps, values = self.values.drain()
+        if self._window_aggregator is not None:
+            timestamps, values = self._window_aggregator.add(
+                timestamps, values, getUTCmillis())
+            self._schedule_window_flush()
+            return timestamps, values
+        if self.ref_entity.aggregation is not None:
+            return aggregate(self.ref_entity.aggregation, timestamps, values)
+        if as_arrays:
+            return timestamps, values
+        if isinstance(timestamps, array):
+            timestamps = timestamps.tolist()
+        if isinstance(values, array):
+            values = values.tolist()
+        return timestamps, values
+
+    def _schedule_window_flush(self):
+        """
+        Has the held aggregation window published once it ends, even if no
+        more values are collected.
+        """
+        window_end = self._window_aggregator.window_end()
+        if window_end is None or metric_handler.flush_timer is None:
+            return
+        with self._aggregation_lock:
+            if self._batch_deadline is None \
+                    or window_end < self._batch_deadline:
+                self._batch_deadline = window_end
+                metric_handler.flush_timer.schedule(self, window_end)
+
+    def _begin_send(self):
+        """
+        :return: False if no values were measured since last report_data
+        """
+        with self._aggregation_lock:
+            self._send_pending = False
+            # Values added from now on start a new batch
+            self._batch_deadline = None
+        num_values = self.values.qsize()
+        if num_values == 0:
+            window_end = None if self._window_aggregator is None \
+                else self._window_aggregator.window_end()
+            if window_end is None or window_end > getUTCmillis():
+                return False
+        self.hist_values_per_publish.record(num_values)
+        return True
 
     def send_data(self):
         log.info("Publishing values for the resource {0} ".format(
             self.ref_entity.name))
-        if not self.values:
+        if not self._begin_send():
             # No values measured since last report_data
             return True
+        start = time()
         self.ref_dcc.publish(self)
+        self.hist_publish_latency.record((time() - start) * 1000)
+
+    @staticmethod
+    def send_data_many(reg_metrics):
+        """
+        Publishes values of several metrics registered with the same DCC
+        through its publish_many().
+        """
+        reg_metrics = [reg_metric for reg_metric in reg_metrics
+                       if reg_metric._begin_send()]
+        if not reg_metrics:
+            return True
+        log.info("Publishing values for %d resources" % len(reg_metrics))
+        start = time()
+        reg_metrics[0].ref_dcc.publish_many(reg_metrics)
+        latency = (time() - start) * 1000
+        for reg_metric in reg_metrics:
+            reg_metric.hist_publish_latency.record(latency)
 
     def __str__(self, *args, **kwargs):
         return str(self.ref_entity.name) + ":" + str(self._next_run_time)
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------#
+#  Copyright © 2015-2016 VMware, Inc. All Rights Reserved.                    #
+#                                                                             #
+#  Licensed under the BSD 2-Clause License (the “License”); you may not use   #
+#  this file except in compliance with the License.                           #
+#                                                                             #
+#  The BSD 2-Clause License                                                   #
+#                                                                             #
+#  Redistribution and use in source and binary forms, with or without         #
+#  modification, are permitted provided that the following conditions are met:#
+#                                                                             #
+#  - Redistributions of source code must retain the above copyright notice,   #
+#      this list of conditions and the following disclaimer.                  #
+#                                                                             #
+#  - Redistributions in binary form must reproduce the above copyright        #
+#      notice, this list of conditions and the following disclaimer in the    #
+#      documentation and/or other materials provided with the distribution.   #
+#                                                                             #
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"#
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE  #
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE #
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE  #
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR        #
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF       #
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS   #
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN    #
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)    #
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF     #
+#  THE POSSIBILITY OF SUCH DAMAGE.                                            #
+# ----------------------------------------------------------------------------#
+
+from array import array
+from threading import Lock
+
+from liota.core.metric_handler import OverflowPolicy
+
+
+_NUMBER_TYPES = (int, long, float)
+
+
+def _appended(column, item):
+    """
+    Appends item to an array or list column, and returns the column, which
+    is widened to an array of doubles, or to a list, if item does not fit.
+    """
+    if type(item) in _NUMBER_TYPES or isinstance(column, list):
+        try:
+            column.append(item)
+            return column
+        except (TypeError, OverflowError):
+            # A float, or an integer not fitting in a long
+            pass
+        if column.typecode == 'l' and type(item) is float:
+            column = array('d', column)
+            column.append(item)
+            return column
+    column = column.tolist()
+    column.append(item)
+    return column
+
+
+class SampleBuffer:
+    """
+    Buffer of (ts, value) samples of a registered metric, stored as two
+    parallel arrays instead of a queue of tuples.
+
+    Timestamps and values are each kept in an array of signed longs while
+    all of them are integers, in an array of doubles once a float is added,
+    and in a plain list once an item of any other type is added. Appending
+    a sample allocates no tuple, and drain() hands all buffered samples
+    over at once.
+
+    When capacity (0 for unbounded) is reached, the OverflowPolicy of the
+    buffer applies, as for metric_handler.BoundedQueue, except BLOCK: the
+    buffer is drained by send threads only once the metric is queued for
+    sending, which a collection thread waiting for room would never do.
+    """
+
+    def __init__(self, capacity=0, policy=OverflowPolicy.DROP_OLDEST):
+        if policy not in OverflowPolicy:
+            raise TypeError("Unsupported overflow policy")
+        if policy is OverflowPolicy.BLOCK:
+            raise ValueError("Value buffers of metrics can not block")
+        self.capacity = capacity
+        self.policy = policy
+        self.num_dropped = 0
+        self._lock = Lock()
+        self._reset()
+
+    def _reset(self):
+        self._timestamps = array('l')
+        self._values = array('l')
+        # Logical front of the buffer; dropping oldest samples only moves it
+        self._start = 0
+
+    def _size(self):
+        return len(self._timestamps) - self._start
+
+    def qsize(self):
+        with self._lock:
+            return self._size()
+
+    def __len__(self):
+        return self.qsize()
+
+    def empty(self):
+        return self.qsize() == 0
+
+    def nbytes(self):
+        """
+        :return: Bytes taken by the buffered samples in the arrays, counting
+                 8 bytes for each item of a column widened to a list
+        """
+        with self._lock:
+            size = self._size()
+            return size * (getattr(self._timestamps, 'itemsize', 8) +
+                           getattr(self._values, 'itemsize', 8))
+
+    def _make_room(self):
+        """
+        Applies the overflow policy, with the lock held.
+
+        :return: False if the new sample is to be dropped
+        """
+        if self._size() < self.capacity:
+            return True
+        if self.policy is OverflowPolicy.DROP_NEWEST:
+            self.num_dropped += 1
+            return False
+        if self.policy is OverflowPolicy.DROP_OLDEST:
+            self._start += 1
+            self.num_dropped += 1
+            if self._start * 2 > len(self._timestamps):
+                self._compact()
+        else:
+            start = self._start
+            self.num_dropped += self._size() // 2
+            self._timestamps = self._timestamps[start::2]
+            self._values = self._values[start::2]
+            self._start = 0
+        return True
+
+    def _compact(self):
+        start = self._start
+        del self._timestamps[:start]
+        del self._values[:start]
+        self._start = 0
+
+    def append(self, ts, value):
+        with self._lock:
+            if self.capacity > 0 and not self._make_room():
+                return
+            self._timestamps = _appended(self._timestamps, ts)
+            self._values = _appended(self._values, value)
+
+    def extend(self, samples):
+        """
+        :param samples: Iterable of (ts, value) tuples
+        """
+        with self._lock:
+            for ts, value in samples:
+                if self.capacity > 0 and not self._make_room():
+                    continue
+                self._timestamps = _appended(self._timestamps, ts)
+                self._values = _appended(self._values, value)
+
+    def put(self, sample, block=True, timeout=None):
+        self.append(sample[0], sample[1])
+
+    def drain(self):
+        """
+        Removes all buffered samples at once.
+
+        :return: (timestamps, values), both arrays or lists in sample order
+        """
+        with self._lock:
+            if self._start > 0:
+                self._compact()
+            timestamps, values = self._timestamps, self._values
+            self._reset()
+        return timestamps, values
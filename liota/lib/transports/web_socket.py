@@ -30,45 +30,139 @@
 #  THE POSSIBILITY OF SUCH DAMAGE.                                            #
 # ----------------------------------------------------------------------------#
 
+import errno
+import fcntl
+import heapq
 import json
 import logging
 import os
+import select
 import ssl
 import sys
-from websocket import create_connection
+from collections import deque
+from functools import partial
+from itertools import count
+from threading import Event, Lock, Thread, current_thread
+from time import time
+from websocket import ABNF, create_connection
+
+from liota.lib.utilities.future import Future, FutureTimeout
 
 log = logging.getLogger(__name__)
 
+# Fastest JSON encoder installed: ujson, then simplejson, then the standard
+# library json module
+try:
+    import ujson
+    # ujson keeps 9 digits of floats unless told otherwise
+    json_encode = partial(ujson.dumps, double_precision=15)
+except ImportError:
+    try:
+        import simplejson
+        json_encode = simplejson.dumps
+    except ImportError:
+        json_encode = json.dumps
+
+
+def is_request_or_response(msg):
+    """
+    :return: True for request and response messages of the Helix protocol,
+             which are not retried when sending fails
+    """
+    if not isinstance(msg, dict):
+        return False
+    msg_type = msg.get("type")
+    if not isinstance(msg_type, basestring):
+        return False
+    return msg_type.endswith("_request") or msg_type.endswith("_response")
+
 
 class WebSocket():
     """ WebSocket class implementation
 
+    Once start() is called, a single loop thread owns the connection: it
+    receives messages, writes the messages queued by send(), send_async()
+    and request() in order, and reconnects with exponential backoff when
+    the connection is lost. Responses to request() are matched to their
+    request by transactionID. After close(), connect_soc() starts the loop
+    thread again, which reconnects and calls on_connect.
     """
 
-    def __init__(self, url):
+    def __init__(self, url, encoder=None, exit_on_failure=True,
+                 retry_interval=1, max_retry_interval=60, connect_timeout=10):
         self.url = url
+        # Callable serializing a message to a JSON string
+        self.encoder = encoder if encoder is not None else json_encode
+        # Exit the process when the connection fails, else raise IOError,
+        # e.g. for StoreAndForwardDccComms to keep messages until reconnected
+        self.exit_on_failure = exit_on_failure
+        self.retry_interval = retry_interval
+        self.max_retry_interval = max_retry_interval
+        # Seconds send() waits for the loop thread to reconnect, or to write
+        # a message
+        self.connect_timeout = connect_timeout
+        # Called with each message received
+        self.on_receive = None
+        # Called in the loop thread after it reconnected, e.g. to hold()
+        # sending until a handshake is done
+        self.on_connect = None
+        self.num_reconnects = 0
+        self.ws = None
+        self.counter = 0
+        self._id_lock = Lock()
+        self._send_lock = Lock()
+        self._lock = Lock()
+        # Queue of (message, future) to write, and futures of requests
+        # waiting for their response, by transactionID
+        self._queue = deque()
+        self._pending = {}
+        # Heap of [deadline, seq, callable] run by the loop thread
+        self._timers = []
+        self._timer_seq = count()
+        self._connected = Event()
+        self._ready = Event()
+        self._ready.set()
+        self._flag_alive = False
+        self._loop_thread = None
+        self._loop_started = False
         self.connect_soc()
 
     def connect_soc(self):
+        # The loop thread reconnects, wait for it as long as for one attempt
+        # of its own
+        timeout = self.retry_interval
+        if self._loop_thread is None and self._loop_started:
+            # Closed, e.g. by StoreAndForwardDccComms to reconnect
+            self.start()
+            timeout = self.connect_timeout
+        if self._loop_thread is not None:
+            if self._connected.wait(timeout):
+                return
+            log.error("WebSocket not reconnected within %s s" % timeout)
+            if not self.exit_on_failure:
+                raise IOError("WebSocket connection failed")
+            sys.exit(0)
         try:
             self.WebSocketConnection(self.url, False)
+            self._connected.set()
             log.info("Connection Successful")
-        except Exception:
+        except Exception as ex:
             log.exception("WebSocket exception, please check the WebSocket address and try again.")
+            if not self.exit_on_failure:
+                raise IOError("WebSocket connection failed: %s" % str(ex))
             sys.exit(0)
 
     # CERTPATH to be taken in consideration later
     def WebSocketConnection(self, host, verify_cert=True, CERTPATH="/etc/liota/cert"):
-        self.counter = 0
         if not verify_cert:
             self.ws = None
-            self.ws = create_connection(host, enable_multithread=True,
+            self.ws = create_connection(host, timeout=self.connect_timeout,
                                         sslopt={"cert_reqs": ssl.CERT_NONE})
         else:
             self.ws = None
             if os.path.isfile(CERTPATH):
                 try:
-                    self.ws = create_connection(host, enable_multithread=True,
+                    self.ws = create_connection(host, timeout=self.connect_timeout,
                                                 sslopt={"cert_reqs": ssl.CERT_REQUIRED,
                                                         "ca_certs": CERTPATH})
                 except ssl.SSLError:
@@ -76,41 +170,83 @@ class WebSocket():
             if self.ws is None:
                 raise (IOError("Couldn't verify host certificate"))
 
+    def start(self):
+        """
+        Starts the loop thread, if not started yet.
+        """
+        with self._lock:
+            if self._loop_thread is not None:
+                return
+            self._wake_r, self._wake_w = os.pipe()
+            for fd in (self._wake_r, self._wake_w):
+                fcntl.fcntl(fd, fcntl.F_SETFL,
+                            fcntl.fcntl(fd, fcntl.F_GETFL) | os.O_NONBLOCK)
+            self._flag_alive = True
+            self._loop_started = True
+            self._loop_thread = Thread(target=self.run, name="WebSocketLoop")
+            self._loop_thread.daemon = True
+            self._loop_thread.start()
+
     def run(self):
-        try:
-            log.info("Stream Opened")
-            while True:
-                msg = self.ws.recv()
-                log.debug("Message received while running {0}".format(msg))
-                if msg is "":
-                    log.error("Stream Closed")
-                    raise Exception("No message received from the server, please check the connection and the DCC credentials.")
-                log.debug("RX {0}".format(msg))
-                if self.on_receive is not None:
-                    self.on_receive(msg)
-        except Exception:
-            log.exception("Exception on receiving the response from Server, please check the connection and try again.")
-            self.close()
-            os._exit(0) # need to revisit this
+        log.info("Stream Opened")
+        retry_interval = self.retry_interval
+        while self._flag_alive:
+            if self.ws is None:
+                try:
+                    self.WebSocketConnection(self.url, False)
+                except Exception as ex:
+                    log.warning("Unable to reconnect WebSocket (%s), retrying "
+                                "in %s s" % (str(ex), retry_interval))
+                    self._sleep(retry_interval)
+                    retry_interval = min(retry_interval * 2,
+                                         self.max_retry_interval)
+                    continue
+                log.info("WebSocket reconnected")
+                self.num_reconnects += 1
+                retry_interval = self.retry_interval
+                if self.on_connect is not None:
+                    self.on_connect()
+                self._connected.set()
+            try:
+                self._poll()
+            except Exception as ex:
+                if not self._flag_alive:
+                    break
+                log.warning("WebSocket connection lost: %s" % str(ex))
+                self._connection_lost(IOError("WebSocket connection lost"))
+        self._connection_lost(IOError("WebSocket closed"))
+        log.info("Stream Closed")
+
+    def hold(self):
+        """
+        Holds back queued messages until release() is called. Messages sent
+        from the loop thread, e.g. by on_receive, are written right away.
+        """
+        self._ready.clear()
+
+    def release(self):
+        self._ready.set()
+        self._wake()
 
     def send(self, msg):
-        request_calls = ['request', 'response']
-        complete_message = json.dumps(msg)
+        complete_message = self.encoder(msg)
         log.debug("Sending data to DCC")
-        log.debug("TX Sending message {0}".format(complete_message))
+        log.debug("TX Sending message %s", complete_message)
         try:
-            self.ws.send(complete_message)
+            self._send(complete_message)
         except:
+            if current_thread() is self._loop_thread:
+                raise
             # Retry logic only for publishing stats, not for request or response calls
-            if all(request not in complete_message for request in request_calls):
+            if not is_request_or_response(msg):
                 attempts = 1
                 while attempts < 4:
                     try:
                         log.debug("Exception while sending data, applying retry logic.")
                         self.connect_soc()
                         log.info("Created New Websocket")
-                        log.debug("TX Sending message {0}".format(complete_message))
-                        self.ws.send(complete_message)
+                        log.debug("TX Sending message %s", complete_message)
+                        self._send(complete_message)
                         break
                     except:
                         # Three times retry websocket connection for publishing data
@@ -119,19 +255,226 @@ class WebSocket():
                         if attempts == 4:
                             # os._exit used as websocket connection is not created even after the fourth retry
                             log.exception("Exception while sending data, please check the connection and try again.")
-                            self.close()
+                            self._close_on_failure()
+                            if not self.exit_on_failure:
+                                raise IOError("Sending data failed")
                             os._exit(0)
             else:
                 log.exception("Exception while sending data, please check the connection and try again.")
-                self.close()
+                self._close_on_failure()
+                if not self.exit_on_failure:
+                    raise IOError("Sending data failed")
                 sys.exit(0)
 
+    def send_async(self, msg):
+        """
+        Queues msg to be written by the loop thread.
+
+        :return: Future done once msg is written, or failed with IOError if
+                 the connection is lost before
+        """
+        self.start()
+        return self._enqueue(self.encoder(msg))
+
+    def request(self, msg):
+        """
+        Queues request msg, setting its transactionID if it has none.
+
+        :return: Future of the response to msg, as a dict, failed with
+                 IOError if the connection is lost before it is received
+        """
+        self.start()
+        if msg.get("transactionID") is None:
+            msg["transactionID"] = self.next_id()
+        future = Future()
+        with self._lock:
+            self._pending[msg["transactionID"]] = future
+        self._enqueue(self.encoder(msg)).add_done_callback(
+            partial(self._request_sent, msg["transactionID"]))
+        return future
+
+    def call_later(self, delay, fn):
+        """
+        Calls fn in the loop thread after delay seconds, e.g. to resend a
+        request without a thread waiting for it.
+        """
+        self.start()
+        with self._lock:
+            heapq.heappush(self._timers,
+                           [time() + delay, next(self._timer_seq), fn])
+        self._wake()
+
     def next_id(self):
-        self.counter = (self.counter + 1) & 0xffffff
-        # Enforce even IDs
-        return self.counter * 2
+        with self._id_lock:
+            self.counter = (self.counter + 1) & 0xffffff
+            # Enforce even IDs
+            return self.counter * 2
 
     def close(self):
+        self._flag_alive = False
+        if self._loop_thread is not None:
+            self._wake()
+            if current_thread() is not self._loop_thread:
+                self._loop_thread.join(self.connect_timeout)
+            if self._loop_thread.is_alive():
+                # Still using the pipe, left to be closed on exit
+                log.warning("WebSocket loop thread did not stop")
+            else:
+                os.close(self._wake_r)
+                os.close(self._wake_w)
+                del self._wake_r, self._wake_w
+            self._loop_thread = None
         if self.ws is not None:
             self.ws.close()
         log.debug("Connection closed, cleanup done")
+
+    def _close_on_failure(self):
+        # A running loop thread keeps reconnecting
+        if self._loop_thread is None:
+            self.close()
+
+    def _send(self, complete_message):
+        if self._loop_thread is None or \
+                current_thread() is self._loop_thread:
+            with self._send_lock:
+                self.ws.send(complete_message)
+        else:
+            try:
+                self._enqueue(complete_message).result(self.connect_timeout)
+            except FutureTimeout:
+                raise IOError("Message not written within %s s" %
+                              self.connect_timeout)
+
+    def _enqueue(self, complete_message):
+        future = Future()
+        if not self._connected.is_set():
+            # Not kept until reconnected, so that senders can tell
+            future.set_exception(IOError("WebSocket not connected"))
+            return future
+        with self._lock:
+            self._queue.append((complete_message, future))
+        self._wake()
+        return future
+
+    def _request_sent(self, transaction_id, future):
+        if future.exception() is not None:
+            with self._lock:
+                response = self._pending.pop(transaction_id, None)
+            if response is not None:
+                response.set_exception(future.exception())
+
+    def _wake(self):
+        try:
+            os.write(self._wake_w, 'x')
+        except AttributeError:
+            # Loop thread not started
+            pass
+        except OSError as ex:
+            # Pipe full: the loop thread is being woken up anyway
+            if ex.errno != errno.EAGAIN:
+                raise
+
+    def _drain_wake(self):
+        try:
+            while os.read(self._wake_r, 4096):
+                pass
+        except OSError as ex:
+            if ex.errno != errno.EAGAIN:
+                raise
+
+    def _sleep(self, seconds):
+        # Sleep which close() interrupts
+        deadline = time() + seconds
+        while self._flag_alive:
+            remaining = deadline - time()
+            if remaining <= 0:
+                return
+            if select.select([self._wake_r], [], [], remaining)[0]:
+                self._drain_wake()
+
+    def _poll(self):
+        sock = self.ws.sock
+        timeout = 0 if self._queue and self._ready.is_set() else 1.0
+        if self._timers:
+            timeout = max(0, min(timeout, self._timers[0][0] - time()))
+        readable, _, _ = select.select([sock, self._wake_r], [], [], timeout)
+        self._run_timers()
+        if self._wake_r in readable:
+            self._drain_wake()
+        if sock in readable:
+            self._receive()
+            # Data already decrypted by SSL is not seen by select()
+            while self.ws is not None and hasattr(sock, 'pending') and \
+                    sock.pending():
+                self._receive()
+        if self._ready.is_set():
+            self._write_queued()
+
+    def _run_timers(self):
+        now = time()
+        while True:
+            with self._lock:
+                if not self._timers or self._timers[0][0] > now:
+                    return
+                fn = heapq.heappop(self._timers)[2]
+            try:
+                fn()
+            except Exception:
+                log.exception("Exception in timer of WebSocket loop")
+
+    def _receive(self):
+        opcode, msg = self.ws.recv_data(control_frame=True)
+        if opcode == ABNF.OPCODE_CLOSE:
+            raise IOError("Closed by the server")
+        if opcode not in (ABNF.OPCODE_TEXT, ABNF.OPCODE_BINARY):
+            # Ping and pong are answered by the websocket client
+            return
+        log.debug("RX {0}".format(msg))
+        if self._pending:
+            self._resolve(msg)
+        if self.on_receive is not None:
+            try:
+                self.on_receive(msg)
+            except Exception:
+                log.exception("Exception while processing message from server")
+
+    def _resolve(self, msg):
+        try:
+            response = json.loads(msg)
+            transaction_id = response.get("transactionID")
+        except (ValueError, AttributeError):
+            return
+        with self._lock:
+            future = self._pending.pop(transaction_id, None)
+        if future is not None:
+            future.set_result(response)
+
+    def _write_queued(self, max_messages=256):
+        # Bounded, not to delay receiving behind a long queue
+        for _ in range(max_messages):
+            with self._lock:
+                if not self._queue:
+                    return
+                complete_message, future = self._queue.popleft()
+            try:
+                self.ws.send(complete_message)
+            except Exception as ex:
+                future.set_exception(IOError("Sending data failed: %s" % ex))
+                raise
+            future.set_result(None)
+
+    def _connection_lost(self, exception):
+        self._connected.clear()
+        if self.ws is not None:
+            try:
+                self.ws.close()
+            except Exception:
+                pass
+            self.ws = None
+        with self._lock:
+            queued, self._queue = self._queue, deque()
+            pending, self._pending = self._pending, {}
+        for _, future in queued:
+            future.set_exception(exception)
+        for future in pending.values():
+            future.set_exception(exception)
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------#
+#  Copyright © 2015-2016 VMware, Inc. All Rights Reserved.                    #
+#                                                                             #
+#  Licensed under the BSD 2-Clause License (the “License”); you may not use   #
+#  this file except in compliance with the License.                           #
+#                                                                             #
+#  The BSD 2-Clause License                                                   #
+#                                                                             #
+#  Redistribution and use in source and binary forms, with or without         #
+#  modification, are permitted provided that the following conditions are met:#
+#                                                                             #
+#  - Redistributions of source code must retain the above copyright notice,   #
+#      this list of conditions and the following disclaimer.                  #
+#                                                                             #
+#  - Redistributions in binary form must reproduce the above copyright        #
+#      notice, this list of conditions and the following disclaimer in the    #
+#      documentation and/or other materials provided with the distribution.   #
+#                                                                             #
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"#
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE  #
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE #
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE  #
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR        #
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF       #
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS   #
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN    #
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)    #
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF     #
+#  THE POSSIBILITY OF SUCH DAMAGE.                                            #
+# ----------------------------------------------------------------------------#
+
+import math
+from itertools import izip
+from threading import Lock
+
+from aenum import UniqueEnum
+
+
+class Aggregation(UniqueEnum):
+    """
+    Enum of operators summarizing the values of a metric collected within a
+    window into a single value.
+
+        *  MEAN, MIN, MAX, SUM  - of the values
+        *  COUNT                - number of values
+        *  LAST                 - most recent value
+        *  MEDIAN, P90, P95,
+           P99                  - nearest-rank percentile of the values
+    """
+    MEAN = 0
+    MIN = 1
+    MAX = 2
+    SUM = 3
+    COUNT = 4
+    LAST = 5
+    MEDIAN = 6
+    P90 = 7
+    P95 = 8
+    P99 = 9
+
+
+def _percentile(p):
+    def percentile(values):
+        ordered = sorted(values)
+        rank = int(math.ceil(p * len(ordered) / 100.0))
+        return ordered[max(rank, 1) - 1]
+    return percentile
+
+
+_OPERATORS = {
+    Aggregation.MEAN: lambda values: float(sum(values)) / len(values),
+    Aggregation.MIN: min,
+    Aggregation.MAX: max,
+    Aggregation.SUM: sum,
+    Aggregation.COUNT: len,
+    Aggregation.LAST: lambda values: values[-1],
+    Aggregation.MEDIAN: _percentile(50),
+    Aggregation.P90: _percentile(90),
+    Aggregation.P95: _percentile(95),
+    Aggregation.P99: _percentile(99),
+}
+
+
+def get_operator(aggregation):
+    """
+    :param aggregation: An Aggregation, or a callable taking a non-empty
+                        list of values and returning their summary
+    :return: Callable taking a non-empty list of values
+    """
+    if aggregation in Aggregation:
+        return _OPERATORS[aggregation]
+    if callable(aggregation):
+        return aggregation
+    raise TypeError("Unsupported aggregation")
+
+
+def aggregate(aggregation, timestamps, values):
+    """
+    Summarizes samples with an aggregation operator.
+
+    :param timestamps: Timestamps of samples in ms, in ascending order
+    :param values: Values of samples
+    :return: (timestamps, values) of the summary, stamped with the
+             timestamp of the last sample, empty if there are no samples
+    """
+    operator = get_operator(aggregation)
+    if len(timestamps) == 0:
+        return [], []
+    return [timestamps[-1]], [operator(list(values))]
+
+
+class WindowAggregator:
+    """
+    Summarizes the samples of a metric per window of window_ms, as they are
+    drained from its buffer publish after publish. Samples of the last
+    window are held until the window closes, i.e. until a sample of a later
+    window is added or the window has ended, so that a window spanning
+    several publishes is summarized once, with all of its samples.
+    """
+
+    def __init__(self, aggregation, window_ms):
+        self.operator = get_operator(aggregation)
+        self.window_ms = window_ms
+        self._lock = Lock()
+        self._window = None
+        self._values = []
+        self._last_ts = None
+
+    def window_end(self):
+        """
+        :return: End in ms of the window of held samples, None if none
+        """
+        with self._lock:
+            if not self._values:
+                return None
+            return (self._window + 1) * self.window_ms
+
+    def add(self, timestamps, values, now):
+        """
+        :param timestamps: Timestamps of samples in ms, in ascending order
+        :param values: Values of samples
+        :param now: Current time in ms, closing the window held if it ended
+        :return: (timestamps, values) of one summary per closed window,
+                 stamped with the timestamp of the last sample in the window
+        """
+        summary_timestamps = []
+        summary_values = []
+        with self._lock:
+            for ts, v in izip(timestamps, values):
+                window = ts // self.window_ms
+                if window != self._window:
+                    self._close(summary_timestamps, summary_values)
+                    self._window = window
+                self._values.append(v)
+                self._last_ts = ts
+            if self._values and (self._window + 1) * self.window_ms <= now:
+                self._close(summary_timestamps, summary_values)
+        return summary_timestamps, summary_values
+
+    def _close(self, summary_timestamps, summary_values):
+        if self._values:
+            summary_timestamps.append(self._last_ts)
+            summary_values.append(self.operator(self._values))
+            self._values = []
@@ -59,3 +59,22 @@ class Filter:
         :return: Filtered value or None
         """
         pass
+
+    def filter_many(self, samples):
+        """
+        Filters a batch of collected values at once. Child classes may override this with a faster implementation.
+
+        :param samples: List of collected values, or of (ts, value) tuples, as returned by sampling functions.
+        :return: List of filtered values, or of (ts, filtered value) tuples, for the values not filtered out.
+        """
+        result = []
+        for sample in samples:
+            if isinstance(sample, tuple):
+                v = self.filter(sample[1])
+                if v is not None:
+                    result.append((sample[0], v))
+            else:
+                v = self.filter(sample)
+                if v is not None:
+                    result.append(v)
+        return result
@@ -31,10 +31,16 @@
 # ----------------------------------------------------------------------------#
 
 import logging
+from itertools import izip
 from numbers import Number
 
 from aenum import UniqueEnum
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 from liota.lib.utilities.filters.filter import Filter
 
 log = logging.getLogger(__name__)
@@ -79,6 +85,47 @@ class Type(UniqueEnum):
     AT_LEAST = 11
 
 
+# Predicates of filter types, compiled once per RangeFilter: f(lower_bound, upper_bound) -> g(v) -> v is accepted
+_PREDICATES = {
+    Type.CLOSED: lambda lb, ub: lambda v: lb <= v <= ub,
+    Type.OPEN: lambda lb, ub: lambda v: lb < v < ub,
+    Type.CLOSED_OPEN: lambda lb, ub: lambda v: lb <= v < ub,
+    Type.OPEN_CLOSED: lambda lb, ub: lambda v: lb < v <= ub,
+    Type.CLOSED_REJECT: lambda lb, ub: lambda v: not lb <= v <= ub,
+    Type.OPEN_REJECT: lambda lb, ub: lambda v: not lb < v < ub,
+    Type.CLOSED_OPEN_REJECT: lambda lb, ub: lambda v: not lb <= v < ub,
+    Type.OPEN_CLOSED_REJECT: lambda lb, ub: lambda v: not lb < v <= ub,
+    Type.LESS_THAN: lambda lb, ub: lambda v: v < lb,
+    Type.AT_MOST: lambda lb, ub: lambda v: v <= lb,
+    Type.GREATER_THAN: lambda lb, ub: lambda v: v > ub,
+    Type.AT_LEAST: lambda lb, ub: lambda v: v >= ub,
+}
+
+# Same comparisons on NumPy arrays, f(lower_bound, upper_bound, a) -> mask.
+# Reject masks negate the accept masks, as the predicates do, rather than
+# use De Morgan's laws, which do not hold for NaN.
+_NUMPY_MASKS = {
+    Type.CLOSED: lambda lb, ub, a: (lb <= a) & (a <= ub),
+    Type.OPEN: lambda lb, ub, a: (lb < a) & (a < ub),
+    Type.CLOSED_OPEN: lambda lb, ub, a: (lb <= a) & (a < ub),
+    Type.OPEN_CLOSED: lambda lb, ub, a: (lb < a) & (a <= ub),
+    Type.CLOSED_REJECT: lambda lb, ub, a: ~((lb <= a) & (a <= ub)),
+    Type.OPEN_REJECT: lambda lb, ub, a: ~((lb < a) & (a < ub)),
+    Type.CLOSED_OPEN_REJECT: lambda lb, ub, a: ~((lb <= a) & (a < ub)),
+    Type.OPEN_CLOSED_REJECT: lambda lb, ub, a: ~((lb < a) & (a <= ub)),
+    Type.LESS_THAN: lambda lb, ub, a: a < lb,
+    Type.AT_MOST: lambda lb, ub, a: a <= lb,
+    Type.GREATER_THAN: lambda lb, ub, a: a > ub,
+    Type.AT_LEAST: lambda lb, ub, a: a >= ub,
+}
+
+# Checked before the slower isinstance(v, Number)
+_NUMBER_TYPES = (int, long, float)
+
+# Batches smaller than this are not worth converting to a NumPy array
+NUMPY_MIN_BATCH = 64
+
+
 class RangeFilter(Filter):
     """
     A simple lightweight filter, that filters values based on the specified filter type (range).
@@ -96,8 +143,19 @@ class RangeFilter(Filter):
 
         self.filter_type = filter_type
         self._validate(lower_bound, upper_bound)
-        self.lower_bound = lower_bound
-        self.upper_bound = upper_bound
+        self._lower_bound = lower_bound
+        self._upper_bound = upper_bound
+        # Bounds are bound into the predicate, a new RangeFilter is needed to change them
+        self._accept = _PREDICATES[filter_type](lower_bound, upper_bound)
+
+    # Read-only, so that filter() and filter_many() always apply the same bounds
+    @property
+    def lower_bound(self):
+        return self._lower_bound
+
+    @property
+    def upper_bound(self):
+        return self._upper_bound
 
     def _validate(self, lower_bound, upper_bound):
         """
@@ -130,54 +188,32 @@ class RangeFilter(Filter):
         :param v: Collected value
         :return: Filtered value or None
         """
-        result = None
-        log.info("Applying RangeFilter " + str(self.filter_type))
-        if not isinstance(v, Number):
+        if type(v) not in _NUMBER_TYPES and not isinstance(v, Number):
             log.warn("Value is not a number. Returning without applying filter")
             return v
+        if self._accept(v):
+            return v
+        return None
 
-        # Accept filters - bounded at both ends
-        elif self.filter_type is Type.CLOSED and (self.lower_bound <= v <= self.upper_bound):
-            result = v
-
-        elif self.filter_type is Type.OPEN and (self.lower_bound < v < self.upper_bound):
-            result = v
-
-        elif self.filter_type is Type.CLOSED_OPEN and (self.lower_bound <= v < self.upper_bound):
-            result = v
-
-        elif self.filter_type is Type.OPEN_CLOSED and (self.lower_bound < v <= self.upper_bound):
-            result = v
-
-        # Reject filters - bounded at both ends
-        elif self.filter_type is Type.CLOSED_REJECT and (not self.lower_bound <= v <= self.upper_bound):
-            result = v
-
-        elif self.filter_type is Type.OPEN_REJECT and (not self.lower_bound < v < self.upper_bound):
-            result = v
-
-        elif self.filter_type is Type.CLOSED_OPEN_REJECT and (not self.lower_bound <= v < self.upper_bound):
-            result = v
-
-        elif self.filter_type is Type.OPEN_CLOSED_REJECT and (not self.lower_bound < v <= self.upper_bound):
-            result = v
-
-        # Filters - bounded at one end
-        elif self.filter_type is Type.LESS_THAN and (v < self.lower_bound):
-            result = v
-
-        elif self.filter_type is Type.AT_MOST and (v <= self.lower_bound):
-            result = v
-
-        elif self.filter_type is Type.GREATER_THAN and (v > self.upper_bound):
-            result = v
-
-        elif self.filter_type is Type.AT_LEAST and (v >= self.upper_bound):
-            result = v
-
-        if result is not None:
-            log.info("Value passed by filter : %s" % str(result))
-        else:
-            log.info("Value rejected by filter : %s" % str(v))
+    def filter_many(self, samples):
+        """
+        Batch RangeFilter Implementation. Values of the batch are compared at once with NumPy when it is installed
+        and all of them are numbers, else one by one.
 
-        return result
+        :param samples: List of collected values, or of (ts, value) tuples.
+        :return: List of the samples passed by filter, in order.
+        """
+        log.debug("Applying RangeFilter %s to %d values" % (str(self.filter_type), len(samples)))
+        values = [sample[1] if isinstance(sample, tuple) else sample for sample in samples]
+        if numpy is not None and len(values) >= NUMPY_MIN_BATCH:
+            array = numpy.array(values)
+            # Bool, signed, unsigned or float: no value needs passing through unfiltered
+            if array.dtype.kind in 'biuf':
+                # Comparisons with NaN are False, as in Python, not worth a warning
+                with numpy.errstate(invalid='ignore'):
+                    mask = _NUMPY_MASKS[self.filter_type](self.lower_bound, self.upper_bound, array)
+                return [sample for sample, passed in izip(samples, mask.tolist()) if passed]
+        accept = self._accept
+        # Values which are not numbers are passed without applying filter, as by filter()
+        return [sample for sample, v in izip(samples, values)
+                if (accept(v) if type(v) in _NUMBER_TYPES or isinstance(v, Number) else v is not None)]
@@ -72,9 +72,26 @@ class WindowingScheme(Filter):
         :param v: Collected value by sampling function.
         :return: Filtered value or None
         """
-        log.info("Applying windowing scheme")
+        log.debug("Applying windowing scheme")
         return self._window(v, self.filter_obj.filter(v))
 
+    def filter_many(self, samples):
+        """
+        Applies filter and windowing scheme to a batch of collected values, as collected at the same time.
+
+        :param samples: List of collected values, or of (ts, value) tuples.
+        :return: List of filtered samples (or) of the last collected sample at the end of every time window.
+        """
+        log.debug("Applying windowing scheme to %d values" % len(samples))
+        filtered = self.filter_obj.filter_many(samples)
+        if not samples:
+            return filtered
+        result = self._window(samples[-1], filtered if filtered else None)
+        if result is samples[-1]:
+            # Nothing passed during the elapsed window
+            return [result]
+        return filtered
+
     def _window(self, collected_value, filtered_value):
         """
         Windowing scheme.
@@ -88,7 +105,7 @@ class WindowingScheme(Filter):
             #  At-least one sample has not passed so far during this window.
             if not self.sample_passed and filtered_value is None:
                 self._set_next_window_time()
-                log.info("Sending collected value for this window.")
+                log.debug("Sending collected value for this window.")
                 return collected_value
 
             # At-least one sample has (or will be) passed by now.
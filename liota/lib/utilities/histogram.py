@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------#
+#  Copyright © 2015-2016 VMware, Inc. All Rights Reserved.                    #
+#                                                                             #
+#  Licensed under the BSD 2-Clause License (the “License”); you may not use   #
+#  this file except in compliance with the License.                           #
+#                                                                             #
+#  The BSD 2-Clause License                                                   #
+#                                                                             #
+#  Redistribution and use in source and binary forms, with or without         #
+#  modification, are permitted provided that the following conditions are met:#
+#                                                                             #
+#  - Redistributions of source code must retain the above copyright notice,   #
+#      this list of conditions and the following disclaimer.                  #
+#                                                                             #
+#  - Redistributions in binary form must reproduce the above copyright        #
+#      notice, this list of conditions and the following disclaimer in the    #
+#      documentation and/or other materials provided with the distribution.   #
+#                                                                             #
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"#
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE  #
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE #
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE  #
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR        #
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF       #
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS   #
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN    #
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)    #
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF     #
+#  THE POSSIBILITY OF SUCH DAMAGE.                                            #
+# ----------------------------------------------------------------------------#
+
+from bisect import bisect_left
+from threading import RLock
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram, cheap enough to be updated on every collection
+    and publish of a metric.
+
+    Buckets follow a 1-2-5 series, so percentiles are reported as the upper
+    bound of the bucket they fall into. Count, sum, minimum and maximum are
+    exact.
+    """
+
+    bounds = [m * 10 ** e for e in range(7) for m in (1, 2, 5)]
+
+    def __init__(self):
+        # Updated from collection and send threads, read for reporting
+        self._lock = RLock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.counts = [0] * (len(self.bounds) + 1)
+            self.count = 0
+            self.sum = 0
+            self.min = None
+            self.max = None
+
+    def record(self, value):
+        with self._lock:
+            self.counts[bisect_left(self.bounds, value)] += 1
+            self.count += 1
+            self.sum += value
+            if self.min is None or value < self.min:
+                self.min = value
+            if self.max is None or value > self.max:
+                self.max = value
+
+    def mean(self):
+        with self._lock:
+            if self.count == 0:
+                return None
+            return float(self.sum) / self.count
+
+    def percentile(self, p):
+        """
+        :param p: Percentile within [0, 100]
+        :return: Upper bound of the bucket holding the p-th percentile
+        """
+        with self._lock:
+            if self.count == 0:
+                return None
+            rank = p * self.count / 100.0
+            seen = 0
+            for index, count in enumerate(self.counts):
+                seen += count
+                if seen >= rank and count > 0:
+                    if index == len(self.bounds):
+                        return self.max
+                    return min(self.bounds[index], self.max)
+            return self.max
+
+    def __str__(self):
+        with self._lock:
+            if self.count == 0:
+                return "n=0"
+            return "n=%d mean=%.2f p50=%.2f p99=%.2f max=%.2f" % (
+                self.count, self.mean(), self.percentile(50),
+                self.percentile(99), self.max)
@@ -0,0 +1,277 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------#
+#  Copyright © 2015-2016 VMware, Inc. All Rights Reserved.                    #
+#                                                                             #
+#  Licensed under the BSD 2-Clause License (the “License”); you may not use   #
+#  this file except in compliance with the License.                           #
+#                                                                             #
+#  The BSD 2-Clause License                                                   #
+#                                                                             #
+#  Redistribution and use in source and binary forms, with or without         #
+#  modification, are permitted provided that the following conditions are met:#
+#                                                                             #
+#  - Redistributions of source code must retain the above copyright notice,   #
+#      this list of conditions and the following disclaimer.                  #
+#                                                                             #
+#  - Redistributions in binary form must reproduce the above copyright        #
+#      notice, this list of conditions and the following disclaimer in the    #
+#      documentation and/or other materials provided with the distribution.   #
+#                                                                             #
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"#
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE  #
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE #
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE  #
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR        #
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF       #
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS   #
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN    #
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)    #
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF     #
+#  THE POSSIBILITY OF SUCH DAMAGE.                                            #
+# ----------------------------------------------------------------------------#
+
+import logging
+import mmap
+import os
+import struct
+import zlib
+
+log = logging.getLogger(__name__)
+
+# Frame header of a record: length and CRC-32 of its data
+_HEADER = struct.Struct('!LL')
+_SEGMENT_SUFFIX = '.log'
+_CURSOR_FILE = 'cursor'
+
+
+class SegmentLog:
+    """
+    Append-only log of records on disk, split into segment files of about
+    segment_size bytes. Records are read in order from a cursor which is
+    persisted in the log directory, and segments are deleted once read.
+
+    Each record is framed by its length and CRC-32, so that a record torn
+    by a crash while appending is detected and truncated when the log is
+    opened again. Records read but not yet committed through advance()
+    before a crash are read again, i.e. delivery is at least once.
+
+    Segments are read through mmap where possible. If max_size is set, the
+    oldest segments are dropped when the log grows beyond it.
+    """
+
+    def __init__(self, path, segment_size=16 * 1024 * 1024, max_size=None,
+                 fsync=False):
+        self.path = path
+        self.segment_size = segment_size
+        self.max_size = max_size
+        self.fsync = fsync
+        self.num_pending = 0
+        self.num_dropped_segments = 0
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        self._segments = self._list_segments()
+        self._read_seq, self._read_offset = self._load_cursor()
+        self._next_offset = None
+        self._view = None
+        self._view_seq = None
+        for seq in [seq for seq in self._segments if seq < self._read_seq]:
+            # Read before the cursor was last saved
+            self._segments.remove(seq)
+            os.remove(self._segment_path(seq))
+        if not self._segments:
+            self._segments.append(max(self._read_seq, 0))
+        if self._read_seq != self._segments[0]:
+            self._read_seq, self._read_offset = self._segments[0], 0
+        self._write_seq = self._segments[-1]
+        self._write_fd = os.open(self._segment_path(self._write_seq),
+                                 os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        self._recover()
+        self._write_size = os.fstat(self._write_fd).st_size
+        log.info("Opened log %s with %d pending records" %
+                 (path, self.num_pending))
+
+    def _segment_path(self, seq):
+        return os.path.join(self.path, '%020d%s' % (seq, _SEGMENT_SUFFIX))
+
+    def _list_segments(self):
+        return sorted(int(name[:-len(_SEGMENT_SUFFIX)])
+                      for name in os.listdir(self.path)
+                      if name.endswith(_SEGMENT_SUFFIX)
+                      and name[:-len(_SEGMENT_SUFFIX)].isdigit())
+
+    def _load_cursor(self):
+        try:
+            with open(os.path.join(self.path, _CURSOR_FILE)) as f:
+                seq, offset = f.read().split()
+                return int(seq), int(offset)
+        except (IOError, ValueError):
+            return (self._segments[0] if self._segments else 0), 0
+
+    def _save_cursor(self):
+        cursor_path = os.path.join(self.path, _CURSOR_FILE)
+        with open(cursor_path + '.tmp', 'w') as f:
+            f.write('%d %d\n' % (self._read_seq, self._read_offset))
+            if self.fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.rename(cursor_path + '.tmp', cursor_path)
+
+    def _map(self, seq):
+        """
+        :return: Contents of a segment, as an mmap if possible
+        """
+        with open(self._segment_path(seq), 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size == 0:
+                return ''
+            try:
+                return mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+            except (mmap.error, ValueError, OverflowError):
+                return f.read()
+
+    def _close_view(self):
+        if isinstance(self._view, mmap.mmap):
+            self._view.close()
+        self._view = None
+        self._view_seq = None
+
+    @staticmethod
+    def _frame_at(view, offset):
+        """
+        :return: (data, offset of next record), or None if there is no
+                 complete and valid record at offset
+        """
+        end = offset + _HEADER.size
+        if end > len(view):
+            return None
+        length, crc = _HEADER.unpack(view[offset:end])
+        if end + length > len(view):
+            return None
+        data = view[end:end + length]
+        if zlib.crc32(data) & 0xffffffff != crc:
+            return None
+        return data, end + length
+
+    def _recover(self):
+        """
+        Counts pending records, and truncates the last segment after its
+        last valid record.
+        """
+        for seq in self._segments:
+            if seq < self._read_seq:
+                continue
+            offset = self._read_offset if seq == self._read_seq else 0
+            view = self._map(seq)
+            try:
+                while True:
+                    frame = self._frame_at(view, offset)
+                    if frame is None:
+                        break
+                    offset = frame[1]
+                    self.num_pending += 1
+                size = len(view)
+            finally:
+                if isinstance(view, mmap.mmap):
+                    view.close()
+            if offset < size and seq == self._segments[-1]:
+                log.warning("Truncating %d bytes of torn record in %s" %
+                            (size - offset, self._segment_path(seq)))
+                with open(self._segment_path(seq), 'r+b') as f:
+                    f.truncate(offset)
+
+    def is_empty(self):
+        return self.num_pending == 0
+
+    def size(self):
+        """
+        :return: Bytes taken by segments on disk
+        """
+        return sum(os.path.getsize(self._segment_path(seq))
+                   for seq in self._segments)
+
+    def append(self, data):
+        if self._write_size >= self.segment_size:
+            self._rotate()
+        frame = _HEADER.pack(len(data), zlib.crc32(data) & 0xffffffff) + data
+        os.write(self._write_fd, frame)
+        if self.fsync:
+            os.fsync(self._write_fd)
+        self._write_size += len(frame)
+        self.num_pending += 1
+
+    def _rotate(self):
+        os.close(self._write_fd)
+        self._write_seq += 1
+        self._segments.append(self._write_seq)
+        self._write_fd = os.open(self._segment_path(self._write_seq),
+                                 os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        self._write_size = 0
+        if self.max_size is not None:
+            while len(self._segments) > 1 and self.size() > self.max_size:
+                self._drop_oldest_segment()
+
+    def _drop_oldest_segment(self):
+        seq = self._segments[0]
+        view = self._map(seq)
+        offset = self._read_offset if seq == self._read_seq else 0
+        try:
+            while True:
+                frame = self._frame_at(view, offset)
+                if frame is None:
+                    break
+                offset = frame[1]
+                self.num_pending -= 1
+        finally:
+            if isinstance(view, mmap.mmap):
+                view.close()
+        log.warning("Log %s is full, dropping segment %d" % (self.path, seq))
+        self.num_dropped_segments += 1
+        self._delete_segment(seq)
+
+    def _delete_segment(self, seq):
+        if self._view_seq == seq:
+            self._close_view()
+        self._segments.remove(seq)
+        os.remove(self._segment_path(seq))
+        if self._read_seq == seq:
+            self._read_seq, self._read_offset = self._segments[0], 0
+            self._next_offset = None
+            self._save_cursor()
+
+    def read(self):
+        """
+        :return: Data of the record at the cursor, without moving it, or
+                 None if there is no record to read
+        """
+        while self.num_pending > 0:
+            if self._view_seq != self._read_seq \
+                    or (self._read_seq == self._write_seq
+                        and len(self._view) < self._write_size):
+                # Map the segment again if it grew since it was mapped
+                self._close_view()
+                self._view = self._map(self._read_seq)
+                self._view_seq = self._read_seq
+            frame = self._frame_at(self._view, self._read_offset)
+            if frame is not None:
+                self._next_offset = frame[1]
+                return frame[0]
+            if self._read_seq == self._write_seq:
+                return None
+            # Segment read to its end
+            self._delete_segment(self._read_seq)
+        return None
+
+    def advance(self):
+        """
+        Moves the cursor past the record returned by read(), and persists it.
+        """
+        if self._next_offset is None:
+            return
+        self._read_offset = self._next_offset
+        self._next_offset = None
+        self.num_pending -= 1
+        self._save_cursor()
+
+    def close(self):
+        self._close_view()
+        os.close(self._write_fd)
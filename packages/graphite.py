@@ -45,6 +45,7 @@ class PackageClass(LiotaPackage):
         import copy
         from liota.dccs.graphite import Graphite
         from liota.dcc_comms.socket_comms import SocketDccComms
+        from liota.dcc_comms.udp_comms import UdpDccComms
 
         # Acquire resources from registry
         # Creating a copy of system object to keep original object "clean"
@@ -56,9 +57,15 @@ class PackageClass(LiotaPackage):
         execfile(config_path + '/sampleProp.conf', config)
 
         # Initialize DCC object with transport
+        if config.get('GraphiteTransport', 'tcp') == 'udp':
+            comms = UdpDccComms(ip=config['GraphiteIP'],
+                                port=config['GraphitePort'])
+        else:
+            comms = SocketDccComms(ip=config['GraphiteIP'],
+                                   port=config['GraphitePort'])
         self.graphite = Graphite(
-            SocketDccComms(ip=config['GraphiteIP'],
-                   port=config['GraphitePort'])
+            comms,
+            protocol=config.get('GraphiteProtocol', 'plaintext')
         )
 
         # Register gateway system
@@ -68,4 +75,4 @@ class PackageClass(LiotaPackage):
         registry.register("graphite_edge_system", graphite_edge_system)
 
     def clean_up(self):
-        self.graphite.comms.sock.close()
+        self.graphite.comms._disconnect()
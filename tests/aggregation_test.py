@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------#
+#  Copyright © 2015-2016 VMware, Inc. All Rights Reserved.                    #
+#                                                                             #
+#  Licensed under the BSD 2-Clause License (the “License”); you may not use   #
+#  this file except in compliance with the License.                           #
+#                                                                             #
+#  The BSD 2-Clause License                                                   #
+#                                                                             #
+#  Redistribution and use in source and binary forms, with or without         #
+#  modification, are permitted provided that the following conditions are met:#
+#                                                                             #
+#  - Redistributions of source code must retain the above copyright notice,   #
+#      this list of conditions and the following disclaimer.                  #
+#                                                                             #
+#  - Redistributions in binary form must reproduce the above copyright        #
+#      notice, this list of conditions and the following disclaimer in the    #
+#      documentation and/or other materials provided with the distribution.   #
+#                                                                             #
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"#
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE  #
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE #
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE  #
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR        #
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF       #
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS   #
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN    #
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)    #
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF     #
+#  THE POSSIBILITY OF SUCH DAMAGE.                                            #
+# ----------------------------------------------------------------------------#
+import time
+from itertools import groupby
+from threading import Thread
+
+from liota.core import metric_handler
+from liota.entities.metrics.metric import Metric
+from liota.lib.utilities.aggregation import Aggregation, WindowAggregator, \
+    get_operator
+from liota.lib.utilities.utility import getUTCmillis
+
+from stub_dcc import StubDcc
+
+#---------------------------------------------------------------------------
+# This is a testing script of liota.lib.utilities.aggregation
+# Purpose of this script is to show that windowed aggregation summarizes
+# each window exactly once, with all of its samples, however the samples
+# are split across publishes: WindowAggregator is fed the same samples in
+# chunks of several sizes and must give the summaries of the whole windows,
+# and a pushed 100 Hz metric with aggregation_size 1 must publish one COUNT
+# per window, adding up to the number of values ingested.
+#
+WINDOW_MS = 1000
+AGGREGATIONS = [Aggregation.MEAN, Aggregation.MIN, Aggregation.MAX,
+                Aggregation.COUNT, Aggregation.LAST]
+PUSH_WINDOW_MS = 200
+PUSH_RATE = 100
+PUSH_SECONDS = 1.5
+
+
+def samples():
+    # Irregular samples over 5 windows, one of them empty
+    timestamps = [ts for ts in range(0, 5 * WINDOW_MS, 70)
+                  if not 2 * WINDOW_MS <= ts < 3 * WINDOW_MS]
+    return timestamps, [(ts * 7919) % 113 for ts in timestamps]
+
+
+def expected(aggregation, timestamps, values):
+    operator = get_operator(aggregation)
+    result = []
+    for _, window in groupby(zip(timestamps, values),
+                             lambda sample: sample[0] // WINDOW_MS):
+        window = list(window)
+        result.append((window[-1][0], operator([v for _, v in window])))
+    return result
+
+
+def aggregate_in_chunks(aggregation, timestamps, values, chunk_size):
+    aggregator = WindowAggregator(aggregation, WINDOW_MS)
+    result = []
+    for start in range(0, len(timestamps), chunk_size):
+        chunk_ts = timestamps[start:start + chunk_size]
+        # Published right after the last sample of the chunk
+        result.extend(zip(*aggregator.add(
+            chunk_ts, values[start:start + chunk_size], chunk_ts[-1] + 1)))
+    # Last window published once it has ended
+    result.extend(zip(*aggregator.add([], [], timestamps[-1] + WINDOW_MS)))
+    return result
+
+
+def push(reg_metric, num_values):
+    for _ in range(num_values):
+        reg_metric.ingest(1)
+        time.sleep(1.0 / PUSH_RATE)
+
+
+def main():
+    print_split = "-" * 76
+    timestamps, values = samples()
+    print print_split
+    for aggregation in AGGREGATIONS:
+        correct = [aggregate_in_chunks(aggregation, timestamps, values,
+                                       chunk_size) ==
+                   expected(aggregation, timestamps, values)
+                   for chunk_size in (1, 3, 7, 14, len(timestamps))]
+        print "  %-6s summaries across publish boundaries correct: %s" % (
+            aggregation.name, all(correct))
+        assert all(correct)
+
+    dcc = StubDcc()
+    reg_metric = dcc.register(Metric(
+        name="vibration", aggregation_size=1, aggregation=Aggregation.COUNT,
+        aggregation_window_ms=PUSH_WINDOW_MS))
+    reg_metric.start_collecting()
+    num_values = int(PUSH_RATE * PUSH_SECONDS)
+    start = getUTCmillis()
+    pusher = Thread(target=push, args=(reg_metric, num_values))
+    pusher.start()
+    pusher.join()
+    # Last window published by the flush timer once it ends
+    time.sleep(2 * PUSH_WINDOW_MS / 1000.0)
+    reg_metric.stop_collecting()
+    metric_handler.terminate()
+    summaries = [sample for message in dcc.comms.messages
+                 for sample in message]
+    windows = [ts // PUSH_WINDOW_MS for ts, _ in summaries]
+    num_windows = (getUTCmillis() - start) // PUSH_WINDOW_MS
+
+    print "  Pushed %d values at %d Hz, aggregation_size 1, COUNT per %d ms" \
+        % (num_values, PUSH_RATE, PUSH_WINDOW_MS)
+    print "  Summaries published: %d, at most %d windows" % (
+        len(summaries), num_windows + 1)
+    print "  Each window summarized once: %s" % (
+        len(set(windows)) == len(windows))
+    print "  Sum of counts: %d" % sum(count for _, count in summaries)
+    print print_split
+    assert len(set(windows)) == len(windows)
+    assert len(summaries) <= num_windows + 1
+    assert sum(count for _, count in summaries) == num_values
+
+main()
@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------#
+#  Copyright © 2015-2016 VMware, Inc. All Rights Reserved.                    #
+#                                                                             #
+#  Licensed under the BSD 2-Clause License (the “License”); you may not use   #
+#  this file except in compliance with the License.                           #
+#                                                                             #
+#  The BSD 2-Clause License                                                   #
+#                                                                             #
+#  Redistribution and use in source and binary forms, with or without         #
+#  modification, are permitted provided that the following conditions are met:#
+#                                                                             #
+#  - Redistributions of source code must retain the above copyright notice,   #
+#      this list of conditions and the following disclaimer.                  #
+#                                                                             #
+#  - Redistributions in binary form must reproduce the above copyright        #
+#      notice, this list of conditions and the following disclaimer in the    #
+#      documentation and/or other materials provided with the distribution.   #
+#                                                                             #
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"#
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE  #
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE #
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE  #
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR        #
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF       #
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS   #
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN    #
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)    #
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF     #
+#  THE POSSIBILITY OF SUCH DAMAGE.                                            #
+# ----------------------------------------------------------------------------#
+
+import socket
+import time
+from threading import Event, Lock, Thread
+
+from liota.dcc_comms.socket_comms import BufferedSocketDccComms
+
+#---------------------------------------------------------------------------
+# This is a testing script of
+# liota.dcc_comms.socket_comms.BufferedSocketDccComms
+# Purpose of this script is to show that send() never waits for the
+# receiver, a local line server here: lines sent while the server is down
+# are buffered, oldest ones dropped beyond buffer_size, and the rest are
+# delivered in order once it is back. A large message only partly written
+# when its connection is lost is written again from its start after
+# reconnecting, so the receiver gets it whole. Counters of get_stats()
+# must add up to what was sent, delivered and dropped.
+#
+LINE = "liota.test.%06d 1 1\n"
+NUM_LINES = 100
+NUM_OUTAGE_LINES = 200000
+BUFFER_LINES = 1000
+LARGE_SIZE = 32 * 1024 * 1024
+
+
+class LineServer(Thread):
+    """
+    Accepts connections and keeps the bytes received on each of them.
+    """
+
+    def __init__(self):
+        Thread.__init__(self)
+        self.daemon = True
+        # Bytes received, a list of strings per connection
+        self.connections = []
+        # Cleared, connections are accepted but not read
+        self.reading = Event()
+        self.reading.set()
+        self.sock = self._listen(0)
+        self.port = self.sock.getsockname()[1]
+        self._conns = []
+        self._lock = Lock()
+        self._listening = Event()
+        self._listening.set()
+        self.start()
+
+    def _listen(self, port):
+        sock = socket.socket()
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind(('127.0.0.1', port))
+        sock.listen(5)
+        return sock
+
+    def run(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except socket.error:
+                # Stopped, wait to be resumed
+                self._listening.wait()
+                continue
+            chunks = []
+            with self._lock:
+                self.connections.append(chunks)
+                self._conns.append(conn)
+            reader = Thread(target=self._read, args=(conn, chunks))
+            reader.daemon = True
+            reader.start()
+
+    def _read(self, conn, chunks):
+        self.reading.wait()
+        try:
+            while True:
+                data = conn.recv(65536)
+                if not data:
+                    break
+                chunks.append(data)
+        except socket.error:
+            pass
+        conn.close()
+
+    def received(self, index=None):
+        with self._lock:
+            connections = list(self.connections)
+        if index is not None:
+            return ''.join(connections[index])
+        return ''.join(''.join(chunks) for chunks in connections)
+
+    def drop(self):
+        """
+        Closes all connections.
+        """
+        with self._lock:
+            conns, self._conns = self._conns, []
+        for conn in conns:
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except socket.error:
+                pass
+
+    def stop(self):
+        """
+        Refuses new connections until resume().
+        """
+        self._listening.clear()
+        self.sock.shutdown(socket.SHUT_RDWR)
+        self.sock.close()
+
+    def resume(self):
+        self.sock = self._listen(self.port)
+        self._listening.set()
+
+
+def wait_for(condition, timeout):
+    deadline = time.time() + timeout
+    while not condition():
+        if time.time() > deadline:
+            return False
+        time.sleep(0.05)
+    return True
+
+
+def wait_stable(read, timeout):
+    # Waits until read() stops changing
+    value = read()
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        time.sleep(0.3)
+        new_value = read()
+        if new_value == value:
+            return value
+        value = new_value
+    return value
+
+
+def lines(first, last):
+    return ''.join(LINE % seq for seq in range(first, last))
+
+
+def outage_test(print_split):
+    server = LineServer()
+    line_size = len(LINE % 0)
+    comms = BufferedSocketDccComms('127.0.0.1', server.port,
+                                   buffer_size=BUFFER_LINES * line_size,
+                                   retry_interval=0.1, max_retry_interval=0.2)
+    for seq in range(NUM_LINES):
+        comms.send(LINE % seq)
+    delivered_before = wait_for(
+        lambda: server.received() == lines(0, NUM_LINES), 10)
+
+    server.stop()
+    server.drop()
+    # Connection lost, I/O thread retrying
+    wait_for(lambda: comms.sock is None, 5)
+    num_sent = NUM_LINES + NUM_OUTAGE_LINES
+    start = time.time()
+    for seq in range(NUM_LINES, num_sent):
+        comms.send(LINE % seq)
+    send_time = time.time() - start
+    stats_down = comms.get_stats()
+
+    server.resume()
+    expected = lines(0, NUM_LINES) + lines(num_sent - BUFFER_LINES, num_sent)
+    delivered = wait_for(lambda: server.received() == expected, 10)
+    stats = comms.get_stats()
+    comms._disconnect()
+
+    print print_split
+    print "  %d lines delivered before outage: %s" % (NUM_LINES,
+                                                       delivered_before)
+    print "  %d sends while server down: %.2f s, %.1f us per send" % (
+        NUM_OUTAGE_LINES, send_time, send_time * 1e6 / NUM_OUTAGE_LINES)
+    print "  Buffered during outage: %d bytes of %d" % (
+        stats_down[3], BUFFER_LINES * line_size)
+    print "  Last %d lines delivered in order after outage: %s" % (
+        BUFFER_LINES, delivered)
+    print "  Stats: queued %d, sent %d, dropped %d, buffered %d, " \
+        "reconnections %d" % tuple(stats)
+    assert delivered_before
+    assert send_time < 10
+    assert stats_down[3] == BUFFER_LINES * line_size
+    assert delivered
+    assert stats[0] == num_sent * line_size
+    assert stats[2] == (NUM_OUTAGE_LINES - BUFFER_LINES) * line_size
+    assert stats[1] == stats[0] - stats[2]
+    assert stats[3] == 0
+    assert stats[4] == 1
+
+
+def partial_write_test(print_split):
+    server = LineServer()
+    server.reading.clear()
+    comms = BufferedSocketDccComms('127.0.0.1', server.port,
+                                   buffer_size=LARGE_SIZE * 2,
+                                   retry_interval=0.1)
+    large = "x" * (LARGE_SIZE - 1) + "\n"
+    comms.send(large)
+    comms.send(LINE % 0)
+    # Written until the buffers of both ends are full
+    written = wait_stable(lambda: comms.get_stats()[1], 10)
+    server.drop()
+    server.reading.set()
+    expected = large + LINE % 0
+    delivered = wait_for(lambda: len(server.connections) == 2 and
+                         server.received(1) == expected, 30)
+    stats = comms.get_stats()
+    comms._disconnect()
+
+    print print_split
+    print "  Large message written before connection lost: %d of %d " \
+        "bytes" % (written, LARGE_SIZE)
+    print "  Delivered whole on next connection: %s" % delivered
+    print "  Stats: queued %d, sent %d, dropped %d, buffered %d, " \
+        "reconnections %d" % tuple(stats)
+    assert 0 < written < LARGE_SIZE
+    assert delivered
+    assert stats[0] == len(expected)
+    assert stats[1] == written + len(expected)
+    assert stats[2:] == [0, 0, 1]
+
+
+def main():
+    print_split = "-" * 76
+    outage_test(print_split)
+    partial_write_test(print_split)
+    print print_split
+
+main()
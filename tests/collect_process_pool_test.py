@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------#
+#  Copyright © 2015-2016 VMware, Inc. All Rights Reserved.                    #
+#                                                                             #
+#  Licensed under the BSD 2-Clause License (the “License”); you may not use   #
+#  this file except in compliance with the License.                           #
+#                                                                             #
+#  The BSD 2-Clause License                                                   #
+#                                                                             #
+#  Redistribution and use in source and binary forms, with or without         #
+#  modification, are permitted provided that the following conditions are met:#
+#                                                                             #
+#  - Redistributions of source code must retain the above copyright notice,   #
+#      this list of conditions and the following disclaimer.                  #
+#                                                                             #
+#  - Redistributions in binary form must reproduce the above copyright        #
+#      notice, this list of conditions and the following disclaimer in the    #
+#      documentation and/or other materials provided with the distribution.   #
+#                                                                             #
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"#
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE  #
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE #
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE  #
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR        #
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF       #
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS   #
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN    #
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)    #
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF     #
+#  THE POSSIBILITY OF SUCH DAMAGE.                                            #
+# ----------------------------------------------------------------------------#
+
+import imp
+import os
+import shutil
+import tempfile
+import time
+from multiprocessing import TimeoutError
+
+from liota.core import metric_handler
+from liota.core.metric_handler import CollectionProcessPool
+from liota.entities.metrics.metric import Metric
+from liota.entities.metrics.registered_metric import RegisteredMetric
+
+#---------------------------------------------------------------------------
+# This is a testing script of CollectionProcessPool
+# Purpose of this script is to show that a sampling function which worker
+# processes can not run never holds up collection: a package loaded with
+# imp.load_source after the pool forked can not be imported by the worker,
+# so sampling it in the pool times out instead of hanging, and its metric
+# is collected in the thread. A metric whose sampling function outlasts the
+# timeout falls back to the thread too, while a sampling function of a
+# module the worker knows still runs in the worker process.
+#
+TIMEOUT = 2
+INTERVAL = 10
+PACKAGE_SOURCE = """
+def sample():
+    return 42
+"""
+
+
+def sample():
+    return os.getpid()
+
+
+def slow_sample():
+    time.sleep(TIMEOUT * 2)
+    return 0
+
+
+def load_package(package_dir, name):
+    package_path = os.path.join(package_dir, name + ".py")
+    with open(package_path, "w") as package_file:
+        package_file.write(PACKAGE_SOURCE)
+    return imp.load_source(name, package_path)
+
+
+def create_metric(name, sampling_function):
+    # Large aggregation_size and interval keep the metric out of the
+    # collection and send threads, collect() is called here; the metric is
+    # stopped before its interval ends, which also ends the scheduler
+    reg_metric = RegisteredMetric(Metric(
+        name=name, interval=INTERVAL, aggregation_size=100,
+        sampling_function=sampling_function, collect_in_process=True),
+        None, None)
+    reg_metric.start_collecting()
+    return reg_metric
+
+
+def collect_values(reg_metric):
+    reg_metric.collect()
+    return list(reg_metric.values.drain()[1])
+
+
+def main():
+    print_split = "-" * 76
+    # A single worker: a worker that dies is replaced by a fork of this
+    # process, which can import the packages loaded so far
+    pool = metric_handler.collect_process_pool = CollectionProcessPool(
+        1, timeout=TIMEOUT)
+    package_dir = tempfile.mkdtemp()
+
+    package = load_package(package_dir, "late_package")
+    start = time.time()
+    try:
+        pool.sample(package.sample, 0)
+        sample_timed_out = False
+    except TimeoutError:
+        sample_timed_out = True
+    sample_time = time.time() - start
+
+    package = load_package(package_dir, "later_package")
+    late = create_metric("late", package.sample)
+    late_values = collect_values(late)
+
+    local = create_metric("local", sample)
+    local_values = collect_values(local)
+
+    slow = create_metric("slow", slow_sample)
+    slow_in_process = slow._collect_in_process
+    start = time.time()
+    slow_values = collect_values(slow)
+    slow_time = time.time() - start
+
+    for reg_metric in (late, local, slow):
+        reg_metric.stop_collecting()
+    metric_handler.terminate()
+    shutil.rmtree(package_dir)
+
+    print print_split
+    print "  Sampling late package in pool timed out: %s, after %.1f s" % (
+        sample_timed_out, sample_time)
+    print "  Late package collected in process: %s, values %s" % (
+        late._collect_in_process, late_values)
+    print "  Local function collected in process: %s, by pid %s (ours %d)" % (
+        local._collect_in_process, local_values, os.getpid())
+    print "  Slow function collected in process: %s, then %s after a " \
+        "timeout in %.1f s" % (slow_in_process, slow._collect_in_process,
+                               slow_time)
+    print print_split
+    assert sample_timed_out and sample_time < TIMEOUT + 1
+    assert not late._collect_in_process and late_values == [42]
+    assert local._collect_in_process
+    assert local_values and local_values[0] != os.getpid()
+    assert slow_in_process and not slow._collect_in_process
+    assert slow_values == [] and slow_time < TIMEOUT + 1
+
+main()
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------#
+#  Copyright © 2015-2016 VMware, Inc. All Rights Reserved.                    #
+#                                                                             #
+#  Licensed under the BSD 2-Clause License (the “License”); you may not use   #
+#  this file except in compliance with the License.                           #
+#                                                                             #
+#  The BSD 2-Clause License                                                   #
+#                                                                             #
+#  Redistribution and use in source and binary forms, with or without         #
+#  modification, are permitted provided that the following conditions are met:#
+#                                                                             #
+#  - Redistributions of source code must retain the above copyright notice,   #
+#      this list of conditions and the following disclaimer.                  #
+#                                                                             #
+#  - Redistributions in binary form must reproduce the above copyright        #
+#      notice, this list of conditions and the following disclaimer in the    #
+#      documentation and/or other materials provided with the distribution.   #
+#                                                                             #
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"#
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE  #
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE #
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE  #
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR        #
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF       #
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS   #
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN    #
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)    #
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF     #
+#  THE POSSIBILITY OF SUCH DAMAGE.                                            #
+# ----------------------------------------------------------------------------#
+
+import heapq
+import random
+from time import time
+
+from liota.core.metric_handler import EventsPriorityQueue
+from liota.entities.metrics.metric import Metric
+from liota.entities.metrics.registered_metric import RegisteredMetric
+from liota.lib.utilities.utility import getUTCmillis
+
+#---------------------------------------------------------------------------
+# This is a micro-benchmark of liota.core.metric_handler.EventsPriorityQueue
+# Purpose of this script is to show the cost of inserting a metric into the
+# waiting queue, of reading the head of the queue and of popping ready
+# metrics, with 1k, 10k and 100k metrics registered on one edge system.
+# Reading the head through heapq.nsmallest() is printed for comparison.
+#
+def main():
+    print_split = "-" * 76
+    num_ops = 1000
+    metric = Metric(name="benchmark-metric", interval=5)
+
+    def build_queue(num_metrics):
+        now = getUTCmillis()
+        queue = EventsPriorityQueue()
+        for _ in range(num_metrics):
+            reg_metric = RegisteredMetric(metric, None, None)
+            reg_metric.flag_alive = True
+            reg_metric._next_run_time = now - random.randint(1, 60000)
+            queue.put_and_notify(reg_metric)
+        return queue
+
+    print print_split
+    print "  %-10s %16s %16s %16s %16s" % (
+        "metrics", "insert (us)", "head (us)", "nsmallest (us)", "pop (us)")
+    print print_split
+    for num_metrics in [1000, 10000, 100000]:
+        queue = build_queue(num_metrics)
+
+        extra = []
+        for _ in range(num_ops):
+            reg_metric = RegisteredMetric(metric, None, None)
+            reg_metric.flag_alive = True
+            reg_metric._next_run_time = getUTCmillis() - \
+                random.randint(1, 60000)
+            extra.append(reg_metric)
+        start = time()
+        for reg_metric in extra:
+            queue.put_and_notify(reg_metric)
+        t_insert = (time() - start) / num_ops
+
+        start = time()
+        for _ in range(num_ops):
+            queue.queue[0]
+        t_head = (time() - start) / num_ops
+
+        num_nsmallest = max(1, num_ops * 1000 / num_metrics)
+        start = time()
+        for _ in range(num_nsmallest):
+            heapq.nsmallest(1, queue.queue)
+        t_nsmallest = (time() - start) / num_nsmallest
+
+        start = time()
+        for _ in range(num_ops):
+            queue.get_next_element_when_ready()
+        t_pop = (time() - start) / num_ops
+
+        print "  %-10d %16.2f %16.2f %16.2f %16.2f" % (
+            num_metrics,
+            t_insert * 1e6,
+            t_head * 1e6,
+            t_nsmallest * 1e6,
+            t_pop * 1e6
+        )
+
+    # Lazy deletion: dead metrics are dropped when they reach the head
+    queue = build_queue(10000)
+    for reg_metric in queue.queue[::2]:
+        reg_metric.flag_alive = False
+    start = time()
+    for _ in range(num_ops):
+        queue.get_next_element_when_ready()
+    t_pop = (time() - start) / num_ops
+    print print_split
+    print "  10000 metrics, half stopped: pop %.2f us, discarded %d" % (
+        t_pop * 1e6, queue.num_discarded)
+    print print_split
+
+main()
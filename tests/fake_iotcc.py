@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------#
+#  Copyright © 2015-2016 VMware, Inc. All Rights Reserved.                    #
+#                                                                             #
+#  Licensed under the BSD 2-Clause License (the “License”); you may not use   #
+#  this file except in compliance with the License.                           #
+#                                                                             #
+#  The BSD 2-Clause License                                                   #
+#                                                                             #
+#  Redistribution and use in source and binary forms, with or without         #
+#  modification, are permitted provided that the following conditions are met:#
+#                                                                             #
+#  - Redistributions of source code must retain the above copyright notice,   #
+#      this list of conditions and the following disclaimer.                  #
+#                                                                             #
+#  - Redistributions in binary form must reproduce the above copyright        #
+#      notice, this list of conditions and the following disclaimer in the    #
+#      documentation and/or other materials provided with the distribution.   #
+#                                                                             #
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"#
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE  #
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE #
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE  #
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR        #
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF       #
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS   #
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN    #
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)    #
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF     #
+#  THE POSSIBILITY OF SUCH DAMAGE.                                            #
+# ----------------------------------------------------------------------------#
+
+import base64
+import hashlib
+import json
+import socket
+import struct
+import threading
+
+#---------------------------------------------------------------------------
+# Minimal fake IoTCC server for testing scripts and benchmarks of
+# liota.dccs.iotcc and liota.lib.transports.web_socket, on a local port.
+# It does the Helix handshake and answers each
+# create_or_find_resource_request after a fixed latency, as a remote IoTCC
+# would; resources of "pending" devices are reported as being created
+# ("null" UUID) on the first request, to exercise the retry. Other messages
+# are recorded, not answered. An outage is simulated by drop() and stop(),
+# and ended by resume().
+#
+_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+
+def _recv_exactly(conn, size):
+    data = ''
+    while len(data) < size:
+        chunk = conn.recv(size - len(data))
+        if not chunk:
+            raise IOError("Connection closed")
+        data += chunk
+    return data
+
+
+def _read_frame(conn):
+    b1, b2 = struct.unpack('!BB', _recv_exactly(conn, 2))
+    length = b2 & 0x7f
+    if length == 126:
+        length, = struct.unpack('!H', _recv_exactly(conn, 2))
+    elif length == 127:
+        length, = struct.unpack('!Q', _recv_exactly(conn, 8))
+    # Frames from clients are always masked
+    mask = [ord(c) for c in _recv_exactly(conn, 4)]
+    data = _recv_exactly(conn, length)
+    return b1 & 0x0f, ''.join(chr(ord(c) ^ mask[i % 4])
+                              for i, c in enumerate(data))
+
+
+def _frame(data):
+    if len(data) < 126:
+        return struct.pack('!BB', 0x81, len(data)) + data
+    return struct.pack('!BBH', 0x81, 126, len(data)) + data
+
+
+class FakeIotcc(threading.Thread):
+    """
+    Serves one WebSocket connection at a time, speaking just enough of the
+    Helix protocol for login and registration.
+    """
+
+    def __init__(self, latency=0):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.latency = latency
+        self.num_requests = 0
+        # Messages received, a list of dicts per connection
+        self.connections = []
+        self.sock = self._listen(0)
+        self.port = self.sock.getsockname()[1]
+        self.url = "ws://127.0.0.1:%d/" % self.port
+        self._conn = None
+        self._lock = threading.Lock()
+        self._listening = threading.Event()
+        self._listening.set()
+        self.start()
+
+    def _listen(self, port):
+        sock = socket.socket()
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind(('127.0.0.1', port))
+        sock.listen(1)
+        return sock
+
+    def run(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except socket.error:
+                # Stopped, wait to be resumed
+                self._listening.wait()
+                continue
+            self._conn = conn
+            self._serve(conn)
+
+    def num_logins(self):
+        return sum(1 for messages in self.connections
+                   for msg in messages if msg["type"] == "connection_response")
+
+    def received(self, msg_type):
+        return [msg for messages in self.connections for msg in messages
+                if msg["type"] == msg_type]
+
+    def drop(self):
+        """
+        Closes the current connection.
+        """
+        conn = self._conn
+        if conn is not None:
+            conn.shutdown(socket.SHUT_RDWR)
+
+    def stop(self):
+        """
+        Refuses new connections until resume().
+        """
+        self._listening.clear()
+        self.sock.shutdown(socket.SHUT_RDWR)
+        self.sock.close()
+
+    def resume(self):
+        self.sock = self._listen(self.port)
+        self._listening.set()
+
+    def _reply(self, conn, msg):
+        with self._lock:
+            conn.sendall(_frame(json.dumps(msg)))
+
+    def _serve(self, conn):
+        request = ''
+        while '\r\n\r\n' not in request:
+            request += conn.recv(4096)
+        key = [line.split(':', 1)[1].strip()
+               for line in request.split('\r\n')
+               if line.lower().startswith('sec-websocket-key')][0]
+        conn.sendall("HTTP/1.1 101 Switching Protocols\r\n"
+                     "Upgrade: websocket\r\nConnection: Upgrade\r\n"
+                     "Sec-WebSocket-Accept: %s\r\n\r\n" %
+                     base64.b64encode(hashlib.sha1(key + _GUID).digest()))
+        messages = []
+        self.connections.append(messages)
+        self._reply(conn, {"type": "connection_request", "transactionID": 1,
+                           "body": {}})
+        requested = set()
+        try:
+            while True:
+                opcode, data = _read_frame(conn)
+                if opcode == 8:
+                    break
+                msg = json.loads(data)
+                messages.append(msg)
+                if msg["type"] == "connection_response":
+                    self._reply(conn, {"type": "connection_verified",
+                                       "body": {"result": "succeeded"}})
+                elif msg["type"] == "create_or_find_resource_request":
+                    self.num_requests += 1
+                    res_id = msg["body"]["id"]
+                    uuid = "uuid-" + res_id
+                    if res_id.startswith("pending") and res_id not in requested:
+                        uuid = "null"
+                    requested.add(res_id)
+                    timer = threading.Timer(self.latency, self._reply, (conn, {
+                        "type": "create_or_find_resource_response",
+                        "transactionID": msg["transactionID"],
+                        "body": {"uuid": uuid}}))
+                    timer.daemon = True
+                    timer.start()
+        except (IOError, socket.error):
+            pass
+        self._conn = None
+        conn.close()
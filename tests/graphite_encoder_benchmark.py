@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------#
+#  Copyright © 2015-2016 VMware, Inc. All Rights Reserved.                    #
+#                                                                             #
+#  Licensed under the BSD 2-Clause License (the “License”); you may not use   #
+#  this file except in compliance with the License.                           #
+#                                                                             #
+#  The BSD 2-Clause License                                                   #
+#                                                                             #
+#  Redistribution and use in source and binary forms, with or without         #
+#  modification, are permitted provided that the following conditions are met:#
+#                                                                             #
+#  - Redistributions of source code must retain the above copyright notice,   #
+#      this list of conditions and the following disclaimer.                  #
+#                                                                             #
+#  - Redistributions in binary form must reproduce the above copyright        #
+#      notice, this list of conditions and the following disclaimer in the    #
+#      documentation and/or other materials provided with the distribution.   #
+#                                                                             #
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"#
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE  #
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE #
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE  #
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR        #
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF       #
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS   #
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN    #
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)    #
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF     #
+#  THE POSSIBILITY OF SUCH DAMAGE.                                            #
+# ----------------------------------------------------------------------------#
+
+from time import time
+
+from liota.dcc_comms.dcc_comms import DCCComms
+from liota.dccs.graphite import Graphite
+from liota.entities.metrics.metric import Metric
+from liota.lib.utilities.utility import getUTCmillis
+
+#---------------------------------------------------------------------------
+# This is a micro-benchmark of liota.dccs.graphite.GraphiteLineEncoder
+# Purpose of this script is to show the cost of formatting a 100k line
+# payload, buffered e.g. during an outage, with the line encoder compared
+# to building the message by string concatenation, and the number of sends
+# when 100 metrics are published one by one or through publish_many().
+#
+class CountingComms(DCCComms):
+
+    def __init__(self):
+        self.num_sends = 0
+        self.num_bytes = 0
+
+    def _connect(self):
+        pass
+
+    def _disconnect(self):
+        pass
+
+    def send(self, message, msg_attr=None):
+        self.num_sends += 1
+        self.num_bytes += len(message)
+
+    def receive(self):
+        pass
+
+
+def concat_format(name, timestamps, values):
+    message = ''
+    for ts, v in zip(timestamps, values):
+        message += '%s %s %d\n' % (name, v, ts / 1000)
+    return message
+
+
+def main():
+    print_split = "-" * 76
+    num_lines = 100000
+    now = getUTCmillis()
+    samples = [(now + i, i * 0.25) for i in range(num_lines)]
+
+    comms = CountingComms()
+    graphite = Graphite(comms)
+    reg_metric = graphite.register(Metric(name="edge-system.cpu.load"))
+    timestamps, values = zip(*samples)
+
+    print print_split
+    print "  Formatting %d lines" % num_lines
+    print print_split
+    start = time()
+    concat_format(reg_metric.ref_entity.name, timestamps, values)
+    print "  %-40s %16.1f ms" % ("string concatenation", (time() - start) * 1e3)
+
+    reg_metric.add_collected_data(samples)
+    start = time()
+    payload = graphite._format_data(reg_metric)
+    print "  %-40s %16.1f ms" % ("GraphiteLineEncoder", (time() - start) * 1e3)
+    print "  %-40s %16d bytes" % ("payload", len(payload))
+
+    num_metrics = 100
+    lines_per_metric = num_lines / num_metrics
+    reg_metrics = [graphite.register(Metric(name="edge-system.metric-%d" % i))
+                   for i in range(num_metrics)]
+
+    def fill():
+        for reg_metric in reg_metrics:
+            reg_metric.add_collected_data(samples[:lines_per_metric])
+
+    print print_split
+    print "  Publishing %d metrics of %d lines" % (num_metrics, lines_per_metric)
+    print print_split
+    fill()
+    comms.num_sends = 0
+    start = time()
+    for reg_metric in reg_metrics:
+        graphite.publish(reg_metric)
+    print "  %-24s %8d sends %16.1f ms" % (
+        "publish()", comms.num_sends, (time() - start) * 1e3)
+    fill()
+    comms.num_sends = 0
+    start = time()
+    graphite.publish_many(reg_metrics)
+    print "  %-24s %8d sends %16.1f ms" % (
+        "publish_many()", comms.num_sends, (time() - start) * 1e3)
+    print print_split
+
+main()
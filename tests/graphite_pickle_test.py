@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------#
+#  Copyright © 2015-2016 VMware, Inc. All Rights Reserved.                    #
+#                                                                             #
+#  Licensed under the BSD 2-Clause License (the “License”); you may not use   #
+#  this file except in compliance with the License.                           #
+#                                                                             #
+#  The BSD 2-Clause License                                                   #
+#                                                                             #
+#  Redistribution and use in source and binary forms, with or without         #
+#  modification, are permitted provided that the following conditions are met:#
+#                                                                             #
+#  - Redistributions of source code must retain the above copyright notice,   #
+#      this list of conditions and the following disclaimer.                  #
+#                                                                             #
+#  - Redistributions in binary form must reproduce the above copyright        #
+#      notice, this list of conditions and the following disclaimer in the    #
+#      documentation and/or other materials provided with the distribution.   #
+#                                                                             #
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"#
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE  #
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE #
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE  #
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR        #
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF       #
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS   #
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN    #
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)    #
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF     #
+#  THE POSSIBILITY OF SUCH DAMAGE.                                            #
+# ----------------------------------------------------------------------------#
+
+import cPickle as pickle
+import socket
+import struct
+from threading import Thread
+
+from liota.dcc_comms.socket_comms import SocketDccComms
+from liota.dccs.graphite import Graphite, GraphiteProtocol
+from liota.entities.metrics.metric import Metric
+
+#---------------------------------------------------------------------------
+# This is a testing script of the pickle protocol of liota.dccs.graphite
+# Purpose of this script is to show that frames sent by the Graphite DCC in
+# pickle mode are decoded by a stub of the Carbon pickle receiver into the
+# samples collected by the metrics, when published one by one as well as
+# when batched through publish_many(), also across several frames.
+#
+class StubCarbonReceiver(Thread):
+    """
+    Accepts one connection and decodes frames like the pickle receiver of
+    Carbon: a 4-byte big-endian length followed by a pickled list of
+    (path, (timestamp, value)) tuples.
+    """
+
+    def __init__(self):
+        Thread.__init__(self)
+        self.daemon = True
+        self.sock = socket.socket()
+        self.sock.bind(('127.0.0.1', 0))
+        self.sock.listen(1)
+        self.port = self.sock.getsockname()[1]
+        self.frames = []
+        self.start()
+
+    def _recv_exactly(self, conn, length):
+        data = ''
+        while len(data) < length:
+            chunk = conn.recv(length - len(data))
+            if not chunk:
+                return None
+            data += chunk
+        return data
+
+    def run(self):
+        conn, _ = self.sock.accept()
+        while True:
+            header = self._recv_exactly(conn, 4)
+            if header is None:
+                break
+            length = struct.unpack('!L', header)[0]
+            self.frames.append(pickle.loads(self._recv_exactly(conn, length)))
+        conn.close()
+        self.sock.close()
+
+
+def main():
+    print_split = "-" * 76
+    receiver = StubCarbonReceiver()
+    comms = SocketDccComms(ip='127.0.0.1', port=receiver.port)
+    graphite = Graphite(comms, protocol="pickle")
+    graphite.encoder.max_frame_samples = 500
+
+    reg_metrics = [graphite.register(Metric(name="edge system.metric-%d" % i))
+                   for i in range(10)]
+    expected = []
+    for i, reg_metric in enumerate(reg_metrics):
+        samples = [(1500000000000 + 1000 * j, i * 1000 + j * 0.5)
+                   for j in range(300)]
+        reg_metric.add_collected_data(samples)
+        expected.extend((reg_metric.graphite_path, (ts / 1000, v))
+                        for ts, v in samples)
+
+    graphite.publish(reg_metrics[0])
+    graphite.publish_many(reg_metrics[1:])
+    comms.sock.close()
+    receiver.join(5)
+
+    received = [datapoint for frame in receiver.frames for datapoint in frame]
+    print print_split
+    print "  Protocol: %s" % graphite.protocol
+    print "  Frames received: %d (expected 1 + %d)" % (
+        len(receiver.frames), (len(expected) - 300 + 499) / 500)
+    print "  Samples received: %d of %d" % (len(received), len(expected))
+    print "  First sample: %s" % str(received[0])
+    print "  Samples match: %s" % (received == expected)
+    print print_split
+    assert graphite.protocol is GraphiteProtocol.PICKLE
+    assert received == expected
+
+main()
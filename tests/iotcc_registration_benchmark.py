@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------#
+#  Copyright © 2015-2016 VMware, Inc. All Rights Reserved.                    #
+#                                                                             #
+#  Licensed under the BSD 2-Clause License (the “License”); you may not use   #
+#  this file except in compliance with the License.                           #
+#                                                                             #
+#  The BSD 2-Clause License                                                   #
+#                                                                             #
+#  Redistribution and use in source and binary forms, with or without         #
+#  modification, are permitted provided that the following conditions are met:#
+#                                                                             #
+#  - Redistributions of source code must retain the above copyright notice,   #
+#      this list of conditions and the following disclaimer.                  #
+#                                                                             #
+#  - Redistributions in binary form must reproduce the above copyright        #
+#      notice, this list of conditions and the following disclaimer in the    #
+#      documentation and/or other materials provided with the distribution.   #
+#                                                                             #
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"#
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE  #
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE #
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE  #
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR        #
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF       #
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS   #
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN    #
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)    #
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF     #
+#  THE POSSIBILITY OF SUCH DAMAGE.                                            #
+# ----------------------------------------------------------------------------#
+import threading
+from time import time
+
+from liota.dcc_comms.websocket_dcc_comms import WebSocketDccComms
+from liota.dccs.iotcc import IotControlCenter
+from liota.entities.devices.device import Device
+
+from fake_iotcc import FakeIotcc
+
+#---------------------------------------------------------------------------
+# This is a benchmark of registration in liota.dccs.iotcc.IotControlCenter
+# Purpose of this script is to compare registering devices one at a time
+# with register(), which waits for each response, to register_many(), which
+# has all requests in flight at once. A minimal fake IoTCC server on a
+# local port, from fake_iotcc, answers each registration request after a
+# fixed latency, as a remote IoTCC would, and reports resources of
+# "pending" devices as being created on the first request, to exercise
+# the retry.
+#
+LATENCY = 0.02
+NUM_SERIAL = 100
+NUM_MANY = 500
+NUM_PENDING = 50
+
+
+def main():
+    print_split = "-" * 76
+    server = FakeIotcc(LATENCY)
+    iotcc = IotControlCenter("user", "password",
+                             WebSocketDccComms(url=server.url))
+    iotcc.registration_retry_interval = 0.5
+
+    start = time()
+    for i in range(NUM_SERIAL):
+        iotcc.register(Device("serial-%d" % i, "serial-%d" % i, "Sensor"))
+    serial_time = time() - start
+
+    devices = [Device("device-%d" % i, "device-%d" % i, "Sensor")
+               for i in range(NUM_MANY)]
+    num_requests = server.num_requests
+    start = time()
+    futures = iotcc.register_many(devices)
+    reg_devices = [future.result(30) for future in futures]
+    many_time = time() - start
+    many_requests = server.num_requests - num_requests
+
+    pending = [Device("pending-%d" % i, "pending-%d" % i, "Sensor")
+               for i in range(NUM_PENDING)]
+    start = time()
+    reg_pending = [future.result(30)
+                   for future in iotcc.register_many(pending)]
+    pending_time = time() - start
+
+    print print_split
+    print "  Response latency of fake IoTCC: %.0f ms" % (LATENCY * 1000)
+    print "  register(), %d devices: %.2f s, %.1f per s" % (
+        NUM_SERIAL, serial_time, NUM_SERIAL / serial_time)
+    print "  register_many(), %d devices: %.2f s, %.1f per s, %d requests" % (
+        NUM_MANY, many_time, NUM_MANY / many_time, many_requests)
+    print "  register_many(), %d devices created by IoTCC after a retry " \
+          "in %.1f s: %.2f s" % (NUM_PENDING,
+                                 iotcc.registration_retry_interval,
+                                 pending_time)
+    print "  Threads running: %d" % threading.active_count()
+    print print_split
+    assert [reg.reg_entity_id for reg in reg_devices] == \
+        ["uuid-" + device.entity_id for device in devices]
+    assert [reg.reg_entity_id for reg in reg_pending] == \
+        ["uuid-" + device.entity_id for device in pending]
+
+main()
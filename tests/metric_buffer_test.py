@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------#
+#  Copyright © 2015-2016 VMware, Inc. All Rights Reserved.                    #
+#                                                                             #
+#  Licensed under the BSD 2-Clause License (the “License”); you may not use   #
+#  this file except in compliance with the License.                           #
+#                                                                             #
+#  The BSD 2-Clause License                                                   #
+#                                                                             #
+#  Redistribution and use in source and binary forms, with or without         #
+#  modification, are permitted provided that the following conditions are met:#
+#                                                                             #
+#  - Redistributions of source code must retain the above copyright notice,   #
+#      this list of conditions and the following disclaimer.                  #
+#                                                                             #
+#  - Redistributions in binary form must reproduce the above copyright        #
+#      notice, this list of conditions and the following disclaimer in the    #
+#      documentation and/or other materials provided with the distribution.   #
+#                                                                             #
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"#
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE  #
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE #
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE  #
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR        #
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF       #
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS   #
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN    #
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)    #
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF     #
+#  THE POSSIBILITY OF SUCH DAMAGE.                                            #
+# ----------------------------------------------------------------------------#
+import time
+from threading import Thread
+
+from liota.core import metric_handler
+from liota.core.metric_handler import OverflowPolicy
+from liota.entities.metrics.metric import Metric
+from liota.entities.metrics.sample_buffer import SampleBuffer
+
+from stub_dcc import StubDcc
+
+#---------------------------------------------------------------------------
+# This is a testing script of value buffers of registered metrics
+# Purpose of this script is to show that a full value buffer never holds up
+# collection: the BLOCK overflow policy is rejected for value buffers, as a
+# collection thread waiting for room would wait forever for a send thread,
+# and a metric whose aggregation_size is larger than its buffer_size keeps
+# being published, both when pushed from several threads and when polled.
+#
+BUFFER_SIZE = 8
+AGGREGATION_SIZE = 32
+NUM_INGESTED = 2000
+
+
+def rejects_block(create):
+    try:
+        create()
+    except ValueError:
+        return True
+    return False
+
+
+def main():
+    print_split = "-" * 76
+    read_core_config = metric_handler._read_core_config
+    metric_handler._read_core_config = lambda option, default: \
+        "block" if option.endswith("_policy") else default
+    try:
+        config_policy = metric_handler.get_overflow_config(
+            "metric_buffer", OverflowPolicy.DROP_OLDEST,
+            unsupported=(OverflowPolicy.BLOCK,))[1]
+    finally:
+        metric_handler._read_core_config = read_core_config
+
+    dcc = StubDcc()
+    pushed = dcc.register(Metric(
+        name="pushed", aggregation_size=AGGREGATION_SIZE,
+        buffer_size=BUFFER_SIZE, buffer_policy=OverflowPolicy.DROP_OLDEST))
+    pushed.start_collecting()
+    ingest_threads = [Thread(target=pushed.ingest_batch,
+                             args=(range(NUM_INGESTED),))
+                      for _ in range(4)]
+    for thread in ingest_threads:
+        thread.daemon = True
+        thread.start()
+    for thread in ingest_threads:
+        thread.join(10)
+    ingest_done = not any(thread.is_alive() for thread in ingest_threads)
+
+    polled = dcc.register(Metric(
+        name="polled", interval=0, aggregation_size=AGGREGATION_SIZE,
+        sampling_function=lambda: [(i, i) for i in range(BUFFER_SIZE * 2)],
+        buffer_size=BUFFER_SIZE, buffer_policy=OverflowPolicy.DROP_NEWEST))
+    polled.start_collecting()
+    time.sleep(1)
+    polled.stop_collecting()
+    pushed.stop_collecting()
+    time.sleep(0.5)
+    metric_handler.terminate()
+    messages = dcc.comms.messages
+
+    print print_split
+    print "  BLOCK rejected by SampleBuffer: %s" % rejects_block(
+        lambda: SampleBuffer(BUFFER_SIZE, OverflowPolicy.BLOCK))
+    print "  BLOCK rejected by Metric: %s" % rejects_block(
+        lambda: Metric(name="blocking", buffer_size=BUFFER_SIZE,
+                       buffer_policy=OverflowPolicy.BLOCK))
+    print "  metric_buffer_policy = block in liota.conf used as: %s" % \
+        config_policy.name
+    print "  Ingest of %d values by 4 threads into %d values done: %s" % (
+        NUM_INGESTED, BUFFER_SIZE, ingest_done)
+    print "  Publishes with aggregation_size %d > buffer_size %d: %d" % (
+        AGGREGATION_SIZE, BUFFER_SIZE, len(messages))
+    print "  Values dropped by pushed, polled buffers: %d, %d" % (
+        pushed.values.num_dropped, polled.values.num_dropped)
+    print print_split
+    assert config_policy is OverflowPolicy.DROP_OLDEST
+    assert ingest_done
+    assert all(len(message) <= BUFFER_SIZE for message in messages)
+    assert polled.values.num_dropped > 0 and len(messages) > 4
+
+main()
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------#
+#  Copyright © 2015-2016 VMware, Inc. All Rights Reserved.                    #
+#                                                                             #
+#  Licensed under the BSD 2-Clause License (the “License”); you may not use   #
+#  this file except in compliance with the License.                           #
+#                                                                             #
+#  The BSD 2-Clause License                                                   #
+#                                                                             #
+#  Redistribution and use in source and binary forms, with or without         #
+#  modification, are permitted provided that the following conditions are met:#
+#                                                                             #
+#  - Redistributions of source code must retain the above copyright notice,   #
+#      this list of conditions and the following disclaimer.                  #
+#                                                                             #
+#  - Redistributions in binary form must reproduce the above copyright        #
+#      notice, this list of conditions and the following disclaimer in the    #
+#      documentation and/or other materials provided with the distribution.   #
+#                                                                             #
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"#
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE  #
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE #
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE  #
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR        #
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF       #
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS   #
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN    #
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)    #
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF     #
+#  THE POSSIBILITY OF SUCH DAMAGE.                                            #
+# ----------------------------------------------------------------------------#
+
+import random
+from time import time
+
+from liota.lib.utilities.filters import range_filter
+from liota.lib.utilities.filters.range_filter import RangeFilter, Type
+
+#---------------------------------------------------------------------------
+# This is a micro-benchmark of liota.lib.utilities.filters.range_filter
+# Purpose of this script is to show the per-sample cost of RangeFilter for
+# each of the 12 filter types, filtering values one by one with filter(),
+# and in batches with filter_many(), with and without NumPy.
+#
+def main():
+    print_split = "-" * 76
+    num_samples = 100000
+    batch_size = 500
+    lower_bound, upper_bound = 10, 90
+    random.seed(0)
+    values = [random.uniform(0, 100) for _ in range(num_samples)]
+    samples = [(i, v) for i, v in enumerate(values)]
+    batches = [samples[i:i + batch_size]
+               for i in range(0, num_samples, batch_size)]
+    numpy = range_filter.numpy
+
+    def per_sample(func):
+        start = time()
+        func()
+        return (time() - start) / num_samples * 1e9
+
+    print print_split
+    print "  %d samples, batches of %d, NumPy %s" % (
+        num_samples, batch_size,
+        "installed" if numpy is not None else "not installed")
+    print print_split
+    print "  %-20s %8s %16s %16s %12s" % (
+        "type", "passed", "filter (ns)", "many (ns)", "NumPy (ns)")
+    print print_split
+    for filter_type in Type:
+        range_filter_obj = RangeFilter(filter_type, lower_bound, upper_bound)
+        filter_one = range_filter_obj.filter
+        filter_many = range_filter_obj.filter_many
+
+        t_filter = per_sample(lambda: [filter_one(v) for v in values])
+
+        range_filter.numpy = None
+        t_many = per_sample(lambda: [filter_many(b) for b in batches])
+        range_filter.numpy = numpy
+
+        t_numpy = "n/a"
+        if numpy is not None:
+            t_numpy = "%12.1f" % per_sample(
+                lambda: [filter_many(b) for b in batches])
+
+        num_passed = sum(len(filter_many(b)) for b in batches)
+        print "  %-20s %8d %16.1f %16.1f %12s" % (
+            filter_type.name, num_passed, t_filter, t_many, t_numpy)
+    print print_split
+
+main()
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------#
+#  Copyright © 2015-2016 VMware, Inc. All Rights Reserved.                    #
+#                                                                             #
+#  Licensed under the BSD 2-Clause License (the “License”); you may not use   #
+#  this file except in compliance with the License.                           #
+#                                                                             #
+#  The BSD 2-Clause License                                                   #
+#                                                                             #
+#  Redistribution and use in source and binary forms, with or without         #
+#  modification, are permitted provided that the following conditions are met:#
+#                                                                             #
+#  - Redistributions of source code must retain the above copyright notice,   #
+#      this list of conditions and the following disclaimer.                  #
+#                                                                             #
+#  - Redistributions in binary form must reproduce the above copyright        #
+#      notice, this list of conditions and the following disclaimer in the    #
+#      documentation and/or other materials provided with the distribution.   #
+#                                                                             #
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"#
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE  #
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE #
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE  #
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR        #
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF       #
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS   #
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN    #
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)    #
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF     #
+#  THE POSSIBILITY OF SUCH DAMAGE.                                            #
+# ----------------------------------------------------------------------------#
+from numbers import Number
+
+from liota.lib.utilities.filters import range_filter
+from liota.lib.utilities.filters.range_filter import RangeFilter, Type
+
+#---------------------------------------------------------------------------
+# This is a testing script of liota.lib.utilities.filters.range_filter
+# Purpose of this script is to show that filter() passes exactly the values
+# the if/elif chain of comparisons it was first written as passes, and that
+# filter_many() passes exactly the samples filter() passes, for each of the
+# 12 filter types, both comparing values one by one and, when NumPy is
+# installed, as an array. Values include the bounds, values next to them,
+# infinities and NaN. Bounds of a RangeFilter must not be assignable, as
+# both methods are to apply the same ones.
+#
+LOWER_BOUND, UPPER_BOUND = 10, 90
+
+
+def reference_filter(filter_type, lower_bound, upper_bound, v):
+    """
+    RangeFilter.filter() as written before its predicates were precompiled.
+    """
+    result = None
+    if not isinstance(v, Number):
+        return v
+
+    # Accept filters - bounded at both ends
+    elif filter_type is Type.CLOSED and (lower_bound <= v <= upper_bound):
+        result = v
+
+    elif filter_type is Type.OPEN and (lower_bound < v < upper_bound):
+        result = v
+
+    elif filter_type is Type.CLOSED_OPEN and (lower_bound <= v < upper_bound):
+        result = v
+
+    elif filter_type is Type.OPEN_CLOSED and (lower_bound < v <= upper_bound):
+        result = v
+
+    # Reject filters - bounded at both ends
+    elif filter_type is Type.CLOSED_REJECT and (not lower_bound <= v <= upper_bound):
+        result = v
+
+    elif filter_type is Type.OPEN_REJECT and (not lower_bound < v < upper_bound):
+        result = v
+
+    elif filter_type is Type.CLOSED_OPEN_REJECT and (not lower_bound <= v < upper_bound):
+        result = v
+
+    elif filter_type is Type.OPEN_CLOSED_REJECT and (not lower_bound < v <= upper_bound):
+        result = v
+
+    # Filters - bounded at one end
+    elif filter_type is Type.LESS_THAN and (v < lower_bound):
+        result = v
+
+    elif filter_type is Type.AT_MOST and (v <= lower_bound):
+        result = v
+
+    elif filter_type is Type.GREATER_THAN and (v > upper_bound):
+        result = v
+
+    elif filter_type is Type.AT_LEAST and (v >= upper_bound):
+        result = v
+
+    return result
+
+
+def bounds_assignable(range_filter_obj):
+    try:
+        range_filter_obj.lower_bound = 0
+    except AttributeError:
+        try:
+            range_filter_obj.upper_bound = 0
+        except AttributeError:
+            return False
+    return True
+
+
+def test_values():
+    nan, inf = float("nan"), float("inf")
+    values = [LOWER_BOUND, UPPER_BOUND, float(LOWER_BOUND), float(UPPER_BOUND),
+              LOWER_BOUND - 1, LOWER_BOUND + 1, UPPER_BOUND - 1,
+              UPPER_BOUND + 1, LOWER_BOUND - 1e-9, UPPER_BOUND + 1e-9,
+              0, -5, 50, 100, 49.5, nan, inf, -inf]
+    # Long enough for the NumPy path
+    return values * (range_filter.NUMPY_MIN_BATCH // len(values) + 1)
+
+
+def main():
+    print_split = "-" * 76
+    numpy = range_filter.numpy
+    values = test_values()
+    samples = list(enumerate(values))
+    all_correct = True
+    print print_split
+    print "  %-20s %8s %10s %12s %8s" % (
+        "type", "passed", "filter", "one by one", "NumPy")
+    print print_split
+    for filter_type in Type:
+        range_filter_obj = RangeFilter(filter_type, LOWER_BOUND, UPPER_BOUND)
+        expected = [(i, v) for i, v in samples
+                    if range_filter_obj.filter(v) is not None]
+        # Same object returned, NaN not being equal to itself
+        correct_filter = all(
+            range_filter_obj.filter(v) is
+            reference_filter(filter_type, LOWER_BOUND, UPPER_BOUND, v)
+            for v in values + ["text", None])
+        range_filter.numpy = None
+        correct = range_filter_obj.filter_many(samples) == expected
+        range_filter.numpy = numpy
+        correct_numpy = None
+        if numpy is not None:
+            correct_numpy = range_filter_obj.filter_many(samples) == expected
+        print "  %-20s %8d %10s %12s %8s" % (
+            filter_type.name, len(expected), correct_filter, correct,
+            "n/a" if numpy is None else correct_numpy)
+        all_correct = all_correct and correct_filter and correct and \
+            correct_numpy is not False
+    assignable = bounds_assignable(RangeFilter(Type.CLOSED, LOWER_BOUND,
+                                               UPPER_BOUND))
+    print print_split
+    print "  Bounds assignable after construction: %s" % assignable
+    print print_split
+    assert all_correct and not assignable
+
+main()
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------#
+#  Copyright © 2015-2016 VMware, Inc. All Rights Reserved.                    #
+#                                                                             #
+#  Licensed under the BSD 2-Clause License (the “License”); you may not use   #
+#  this file except in compliance with the License.                           #
+#                                                                             #
+#  The BSD 2-Clause License                                                   #
+#                                                                             #
+#  Redistribution and use in source and binary forms, with or without         #
+#  modification, are permitted provided that the following conditions are met:#
+#                                                                             #
+#  - Redistributions of source code must retain the above copyright notice,   #
+#      this list of conditions and the following disclaimer.                  #
+#                                                                             #
+#  - Redistributions in binary form must reproduce the above copyright        #
+#      notice, this list of conditions and the following disclaimer in the    #
+#      documentation and/or other materials provided with the distribution.   #
+#                                                                             #
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"#
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE  #
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE #
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE  #
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR        #
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF       #
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS   #
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN    #
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)    #
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF     #
+#  THE POSSIBILITY OF SUCH DAMAGE.                                            #
+# ----------------------------------------------------------------------------#
+
+import sys
+from Queue import Queue, Empty
+from time import time
+
+from liota.entities.metrics.sample_buffer import SampleBuffer
+from liota.lib.utilities.utility import getUTCmillis
+
+#---------------------------------------------------------------------------
+# This is a micro-benchmark of liota.entities.metrics.sample_buffer
+# Purpose of this script is to compare the memory held by 1M buffered
+# samples of a metric, and the cost of adding and draining them, between
+# the Queue of (ts, v) tuples formerly used by RegisteredMetric and the
+# array-backed SampleBuffer, for integer and float values.
+#
+def main():
+    print_split = "-" * 76
+    num_samples = 1000000
+
+    def queue_bytes(queue):
+        size = sys.getsizeof(queue.queue)
+        for sample in queue.queue:
+            size += sys.getsizeof(sample)
+            size += sys.getsizeof(sample[0]) + sys.getsizeof(sample[1])
+        return size
+
+    def buffer_bytes(buf):
+        return sys.getsizeof(buf._timestamps) + sys.getsizeof(buf._values)
+
+    def drain_queue(queue):
+        samples = []
+        while True:
+            try:
+                samples.append(queue.get(block=False))
+            except Empty:
+                return samples
+
+    print print_split
+    print "  %-16s %12s %12s %14s %14s" % (
+        "buffer", "values", "MB", "add (us)", "drain (ms)")
+    print print_split
+    start_ts = getUTCmillis()
+    for kind, make_value in [("int", lambda i: i), ("float", lambda i: i * 0.5)]:
+        samples = [(start_ts + i, make_value(i)) for i in range(num_samples)]
+
+        queue = Queue()
+        start = time()
+        for sample in samples:
+            queue.put(sample)
+        t_add = (time() - start) / num_samples
+        size = queue_bytes(queue)
+        start = time()
+        drain_queue(queue)
+        t_drain = time() - start
+        print "  %-16s %12s %12.1f %14.3f %14.1f" % (
+            "Queue of tuples", kind, size / 1048576.0, t_add * 1e6,
+            t_drain * 1e3)
+
+        buf = SampleBuffer()
+        start = time()
+        for ts, v in samples:
+            buf.append(ts, v)
+        t_add = (time() - start) / num_samples
+        size = buffer_bytes(buf)
+        start = time()
+        buf.drain()
+        t_drain = time() - start
+        print "  %-16s %12s %12.1f %14.3f %14.1f" % (
+            "SampleBuffer", kind, size / 1048576.0, t_add * 1e6,
+            t_drain * 1e3)
+    print print_split
+
+main()
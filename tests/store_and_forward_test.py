@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------#
+#  Copyright © 2015-2016 VMware, Inc. All Rights Reserved.                    #
+#                                                                             #
+#  Licensed under the BSD 2-Clause License (the “License”); you may not use   #
+#  this file except in compliance with the License.                           #
+#                                                                             #
+#  The BSD 2-Clause License                                                   #
+#                                                                             #
+#  Redistribution and use in source and binary forms, with or without         #
+#  modification, are permitted provided that the following conditions are met:#
+#                                                                             #
+#  - Redistributions of source code must retain the above copyright notice,   #
+#      this list of conditions and the following disclaimer.                  #
+#                                                                             #
+#  - Redistributions in binary form must reproduce the above copyright        #
+#      notice, this list of conditions and the following disclaimer in the    #
+#      documentation and/or other materials provided with the distribution.   #
+#                                                                             #
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"#
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE  #
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE #
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE  #
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR        #
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF       #
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS   #
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN    #
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)    #
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF     #
+#  THE POSSIBILITY OF SUCH DAMAGE.                                            #
+# ----------------------------------------------------------------------------#
+
+import os
+import signal
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from threading import Thread
+
+from liota.dcc_comms.dcc_comms import DCCComms
+from liota.dcc_comms.store_and_forward_comms import StoreAndForwardDccComms
+
+#---------------------------------------------------------------------------
+# This is a testing script of liota.dcc_comms.store_and_forward_comms
+# Purpose of this script is to show that messages published during an
+# outage of the DCC survive a crash of the process: a child process sends
+# messages through StoreAndForwardDccComms to a local stand-in server,
+# which goes down half way, and the child is then killed with SIGKILL,
+# leaving a torn record at the end of the log. Once the server is back, a
+# new StoreAndForwardDccComms on the same log replays the stored messages,
+# and the server must have received all messages, in order.
+#
+NUM_DIRECT = 100
+NUM_MESSAGES = 1000
+
+
+class StandInServer(Thread):
+    """
+    Accepts connections and acknowledges each line received with "ok".
+    """
+
+    def __init__(self, port):
+        Thread.__init__(self)
+        self.daemon = True
+        self.lines = []
+        self.sock = socket.socket()
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind(('127.0.0.1', port))
+        self.sock.listen(5)
+        self.port = self.sock.getsockname()[1]
+        self.conns = []
+        self.start()
+
+    def run(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except socket.error:
+                break
+            self.conns.append(conn)
+            Thread(target=self._serve, args=(conn,)).start()
+
+    def _serve(self, conn):
+        f = conn.makefile()
+        try:
+            for line in f:
+                self.lines.append(line.strip())
+                conn.sendall("ok\n")
+        except socket.error:
+            pass
+
+    def stop(self):
+        self.sock.close()
+        for conn in self.conns:
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except socket.error:
+                pass
+            conn.close()
+
+
+class AckedSocketComms(DCCComms):
+    """
+    Sends lines and waits for their acknowledgement, raising if either
+    fails.
+    """
+
+    def __init__(self, port):
+        self.port = port
+        self.sock = None
+        self._connect()
+
+    def _connect(self):
+        self.sock = socket.create_connection(('127.0.0.1', self.port), 2)
+        self.sock.settimeout(2)
+
+    def _disconnect(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    def send(self, message, msg_attr=None):
+        self.sock.sendall(message + "\n")
+        if self.sock.recv(3) != "ok\n":
+            raise IOError("Message not acknowledged")
+
+    def receive(self):
+        raise NotImplementedError
+
+
+def child(log_path):
+    server = StandInServer(0)
+    comms = StoreAndForwardDccComms(AckedSocketComms(server.port), log_path,
+                                    segment_size=4096, retry_interval=60)
+    for i in range(NUM_MESSAGES):
+        if i == NUM_DIRECT:
+            server.stop()
+        comms.send("message-%d" % i)
+    # Report messages received by the server before the outage
+    sys.stdout.write("\n".join(server.lines) + "\n")
+    sys.stdout.flush()
+    os.kill(os.getpid(), signal.SIGKILL)
+
+
+def main():
+    print_split = "-" * 76
+    log_path = tempfile.mkdtemp()
+    try:
+        proc = subprocess.Popen([sys.executable, __file__, "child", log_path],
+                                stdout=subprocess.PIPE)
+        received = proc.communicate()[0].split()
+        segments = sorted(name for name in os.listdir(log_path)
+                          if name.endswith(".log"))
+        # Record torn by the crash while being appended
+        with open(os.path.join(log_path, segments[-1]), "ab") as f:
+            f.write("\x00\x00\x00\x40\x12")
+
+        server = StandInServer(0)
+        comms = StoreAndForwardDccComms(AckedSocketComms(server.port),
+                                        log_path, max_replay_rate=5000)
+        num_pending = comms.log.num_pending
+        for i in range(NUM_MESSAGES, NUM_MESSAGES + 10):
+            comms.send("message-%d" % i)
+        deadline = time.time() + 30
+        while comms.get_stats()[3] > 0 and time.time() < deadline:
+            time.sleep(0.1)
+        time.sleep(0.5)
+        received += server.lines
+        expected = ["message-%d" % i for i in range(NUM_MESSAGES + 10)]
+
+        print print_split
+        print "  Child exit code: %d" % proc.returncode
+        print "  Received before outage: %d" % NUM_DIRECT
+        print "  Segments left by crashed child: %d" % len(segments)
+        print "  Pending in log after recovery: %d" % num_pending
+        print "  Sent, stored, replayed, pending: %s" % comms.get_stats()
+        print "  Received in total: %d of %d" % (len(received), len(expected))
+        print "  All received in order: %s" % (received == expected)
+        print print_split
+        assert received == expected
+    finally:
+        shutil.rmtree(log_path)
+
+if len(sys.argv) > 2 and sys.argv[1] == "child":
+    child(sys.argv[2])
+else:
+    main()
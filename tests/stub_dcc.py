@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------#
+#  Copyright © 2015-2016 VMware, Inc. All Rights Reserved.                    #
+#                                                                             #
+#  Licensed under the BSD 2-Clause License (the “License”); you may not use   #
+#  this file except in compliance with the License.                           #
+#                                                                             #
+#  The BSD 2-Clause License                                                   #
+#                                                                             #
+#  Redistribution and use in source and binary forms, with or without         #
+#  modification, are permitted provided that the following conditions are met:#
+#                                                                             #
+#  - Redistributions of source code must retain the above copyright notice,   #
+#      this list of conditions and the following disclaimer.                  #
+#                                                                             #
+#  - Redistributions in binary form must reproduce the above copyright        #
+#      notice, this list of conditions and the following disclaimer in the    #
+#      documentation and/or other materials provided with the distribution.   #
+#                                                                             #
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"#
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE  #
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE #
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE  #
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR        #
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF       #
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS   #
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN    #
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)    #
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF     #
+#  THE POSSIBILITY OF SUCH DAMAGE.                                            #
+# ----------------------------------------------------------------------------#
+
+from liota.dcc_comms.dcc_comms import DCCComms
+from liota.dccs.dcc import DataCenterComponent
+from liota.entities.metrics.registered_metric import RegisteredMetric
+
+#---------------------------------------------------------------------------
+# Stub DCC for testing scripts of metrics: messages published are kept in
+# dcc.comms.messages, each a list of the (timestamp, value) pairs drained
+# from the metric, instead of being sent anywhere.
+#
+
+
+class StubComms(DCCComms):
+
+    def __init__(self):
+        self.messages = []
+
+    def _connect(self):
+        pass
+
+    def _disconnect(self):
+        pass
+
+    def send(self, message, msg_attr=None):
+        self.messages.append(message)
+
+    def receive(self):
+        raise NotImplementedError
+
+
+class StubDcc(DataCenterComponent):
+
+    def __init__(self):
+        super(StubDcc, self).__init__(comms=StubComms())
+
+    def register(self, entity_obj):
+        return RegisteredMetric(entity_obj, self, None)
+
+    def create_relationship(self, reg_entity_parent, reg_entity_child):
+        pass
+
+    def _format_data(self, reg_metric):
+        timestamps, values = reg_metric.drain_values()
+        if not timestamps:
+            return None
+        return zip(timestamps, values)
+
+    def set_properties(self, reg_entity, properties):
+        pass
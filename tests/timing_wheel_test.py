@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------#
+#  Copyright © 2015-2016 VMware, Inc. All Rights Reserved.                    #
+#                                                                             #
+#  Licensed under the BSD 2-Clause License (the “License”); you may not use   #
+#  this file except in compliance with the License.                           #
+#                                                                             #
+#  The BSD 2-Clause License                                                   #
+#                                                                             #
+#  Redistribution and use in source and binary forms, with or without         #
+#  modification, are permitted provided that the following conditions are met:#
+#                                                                             #
+#  - Redistributions of source code must retain the above copyright notice,   #
+#      this list of conditions and the following disclaimer.                  #
+#                                                                             #
+#  - Redistributions in binary form must reproduce the above copyright        #
+#      notice, this list of conditions and the following disclaimer in the    #
+#      documentation and/or other materials provided with the distribution.   #
+#                                                                             #
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"#
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE  #
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE #
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE  #
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR        #
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF       #
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS   #
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN    #
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)    #
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF     #
+#  THE POSSIBILITY OF SUCH DAMAGE.                                            #
+# ----------------------------------------------------------------------------#
+
+import math
+import random
+
+from liota.core import metric_handler
+from liota.core.metric_handler import TimingWheel
+from liota.entities.metrics.metric import Metric
+from liota.entities.metrics.registered_metric import RegisteredMetric
+
+#---------------------------------------------------------------------------
+# This is a testing script of liota.core.metric_handler.TimingWheel
+# Purpose of this script is to show that the timing wheel dispatches every
+# metric once, never before its next run time and less than one tick
+# after it, wherever the metric is placed: metrics are added with random
+# delays covering each level of the wheel and the overflow list, and added
+# again with a new delay once dispatched. Time is a fake clock, moved on
+# by waits of the wheel as a real wait would, sometimes oversleeping by a
+# few ticks, which the wheel has to catch up with.
+#
+TICK_MS = 10
+NUM_SLOTS = 8
+NUM_LEVELS = 3
+NUM_METRICS = 200
+NUM_DISPATCHES = 5000
+OVERSLEEP_RATE = 0.2
+MAX_OVERSLEEP_MS = 3 * TICK_MS
+SEED = 1
+MAX_DELAY_MS = TICK_MS * NUM_SLOTS ** (NUM_LEVELS + 1)
+
+
+class FakeClock:
+
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class AdvancingCondition:
+    """
+    Stands in for the condition of the wheel: waiting moves the fake clock
+    on by the timeout, plus a random oversleep now and then. Waiting longer
+    than any metric can wait means the wheel lost its metrics.
+    """
+
+    def __init__(self, clock, rng):
+        self.clock = clock
+        self.rng = rng
+        self.overslept = 0
+        self.last_dispatch = clock.now
+
+    def wait(self, timeout=None):
+        if self.clock.now - self.last_dispatch > MAX_DELAY_MS + TICK_MS \
+                + MAX_OVERSLEEP_MS:
+            raise RuntimeError("No metric dispatched for %d ms" %
+                               (self.clock.now - self.last_dispatch))
+        self.overslept = 0
+        if self.rng.random() < OVERSLEEP_RATE:
+            self.overslept = self.rng.randint(1, MAX_OVERSLEEP_MS)
+        self.clock.now += max(1, int(math.ceil(timeout * 1000))) \
+            + self.overslept
+
+    def notify(self):
+        pass
+
+
+def random_delay(rng):
+    # As many delays on each level of the wheel as beyond its top level
+    span = TICK_MS
+    spans = []
+    for _ in range(NUM_LEVELS + 1):
+        spans.append(span)
+        span *= NUM_SLOTS
+    level = rng.randint(0, NUM_LEVELS)
+    low = 0 if level == 0 else spans[level - 1] * NUM_SLOTS
+    return rng.randint(low, spans[level] * NUM_SLOTS - 1), level
+
+
+def main():
+    print_split = "-" * 76
+    rng = random.Random(SEED)
+    clock = FakeClock(1500000000003)
+    get_utc_millis = metric_handler.getUTCmillis
+    metric_handler.getUTCmillis = clock
+    try:
+        wheel = TimingWheel(TICK_MS, NUM_SLOTS, NUM_LEVELS)
+        condition = AdvancingCondition(clock, rng)
+        wheel.first_element_changed = condition
+        metric = Metric(name="timing-wheel-metric", interval=0)
+        num_added = [0] * (NUM_LEVELS + 1)
+        waiting = set()
+
+        def add(reg_metric):
+            delay, level = random_delay(rng)
+            reg_metric._next_run_time = clock.now + delay
+            num_added[level] += 1
+            waiting.add(reg_metric)
+            wheel.put_and_notify(reg_metric)
+
+        for _ in range(NUM_METRICS):
+            reg_metric = RegisteredMetric(metric, None, None)
+            reg_metric.flag_alive = True
+            add(reg_metric)
+
+        num_dispatched = 0
+        num_twice = 0
+        num_early = 0
+        num_late = 0
+        max_lateness = 0
+        while num_dispatched < NUM_DISPATCHES:
+            batch = wheel.get_ready_batch()
+            now = clock.now
+            condition.last_dispatch = now
+            for reg_metric in batch:
+                if reg_metric not in waiting:
+                    num_twice += 1
+                waiting.discard(reg_metric)
+                lateness = now - reg_metric.get_next_run_time()
+                if lateness < 0:
+                    num_early += 1
+                if lateness >= TICK_MS + condition.overslept:
+                    num_late += 1
+                max_lateness = max(max_lateness,
+                                   lateness - condition.overslept)
+                num_dispatched += 1
+                add(reg_metric)
+        # Metrics lost by the wheel would stay waiting past their run time
+        num_overdue = len([reg_metric for reg_metric in waiting
+                           if reg_metric.get_next_run_time() + TICK_MS
+                           + MAX_OVERSLEEP_MS < clock.now])
+    finally:
+        metric_handler.getUTCmillis = get_utc_millis
+
+    print print_split
+    print "  Wheel of %d levels of %d slots, %d ms per tick" % (
+        NUM_LEVELS, NUM_SLOTS, TICK_MS)
+    print "  Metrics added per level: %s, beyond top level: %d" % (
+        num_added[:NUM_LEVELS], num_added[NUM_LEVELS])
+    print "  Dispatched: %d, twice: %d, early: %d, one tick late or more: " \
+        "%d" % (num_dispatched, num_twice, num_early, num_late)
+    print "  Max lateness, oversleep of the wait excluded: %d ms" % \
+        max_lateness
+    print "  Waiting in wheel: %d, overdue: %d" % (wheel.qsize(),
+                                                   num_overdue)
+    print print_split
+    assert all(num_added)
+    assert num_twice == 0
+    assert num_early == 0
+    assert num_late == 0
+    assert num_overdue == 0
+    assert wheel.qsize() == len(waiting) == NUM_METRICS
+
+main()
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------#
+#  Copyright © 2015-2016 VMware, Inc. All Rights Reserved.                    #
+#                                                                             #
+#  Licensed under the BSD 2-Clause License (the “License”); you may not use   #
+#  this file except in compliance with the License.                           #
+#                                                                             #
+#  The BSD 2-Clause License                                                   #
+#                                                                             #
+#  Redistribution and use in source and binary forms, with or without         #
+#  modification, are permitted provided that the following conditions are met:#
+#                                                                             #
+#  - Redistributions of source code must retain the above copyright notice,   #
+#      this list of conditions and the following disclaimer.                  #
+#                                                                             #
+#  - Redistributions in binary form must reproduce the above copyright        #
+#      notice, this list of conditions and the following disclaimer in the    #
+#      documentation and/or other materials provided with the distribution.   #
+#                                                                             #
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"#
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE  #
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE #
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE  #
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR        #
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF       #
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS   #
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN    #
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)    #
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF     #
+#  THE POSSIBILITY OF SUCH DAMAGE.                                            #
+# ----------------------------------------------------------------------------#
+
+import shutil
+import tempfile
+import threading
+import time
+
+from liota.dcc_comms.store_and_forward_comms import StoreAndForwardDccComms
+from liota.dcc_comms.websocket_dcc_comms import WebSocketDccComms
+from liota.dccs.iotcc import IotControlCenter
+
+from fake_iotcc import FakeIotcc
+
+#---------------------------------------------------------------------------
+# This is a testing script of the loop thread of
+# liota.lib.transports.web_socket.WebSocket
+# Purpose of this script is to show that IoTCC over
+# StoreAndForwardDccComms(WebSocketDccComms(url, exit_on_failure=False))
+# survives an outage of a local fake IoTCC server: a request waiting for
+# its response fails with IOError when the connection drops, send() raises
+# IOError within connect_timeout while the server is down, and once it is
+# back, the loop thread runs again, logs in on the new connection before
+# any stats are written, and the stats stored meanwhile are delivered, in
+# order. call_later() runs its callable in the loop thread.
+#
+NUM_MESSAGES = 20
+
+
+def wait_for(condition, timeout):
+    deadline = time.time() + timeout
+    while not condition():
+        if time.time() > deadline:
+            return False
+        time.sleep(0.05)
+    return True
+
+
+def stats(seq):
+    return {"type": "add_stats", "seq": seq}
+
+
+def main():
+    print_split = "-" * 76
+    server = FakeIotcc()
+    log_path = tempfile.mkdtemp()
+    dcc_comms = WebSocketDccComms(url=server.url, exit_on_failure=False)
+    comms = StoreAndForwardDccComms(dcc_comms, log_path, retry_interval=0.5)
+    IotControlCenter("user", "password", comms)
+    wss = dcc_comms.wss
+
+    called_in = []
+    wss.call_later(0.1, lambda: called_in.append(threading.current_thread()))
+    called_in_loop = wait_for(lambda: called_in, 2) and \
+        called_in[0] is wss._loop_thread
+
+    for seq in range(NUM_MESSAGES):
+        comms.send(stats(seq))
+    request = wss.request({"type": "unanswered_request"})
+    wait_for(lambda: server.received("unanswered_request"), 5)
+    delivered_before = wait_for(
+        lambda: len(server.received("add_stats")) == NUM_MESSAGES, 5)
+
+    server.stop()
+    server.drop()
+    request_error = request.exception(5)
+    start = time.time()
+    try:
+        dcc_comms.send(stats(-1))
+        send_error = None
+    except IOError as ex:
+        send_error = ex
+    send_time = time.time() - start
+
+    for seq in range(NUM_MESSAGES, NUM_MESSAGES * 2):
+        comms.send(stats(seq))
+    num_stored = comms.get_stats()[1]
+    server.resume()
+    delivered = wait_for(
+        lambda: len(server.received("add_stats")) == NUM_MESSAGES * 2, 60)
+    seqs = [msg["seq"] for msg in server.received("add_stats")]
+    loop_alive = wss._loop_thread is not None and \
+        wss._loop_thread.is_alive()
+    first_types = [messages[0]["type"] for messages in server.connections
+                   if messages]
+
+    comms._disconnect()
+    comms._replay_thread.join(5)
+    shutil.rmtree(log_path)
+
+    print print_split
+    print "  call_later() called in loop thread: %s" % called_in_loop
+    print "  %d stats delivered before outage: %s" % (
+        NUM_MESSAGES, delivered_before)
+    print "  Request in flight failed with: %r" % request_error
+    print "  send() while server down raised: %r, after %.1f s " \
+        "(connect_timeout %s s)" % (send_error, send_time,
+                                    wss.connect_timeout)
+    print "  Stats stored during outage: %d, all %d delivered in order " \
+        "after it: %s" % (num_stored, NUM_MESSAGES * 2,
+                          delivered and seqs == range(NUM_MESSAGES * 2))
+    print "  Connections: %d, logins: %d, first message of each: %s" % (
+        len(server.connections), server.num_logins(), sorted(set(first_types)))
+    print "  Loop thread running after reconnect: %s" % loop_alive
+    print print_split
+    assert called_in_loop
+    assert delivered_before
+    assert isinstance(request_error, IOError)
+    assert isinstance(send_error, IOError)
+    assert send_time < wss.connect_timeout
+    assert num_stored == NUM_MESSAGES
+    assert delivered and seqs == range(NUM_MESSAGES * 2)
+    assert server.num_logins() >= 2
+    assert set(first_types) == set(["connection_response"])
+    assert loop_alive
+
+main()
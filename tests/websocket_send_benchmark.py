@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------#
+#  Copyright © 2015-2016 VMware, Inc. All Rights Reserved.                    #
+#                                                                             #
+#  Licensed under the BSD 2-Clause License (the “License”); you may not use   #
+#  this file except in compliance with the License.                           #
+#                                                                             #
+#  The BSD 2-Clause License                                                   #
+#                                                                             #
+#  Redistribution and use in source and binary forms, with or without         #
+#  modification, are permitted provided that the following conditions are met:#
+#                                                                             #
+#  - Redistributions of source code must retain the above copyright notice,   #
+#      this list of conditions and the following disclaimer.                  #
+#                                                                             #
+#  - Redistributions in binary form must reproduce the above copyright        #
+#      notice, this list of conditions and the following disclaimer in the    #
+#      documentation and/or other materials provided with the distribution.   #
+#                                                                             #
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"#
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE  #
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE #
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE  #
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR        #
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF       #
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS   #
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN    #
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)    #
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF     #
+#  THE POSSIBILITY OF SUCH DAMAGE.                                            #
+# ----------------------------------------------------------------------------#
+
+import json
+from time import time
+
+from liota.lib.transports import web_socket
+from liota.lib.transports.web_socket import WebSocket
+
+#---------------------------------------------------------------------------
+# This is a micro-benchmark of liota.lib.transports.web_socket.WebSocket
+# Purpose of this script is to show the throughput of send() with large
+# add_stats payloads, for each JSON encoder installed, and the cost of the
+# former retry policy check scanning the serialized payload, compared to
+# reading the type of the message. The connection is replaced by a stub,
+# so only the work done by liota is measured.
+#
+class StubConnection:
+
+    def __init__(self):
+        self.num_bytes = 0
+
+    def send(self, payload):
+        self.num_bytes += len(payload)
+
+    def close(self):
+        pass
+
+
+class StubWebSocket(WebSocket):
+
+    def connect_soc(self):
+        self.counter = 0
+        self.ws = StubConnection()
+
+
+def add_stats(num_metrics, num_values):
+    return {
+        "type": "add_stats",
+        "uuid": "8d7c0a63-5d6e-4f4e-bf3b-2a1d9cbbd2b5",
+        "metric_data": [{
+            "statKey": "edge-system.metric-%d" % i,
+            "timestamps": [1500000000000 + 1000 * j for j in range(num_values)],
+            "data": [i + j * 0.125 for j in range(num_values)]
+        } for i in range(num_metrics)]
+    }
+
+
+def main():
+    print_split = "-" * 76
+    default_name = getattr(web_socket.json_encode, 'func',
+                           web_socket.json_encode).__module__
+    encoders = [("json", json.dumps)]
+    if web_socket.json_encode is not json.dumps:
+        encoders.append((default_name, web_socket.json_encode))
+    print print_split
+    print "  Default encoder: %s" % default_name
+    print print_split
+    print "  %-10s %-14s %12s %14s %14s" % (
+        "metrics", "values/metric", "KB/msg", "msgs/s", "MB/s")
+    print print_split
+    for num_metrics, num_values in [(1, 1000), (10, 1000), (100, 100),
+                                    (100, 1000)]:
+        msg = add_stats(num_metrics, num_values)
+        for name, encoder in encoders:
+            ws = StubWebSocket("ws://localhost", encoder=encoder)
+            num_sends = max(2, 200000 / (num_metrics * num_values))
+            start = time()
+            for _ in range(num_sends):
+                ws.send(msg)
+            elapsed = time() - start
+            print "  %-10d %-14d %12.1f %14.1f %14.1f   %s" % (
+                num_metrics, num_values,
+                ws.ws.num_bytes / 1024.0 / num_sends,
+                num_sends / elapsed,
+                ws.ws.num_bytes / 1048576.0 / elapsed,
+                name)
+
+    msg = add_stats(100, 1000)
+    payload = json.dumps(msg)
+    num_checks = 100
+    start = time()
+    for _ in range(num_checks):
+        all(request not in payload for request in ['request', 'response'])
+    t_scan = (time() - start) / num_checks
+    start = time()
+    for _ in range(num_checks):
+        web_socket.is_request_or_response(msg)
+    t_type = (time() - start) / num_checks
+    print print_split
+    print "  Retry policy check on a %d KB message:" % (len(payload) / 1024)
+    print "  %-40s %16.2f us" % ("payload scan", t_scan * 1e6)
+    print "  %-40s %16.2f us" % ("message type", t_type * 1e6)
+    print print_split
+
+main()